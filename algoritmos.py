@@ -3,8 +3,10 @@ import random
 import time
 import numpy
 
+import traversal
 from graph import Graph
 from names import *
+from util import FenwickTree, expand
 
 
 def dist(a, b):
@@ -49,49 +51,163 @@ def randomErdos(n, m):
     :return: grafo generado
     """
     g = Graph()
+    names = [nodeName(i) for i in range(n)]
+    g.add_nodes_from(names)
 
-    for i in range(n):
-        g.addNode(NNAME_PREFIX + str(i))
-
-    for i in range(m):
-        u = random.randint(0, n - 1)
-        v = random.randint(0, n - 1)
-        if u != v:
-            g.addEdge(NNAME_PREFIX + str(u) + '->' + NNAME_PREFIX + str(v), NNAME_PREFIX + str(u),
-                      NNAME_PREFIX + str(v))
+    edges = ((random.randint(0, n - 1), random.randint(0, n - 1)) for i in range(m))
+    g.add_edges_from([(u, v) for u, v in edges if u != v], nodes=names)
 
     return g
 
 
-def randomGilbert(n, p):
+GILBERT_BATCH = 1 << 20    # número máximo de saltos que se generan a la vez
+
+
+def gilbert_edges(n, p, directed=True, seed=None, batch_size=GILBERT_BATCH):
+    """
+    Genera las aristas de G(n, p) saltando directamente de un par aceptado al siguiente (Batagelj y Brandes): la
+    distancia entre dos pares aceptados sigue una distribución geométrica, así que el costo depende del número de
+    aristas y no de los n² pares
+    :param n: número de nodos
+    :param p: probabilidad de cada arista
+    :param directed: si es True se consideran los pares ordenados (i, j), i != j; si no, los pares i < j
+    :param seed: semilla
+    :param batch_size: número máximo de saltos por bloque
+    :return: arreglo (m, 2) con las aristas
+    """
+    total = n * (n - 1) if directed else n * (n - 1) // 2
+    if total == 0 or p <= 0:
+        return numpy.empty((0, 2), dtype=numpy.int64)
+
+    rng = numpy.random.default_rng(seed)
+    ret = []
+    last = -1
+    while last < total:
+        size = int(min(batch_size, max(64, p * (total - last - 1) * 1.05 + 64)))
+        t = last + numpy.cumsum(rng.geometric(min(p, 1.0), size))
+        last = int(t[-1])
+        ret.append(t[t < total])
+    t = numpy.concatenate(ret)
+
+    if directed:
+        # el par número t es (i, j) en órden de renglones, saltando la diagonal
+        i = t // (n - 1)
+        j = t % (n - 1)
+        j += j >= i
+    else:
+        # el par número t es (i, j), i < j, recorriendo j = 1, 2, ... y luego i = 0 .. j - 1
+        j = ((1 + numpy.sqrt(1 + 8 * t.astype(float))) / 2).astype(numpy.int64)
+        j -= j * (j - 1) // 2 > t
+        j += (j + 1) * j // 2 <= t
+        i = t - j * (j - 1) // 2
+    return numpy.column_stack((i, j))
+
+
+def randomGilbert(n, p, directed=True, seed=None, arrays=False):
     """
     Genera grafo aleatorio con el método de Gilbert
     :param n: número de nodos
     :param p: probabilidad de generar una arista entre un par de nodos
+    :param directed: considerar los pares ordenados (cada par puede aparecer en los dos sentidos) o sólo i < j
+    :param seed: semilla
+    :param arrays: regresar el arreglo (m, 2) de aristas en lugar del grafo
     :return: grafo generado
     """
+    edges = gilbert_edges(n, p, directed, seed)
+    if arrays:
+        return edges
+
     g = Graph()
+    names = [nodeName(i) for i in range(n)]
+    g.add_nodes_from(names)
+    g.add_edges_from(edges, nodes=names)
+    return g
 
-    for i in range(n):
-        g.addNode(NNAME_PREFIX + str(i))
 
-    for i in range(n):
-        for j in range(n):
-            if random.random() < p:
-                if (j != i):
-                    g.addEdge(NNAME_PREFIX + str(i) + '->' + NNAME_PREFIX + str(j),
-                              NNAME_PREFIX + str(i),
-                              NNAME_PREFIX + str(j))
-    return g
+GEO_PAIRS = 'pares'     # compara todos los pares ordenados, cada arista aparece en los dos sentidos
+GEO_GRID = 'malla'      # agrupa los puntos en una malla de celdas de lado r, cada arista aparece una vez
+
+GEO_CHUNK = 1 << 20     # número máximo de pares candidatos que se revisan a la vez
 
+# celdas vecinas que se revisan desde cada celda (la mitad de la vecindad, la otra mitad la revisa la vecina)
+GEO_STENCIL = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
 
-def randomGeo(n, r):
+
+def geometric_edges(pos, r, chunk_size=GEO_CHUNK):
+    """
+    Busca los pares de puntos a distancia <= r. Los puntos se agrupan en una malla de celdas de lado r, así que sólo
+    hay que comparar cada punto con los de su celda y las vecinas; las distancias se calculan por bloques con NumPy
+    :param pos: arreglo (n, 2) con las coordenadas
+    :param r: distancia máxima
+    :param chunk_size: número máximo de pares candidatos por bloque
+    :return: arreglo (m, 2) con los pares (i, j), i < j
+    """
+    n = len(pos)
+    if n < 2 or r <= 0:
+        return numpy.empty((0, 2), dtype=numpy.int64)
+
+    cell = numpy.floor((pos - pos.min(axis=0)) / r).astype(numpy.int64)
+    # un borde de celdas vacías evita que los vecinos de una orilla caigan en la orilla opuesta
+    width = int(cell[:, 1].max()) + 3
+    key = (cell[:, 0] + 1) * width + cell[:, 1] + 1
+
+    order = numpy.argsort(key, kind='stable')
+    key = key[order]
+    spos = pos[order]
+    r2 = r * r
+
+    ret = []
+    for dx, dy in GEO_STENCIL:
+        neighbor = key + dx * width + dy
+        start = numpy.searchsorted(key, neighbor, 'left')
+        end = numpy.searchsorted(key, neighbor, 'right')
+        if dx == 0 and dy == 0:
+            # dentro de la misma celda sólo los que siguen, para no repetir pares
+            start = numpy.arange(1, n + 1)
+        count = numpy.maximum(end - start, 0)
+        total = numpy.cumsum(count)
+
+        i0 = 0
+        while i0 < n:
+            base = total[i0 - 1] if i0 > 0 else 0
+            i1 = max(i0 + 1, int(numpy.searchsorted(total, base + chunk_size, 'right')))
+            j, k = expand(start[i0:i1], count[i0:i1])
+            i = k + i0
+            d = spos[i] - spos[j]
+            near = numpy.einsum('ij,ij->i', d, d) <= r2
+            ret.append(numpy.column_stack((order[i[near]], order[j[near]])))
+            i0 = i1
+
+    ret = numpy.concatenate(ret)
+    ret.sort(axis=1)
+    return ret
+
+
+def randomGeo(n, r, mode=GEO_PAIRS, seed=None, arrays=False):
     """
     Genera grafo aleatorio con el método geográfico simple
     :param n: número de nodos
     :param r: distancia máxima para generar la arista entre un par de nodos
+    :param mode: GEO_PAIRS (el método original) o GEO_GRID
+    :param seed: semilla, sólo para GEO_GRID
+    :param arrays: en GEO_GRID regresar (coordenadas (n, 2), aristas (m, 2)) en lugar del grafo
     :return: grafo generado
     """
+    if mode == GEO_GRID:
+        pos = numpy.random.default_rng(seed).random((n, 2))
+        edges = geometric_edges(pos, r)
+        if arrays:
+            return pos, edges
+
+        # las coordenadas del método son la posición inicial de los nodos
+        g = Graph()
+        names = [nodeName(i) for i in range(n)]
+        g.add_nodes_from(names)
+        g.pos.view()[:] = pos
+        g.positions_changed()
+        g.add_edges_from(edges, nodes=names)
+        return g
+
     g = Graph()
 
     # Generar n nodos con coordenadas en el espacio ((0,0),(1,1))
@@ -101,26 +217,91 @@ def randomGeo(n, r):
         node.attr[Y_ATTR] = random.random()
 
     # Crear una arista entre cada par de nodos que están a distancia <= r
+    nodes = g.node_list
+    edges = []
     for i in range(n):
         for j in range(n):
             if i != j:
-                d = dist(g.getNode(NNAME_PREFIX + str(i)),
-                         g.getNode(NNAME_PREFIX + str(j)))
+                d = dist(nodes[i], nodes[j])
                 if d <= r:
-                    g.addEdge(NNAME_PREFIX + str(i) + '->' + NNAME_PREFIX + str(j),
-                              NNAME_PREFIX + str(i),
-                              NNAME_PREFIX + str(j))
+                    edges.append((i, j))
 
+    g.add_edges_from(edges, nodes=[v.id for v in nodes])
     return g
 
 
-def randomBarabasi(n, d):
+BA_PREFERENTIAL = 'preferencial'   # Barabási-Albert: cada nodo nuevo se une a d nodos elegidos según su grado
+BA_CAPPED = 'tope'                  # el método original: probabilidad 1 - grado / d para cada nodo anterior
+
+
+def barabasi_edges(n, d, seed=None):
+    """
+    Genera las aristas de un grafo Barabási-Albert en O(n·d) (Batagelj y Brandes).
+
+    La arista e sale del nodo e // d y se guarda en el arreglo de extremos M en las posiciones 2e (origen) y 2e + 1
+    (destino). El destino se copia de una posición anterior elegida al azar, así que cada nodo se elige en proporción
+    al número de veces que aparece en M, es decir, a su grado. Como la posición elegida puede ser a su vez un destino,
+    se resuelven todas a la vez siguiendo los apuntadores hasta llegar a una posición par. Los lazos y las aristas
+    repetidas se descartan, por lo que algunos nodos quedan con menos de d aristas
+    :param n: número de nodos
+    :param d: aristas por nodo nuevo
+    :param seed: semilla
+    :return: arreglo (m, 2) con las aristas (nodo nuevo, nodo anterior)
+    """
+    m = n * d
+    if m == 0:
+        return numpy.empty((0, 2), dtype=numpy.int64)
+
+    rng = numpy.random.default_rng(seed)
+    e = numpy.arange(m, dtype=numpy.int64)
+    src = e // d
+
+    # apuntador de cada destino a una posición de M en [0, 2e]
+    ptr = (rng.random(m) * (2 * e + 1)).astype(numpy.int64)
+    ptr = numpy.minimum(ptr, 2 * e)
+
+    # las posiciones pares ya tienen valor (el origen); las impares apuntan a otro destino
+    odd = numpy.flatnonzero(ptr & 1)
+    while len(odd) > 0:
+        ptr[odd] = ptr[ptr[odd] >> 1]
+        odd = odd[(ptr[odd] & 1) == 1]
+
+    dst = src[ptr >> 1]
+    keep = src != dst
+    src = src[keep]
+    dst = dst[keep]
+
+    # el destino siempre es un nodo anterior al origen, así que (origen, destino) ya identifica a la arista; se deja
+    # la primera aparición de cada una en el órden en que se generaron
+    _, first = numpy.unique(src * n + dst, return_index=True)
+    first.sort()
+    return numpy.column_stack((src[first], dst[first]))
+
+
+def randomBarabasi(n, d, mode=BA_CAPPED, seed=None, arrays=False):
     """
     Genera grafo aleatorio con el método de Barabasi
     :param n: número de nodos
-    :param d: número máximo de aristas por nodo
+    :param d: en BA_CAPPED, número máximo de aristas por nodo; en BA_PREFERENTIAL, aristas por nodo nuevo
+    :param mode: BA_CAPPED (el método original) o BA_PREFERENTIAL
+    :param seed: semilla, sólo para BA_PREFERENTIAL
+    :param arrays: en BA_PREFERENTIAL regresar el arreglo (m, 2) de aristas en lugar del grafo
     :return: grafo generado
     """
+    if mode != BA_PREFERENTIAL and (seed is not None or arrays):
+        raise ValueError('seed y arrays sólo se pueden usar con BA_PREFERENTIAL')
+
+    if mode == BA_PREFERENTIAL:
+        edges = barabasi_edges(n, d, seed)
+        if arrays:
+            return edges
+
+        g = Graph()
+        names = [nodeName(i) for i in range(n)]
+        g.add_nodes_from(names)
+        g.add_edges_from(edges, nodes=names)
+        return g
+
     g = Graph()
     g.addNode(NNAME_PREFIX + str(0))
 
@@ -162,27 +343,24 @@ def gridGraph(m, n=0, diagonals=False):
     n = max(2, n)
 
     g = Graph()
-
-    for i in range(m):
-        for j in range(n):
-            g.addNode(nodeName(i * n + j)
-                      ).attr[ATTR_POS] = numpy.array([float(i), float(j)])
-            if j < n - 1:
-                g.addEdge(edgeName(i * n + j, i * n + j + 1),
-                          nodeName(i * n + j),
-                          nodeName(i * n + j + 1))
-            if i < m - 1:
-                g.addEdge(edgeName(i * n + j, (i + 1) * n + j),
-                          nodeName(i * n + j),
-                          nodeName((i + 1) * n + j))
-            if i < m - 1 and j < n - 1 and diagonals:
-                g.addEdge(edgeName(i * n + j, (i + 1) * n + j + 1),
-                          nodeName(i * n + j),
-                          nodeName((i + 1) * n + j + 1))
-            if i > 0 and j < n - 1 and diagonals:
-                g.addEdge(edgeName(i * n + j, (i - 1) * n + j + 1),
-                          nodeName(i * n + j),
-                          nodeName((i - 1) * n + j + 1))
+    names = [nodeName(i) for i in range(m * n)]
+    g.add_nodes_from(names)
+    g.pos.view()[:] = numpy.indices((m, n)).reshape(2, -1).T
+    g.positions_changed()
+
+    # las aristas se generan por índice del nodo (i * n + j), en el mismo órden en que se generaban una por una
+    ij = numpy.arange(m * n).reshape(m, n)
+    steps = [(ij[:, :-1], ij[:, 1:]), (ij[:-1, :], ij[1:, :])]
+    if diagonals:
+        steps += [(ij[:-1, :-1], ij[1:, 1:]), (ij[1:, :-1], ij[:-1, 1:])]
+
+    src = numpy.full((m * n, len(steps)), -1, dtype=numpy.int64)
+    dst = numpy.full((m * n, len(steps)), -1, dtype=numpy.int64)
+    for k, (a, b) in enumerate(steps):
+        src[a.ravel(), k] = a.ravel()
+        dst[a.ravel(), k] = b.ravel()
+    valid = src.ravel() >= 0
+    g.add_edges_from(numpy.column_stack((src.ravel()[valid], dst.ravel()[valid])), nodes=names)
 
     g.attr[ATTR_LAYERED] = True
     return g
@@ -219,22 +397,33 @@ def DorogovtsevMendesGraphV2(n, divisor=10, p_inicial=1.0):
 
     divisor = max(1.0, divisor)
 
-    g.addEdge(edgeName(0, 1), 0, 1).atrib['__DM'] = p_inicial
-    g.addEdge(edgeName(1, 2), 1, 2).atrib['__DM'] = p_inicial
-    g.addEdge(edgeName(2, 0), 2, 0).atrib['__DM'] = p_inicial
+    # una arista se acepta con probabilidad min(1, __DM); elegirla en proporción a ese peso con el árbol de Fenwick
+    # da la misma distribución sin repetir intentos, que eran cada vez más conforme los pesos bajan
+    dm = []
+    weights = FenwickTree()
+
+    def add(name, a, b):
+        e = g.addEdge(name, a, b).index
+        if e == len(dm):
+            dm.append(p_inicial)
+            weights.append(min(1.0, p_inicial))
+
+    add(edgeName(0, 1), 0, 1)
+    add(edgeName(1, 2), 1, 2)
+    add(edgeName(2, 0), 2, 0)
 
     if n < 3:
         n = 3
 
     for i in range(3, n):
-        a = g.getRandomEdge()
-        while not random.random() <= a.atrib['__DM']:
-            a = g.getRandomEdge()
+        a = g.edge_list[weights.sample()]
 
-        g.addEdge(edgeName(i, a.n0.id), i, a.n0.id).atrib['__DM'] = p_inicial
-        g.addEdge(edgeName(i, a.n1.id), i, a.n1.id).atrib['__DM'] = p_inicial
-        a.atrib['__DM'] = a.atrib['__DM'] / divisor
+        add(edgeName(i, a.n0.id), i, a.n0.id)
+        add(edgeName(i, a.n1.id), i, a.n1.id)
+        dm[a.index] = dm[a.index] / divisor
+        weights.set(a.index, min(1.0, dm[a.index]))
 
+    g.edge_data.fill('__DM', numpy.array(dm))
     return g
 
 
@@ -258,91 +447,97 @@ def colorRamp(layer):
 
 
 def BFS(bfs, g, sleep=0, s=None):
-    layers = []
-    added = {}
-
+    """
+    Recorrido a lo ancho animado: el recorrido lo hace traversal.bfs y aquí sólo se construye el árbol en bfs y se
+    colorean los nodos y aristas de g, una arista a la vez
+    :param bfs: grafo donde se construye el árbol
+    :param g: grafo a recorrer
+    :param sleep: pausa en milisegundos entre cada arista
+    :param s: nombre del nodo inicial, si es None se elige al azar
+    :return: resultado del recorrido (traversal.BFSResult)
+    """
     print('BFS started ...')
     if s is None:
-        seed = random.choice(list(g.nodes.values()))
+        seed = random.choice(g.node_list)
     else:
         seed = g.getNode(s)
     seed.style(STYLE_FILLCOLOR, (250, 0, 0))
 
+    result = traversal.bfs(g, seed.index)
+
     n = bfs.addNode(seed.id)
     n.style(STYLE_FILLCOLOR, colorRamp(0))
     n.style(STYLE_SIZE, 20)
 
-    layers.append({seed.id: seed})
-    added[seed.id] = seed
-    for e in g.edges.values():
-        e.atrib['bfs'] = False
-
-    i = 0
-    while i < len(layers):
-        nextLayer = {}
-        curLayer = layers[i]
-
-        for n in curLayer.values():
-            # fillColor = rampColor(i + 1)
-            edges = n.attr[ATTR_EDGES]
-            for e in edges:
-                if e.n0.id == n.id:
-                    m = e.n1
-                else:
-                    m = e.n0
-
-                if m.id not in nextLayer and m.id not in added:
-                    nn = bfs.addNode(n.id)
-                    mm = bfs.addNode(m.id)
-
-                    if i == 0:
-                        nn.style(STYLE_SIZE, 20)
-                        nn.style(STYLE_FILLCOLOR, colorRamp(0))
-
-                    bfs.addEdge(str(n.id) + '->' + str(m.id), nn.id, mm.id)
-                    mm.style(STYLE_FILLCOLOR, colorRamp(i))
-                    m.style(STYLE_FILLCOLOR, colorRamp(i))
-
-                    e.style(STYLE_THICKNESS, 2)
-                    e.style(STYLE_COLOR, COLOR_DARK_GREEN)
-
-                    e.atrib['bfs'] = True
-                    nextLayer[m.id] = m
-                    added[m.id] = m
-                    time.sleep(sleep / 1000.0)
-
-        i += 1
-        if len(nextLayer) != 0:
-            layers.append(nextLayer)
+    nodes = g.node_list
+    g.edge_data.fill('bfs', numpy.zeros(len(g.edge_list), dtype=bool))
+
+    for i, layer in enumerate(result.layers[1:]):
+        parents = result.parent[layer].tolist()
+        edges = result.parent_edge[layer].tolist()
+        for v, p, k in zip(layer.tolist(), parents, edges):
+            m = nodes[v]
+            e = g.edge_list[k]
+            nn = bfs.addNode(nodes[p].id)
+            mm = bfs.addNode(m.id)
+
+            if i == 0:
+                nn.style(STYLE_SIZE, 20)
+                nn.style(STYLE_FILLCOLOR, colorRamp(0))
+
+            bfs.addEdge(str(nn.id) + '->' + str(mm.id), nn.id, mm.id)
+            mm.style(STYLE_FILLCOLOR, colorRamp(i))
+            m.style(STYLE_FILLCOLOR, colorRamp(i))
+
+            e.style(STYLE_THICKNESS, 2)
+            e.style(STYLE_COLOR, COLOR_DARK_GREEN)
+
+            e.atrib['bfs'] = True
+            if sleep > 0:
+                time.sleep(sleep / 1000.0)
 
     print('BFS finished.')
+    return result
 
 
 def DFS(dfs, g, sleep=0, s=None):
-    added = {}
-
+    """
+    Recorrido en profundidad animado: el recorrido lo hace traversal.dfs y aquí se repiten sus eventos en el órden
+    del reloj; al bajar por una arista del árbol se agrega a dfs y se marca en g, al regresar se marca como terminada
+    :param dfs: grafo donde se construye el árbol
+    :param g: grafo a recorrer
+    :param sleep: pausa en milisegundos por cada arista (la mitad al bajar y la mitad al regresar)
+    :param s: nombre del nodo inicial, si es None se elige al azar
+    :return: resultado del recorrido (traversal.DFSResult)
+    """
     print('DFS started ...')
     if s is None:
-        seed = random.choice(list(g.nodes.values()))
+        seed = random.choice(g.node_list)
     else:
-        seed = g.obtNodo(s)
-
-    DFS_R(seed, dfs, added, sleep, 0)
-    print('DFS finished.')
-
-
-def DFS_R(seed, dfs, added, sleep, layer):
-    added[seed.id] = seed
+        seed = g.getNode(s)
 
-    edges = seed.attr[ATTR_EDGES]
-    for e in edges:
-        if e.n0.id == seed.id:
-            m = e.n1
+    result = traversal.dfs(g, seed.index)
+
+    # cada nodo del árbol (salvo la raíz) aporta un evento al descubrirse y otro al terminarse
+    reached = numpy.flatnonzero(result.parent >= 0)
+    order = numpy.argsort(numpy.concatenate((result.discovery[reached], result.finish[reached])))
+    events = numpy.concatenate((reached, reached))[order].tolist()
+    finished = (order >= len(reached)).tolist()
+    parent = result.parent.tolist()
+    parent_edge = result.parent_edge.tolist()
+
+    nodes = g.node_list
+    depth = {seed.index: 0}
+    for v, up in zip(events, finished):
+        e = g.edge_list[parent_edge[v]]
+        if up:
+            e.style(STYLE_THICKNESS, 2)
+            e.style(STYLE_COLOR, COLOR_DARK_GREEN)
         else:
-            m = e.n0
-
-        if not m.id in added:
-            nn = dfs.addNode(seed.id)
+            layer = depth[parent[v]]
+            depth[v] = layer + 1
+            m = nodes[v]
+            nn = dfs.addNode(nodes[parent[v]].id)
             mm = dfs.addNode(m.id)
 
             if layer == 0:
@@ -358,10 +553,8 @@ def DFS_R(seed, dfs, added, sleep, layer):
             e.style(STYLE_THICKNESS, 3)
             e.style(STYLE_COLOR, COLOR_DARK_YELLOW)
 
+        if sleep > 0:
             time.sleep(sleep / 2000.0)
 
-            DFS_R(m, dfs, added, sleep, layer + 1)
-
-            e.style(STYLE_THICKNESS, 2)
-            e.style(STYLE_COLOR, COLOR_DARK_GREEN)
-            time.sleep(sleep / 2000.0)
+    print('DFS finished.')
+    return result
@@ -0,0 +1,233 @@
+import numpy
+
+
+def index_dtype(size):
+    """
+    Elige el tipo entero más pequeño que puede guardar índices hasta size
+    :param size: valor máximo que se va a guardar
+    :return: numpy.int32 o numpy.int64
+    """
+    if size < 2 ** 31 - 1:
+        return numpy.int32
+    return numpy.int64
+
+
+def build_csr(n, src, dst):
+    """
+    Construye la adyacencia CSR (no dirigida) a partir de las listas de extremos de las aristas.
+
+    Cada arista (u, v) aparece en la fila de u y en la de v; dentro de cada fila las entradas quedan en el órden en
+    que se agregaron las aristas, igual que las listas de vecinos de Graph.
+    :param n: número de nodos
+    :param src: arreglo con el índice del nodo origen de cada arista
+    :param dst: arreglo con el índice del nodo destino de cada arista
+    :return: (indptr, indices, edge_ids)
+    """
+    m = len(src)
+    dtype = index_dtype(max(n, 2 * m))
+
+    # se intercalan los extremos para que el órden estable respete el órden de inserción de las aristas
+    ends = numpy.empty(2 * m, dtype=dtype)
+    ends[0::2] = src
+    ends[1::2] = dst
+    other = numpy.empty(2 * m, dtype=dtype)
+    other[0::2] = dst
+    other[1::2] = src
+
+    order = numpy.argsort(ends, kind='stable')
+
+    indptr = numpy.zeros(n + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(ends, minlength=n), out=indptr[1:])
+
+    indices = other[order]
+    edge_ids = (order // 2).astype(dtype, copy=False)
+
+    return indptr, indices, edge_ids
+
+
+class EdgeNames:
+    """
+    Secuencia de sólo lectura con los nombres de las aristas de un Graph; cada nombre se obtiene hasta que se pide
+    """
+
+    def __init__(self, edges):
+        self.edges = edges
+
+    def __len__(self):
+        return len(self.edges)
+
+    def __getitem__(self, e):
+        return self.edges[e].id
+
+
+class CSRGraph:
+    """
+    Clase grafo compacto
+
+    guarda el grafo en arreglos de NumPy: los nodos se identifican con un índice entero, una tabla de nombres permite
+    ir del nombre al índice y de regreso, y la adyacencia se guarda en formato CSR (indptr, indices, edge_ids).
+    Las aristas se guardan además como dos arreglos de extremos (src, dst) indexados por el id de la arista.
+    """
+
+    def __init__(self, names, src, dst, pos=None, edge_names=None, csr=None, directed=True):
+        """
+        Constructor
+        :param names: secuencia con el nombre de cada nodo, el índice del nodo es su posición en la secuencia
+        :param src: arreglo con el índice del nodo origen de cada arista
+        :param dst: arreglo con el índice del nodo destino de cada arista
+        :param pos: arreglo (n, 2) con la posición de cada nodo, opcional
+        :param edge_names: secuencia con el nombre de cada arista, opcional
+        :param csr: tupla (indptr, indices, edge_ids) ya calculada, opcional
+        :param directed: False si las aristas se escriben con -- en DOT
+        """
+        self.names = names
+        self._index = None
+        self.src = numpy.asarray(src)
+        self.dst = numpy.asarray(dst)
+        self.pos = pos
+        self.edge_names = edge_names
+        self.directed = directed
+        self.node_attrs = {}        # columnas de atributos de los nodos, nombre -> arreglo
+        self.edge_attrs = {}        # columnas de atributos de las aristas, nombre -> arreglo
+        self.node_present = {}      # nombre -> arreglo bool con los nodos que tienen el atributo, si no son todos
+        self.edge_present = {}      # nombre -> arreglo bool con las aristas que tienen el atributo, si no son todas
+
+        if csr is None:
+            csr = build_csr(len(names), self.src, self.dst)
+        self.indptr, self.indices, self.edge_ids = csr
+
+    @property
+    def num_nodes(self):
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self):
+        return len(self.src)
+
+    def index_of(self, name):
+        """
+        Busca el índice de un nodo a partir de su nombre
+        :param name: nombre del nodo
+        :return: índice del nodo o None si no está
+        """
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.names)}
+        return self._index.get(name)
+
+    def name_of(self, i):
+        """
+        Obtiene el nombre de un nodo
+        :param i: índice del nodo
+        :return: nombre del nodo
+        """
+        return self.names[i]
+
+    def edge_name(self, e):
+        """
+        Obtiene el nombre de una arista, si no se guardaron nombres se forma como 'origen->destino'
+        :param e: id de la arista
+        :return: nombre de la arista
+        """
+        if self.edge_names is not None:
+            return self.edge_names[e]
+        return str(self.names[self.src[e]]) + '->' + str(self.names[self.dst[e]])
+
+    def neighbors(self, i):
+        """
+        Vecinos de un nodo
+        :param i: índice del nodo
+        :return: vista del arreglo con los índices de los vecinos
+        """
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def incident_edges(self, i):
+        """
+        Aristas que inciden en un nodo
+        :param i: índice del nodo
+        :return: vista del arreglo con los ids de las aristas
+        """
+        return self.edge_ids[self.indptr[i]:self.indptr[i + 1]]
+
+    def degree(self, i=None):
+        """
+        Grado de un nodo o de todos los nodos
+        :param i: índice del nodo, si es None se regresan todos los grados
+        :return: grado del nodo o arreglo con los grados
+        """
+        if i is None:
+            return numpy.diff(self.indptr)
+        return int(self.indptr[i + 1] - self.indptr[i])
+
+    @staticmethod
+    def from_graph(g):
+        """
+        Construye la versión compacta de un grafo
+        :param g: grafo (Graph) de origen
+        :return: CSRGraph con los mismos nodos, aristas y posiciones
+        """
+        names = list(g.node_names)
+        dtype = index_dtype(len(names))
+        m = min(len(g.src), len(g.dst))
+        src = g.src.view()[:m].astype(dtype)
+        dst = g.dst.view()[:m].astype(dtype)
+
+        pos = g.pos.view()[:len(names)].copy()
+
+        ret = CSRGraph(names, src, dst, pos=pos, edge_names=EdgeNames(g.edge_list), directed=g.directed)
+        columns_from(g.node_data, len(names), ret.node_attrs, ret.node_present)
+        columns_from(g.edge_data, m, ret.edge_attrs, ret.edge_present)
+        return ret
+
+    def to_graph(self):
+        """
+        Construye un Graph a partir de la versión compacta
+        :return: grafo (Graph) con los mismos nodos, aristas y posiciones
+        """
+        from graph import Graph
+
+        g = Graph()
+        g.directed = self.directed
+
+        for i in range(self.num_nodes):
+            v = g.addNode(self.names[i])
+            if self.pos is not None:
+                v.pos = self.pos[i]
+
+        for e in range(self.num_edges):
+            g.addEdge(self.edge_name(e), self.names[self.src[e]], self.names[self.dst[e]])
+
+        columns_to(g.node_data, self.num_nodes, self.node_attrs, self.node_present)
+        columns_to(g.edge_data, self.num_edges, self.edge_attrs, self.edge_present)
+        return g
+
+
+def columns_from(table, size, attrs, present):
+    """
+    Copia las columnas de una AttrTable a los diccionarios de un CSRGraph
+    :param table: AttrTable de origen
+    :param size: número de renglones
+    :param attrs: diccionario nombre -> arreglo donde se guardan los valores
+    :param present: diccionario nombre -> arreglo bool donde se guardan los renglones asignados, si no son todos
+    :return: None
+    """
+    for name in table:
+        attrs[name] = table.column(name, size).copy()
+        mask = table.present[name].view()[:size]
+        if not mask.all():
+            present[name] = mask.copy()
+
+
+def columns_to(table, size, attrs, present):
+    """
+    Asigna en una AttrTable las columnas de un CSRGraph
+    :param table: AttrTable de destino
+    :param size: número de renglones
+    :param attrs: diccionario nombre -> secuencia de valores
+    :param present: diccionario nombre -> arreglo bool con los renglones asignados, si no son todos
+    :return: None
+    """
+    for name, values in attrs.items():
+        if not isinstance(values, numpy.ndarray):
+            values = numpy.array(list(values), dtype=object)
+        rows = numpy.flatnonzero(present[name]) if name in present else numpy.arange(size)
+        table.assign(name, rows, values[rows], size)
@@ -0,0 +1,582 @@
+import os
+import re
+
+import numpy
+
+from names import *
+
+CHUNK_SIZE = 65536      # número de aristas que se acumulan antes de insertarlas en el grafo
+
+# tokens del lenguaje DOT, en órden de prioridad
+TOKEN_RE = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//.*|\#.*)
+  | (?P<open_comment>/\*)
+  | (?P<edgeop>->|--)
+  | (?P<string>"(?:\\[\s\S]|[^"\\])*")
+  | (?P<open_string>")
+  | (?P<html><[^<>]*>)
+  | (?P<id>[A-Za-z_\x80-\uffff][A-Za-z_0-9\x80-\uffff]*|-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?))
+  | (?P<punct>[{}\[\];,=:])
+''', re.VERBOSE)
+
+KEYWORDS = ('strict', 'graph', 'digraph', 'node', 'edge', 'subgraph')
+
+PLAIN_ID_RE = re.compile(r'[A-Za-z_][A-Za-z_0-9]*|-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?)')
+
+# línea que sólo tiene una arista 'a -> b;' entre IDs simples, es el caso más común y se resuelve sin el analizador
+SIMPLE_EDGE_RE = re.compile(r'\s*([A-Za-z_0-9.\-]+)\s*(->|--)\s*([A-Za-z_0-9.\-]+)\s*;\s*')
+
+
+class DotError(Exception):
+    """
+    Error de sintaxis al leer un archivo DOT
+    """
+
+    def __init__(self, msg, line):
+        super().__init__('línea ' + str(line) + ': ' + msg)
+        self.line = line
+
+
+class Token:
+    """
+    Clase token, guarda el tipo, el texto y la línea donde aparece
+    """
+    __slots__ = ('kind', 'text', 'line')
+
+    def __init__(self, kind, text, line):
+        self.kind = kind
+        self.text = text
+        self.line = line
+
+    def is_keyword(self, kw):
+        return self.kind == 'id' and self.text.lower() == kw
+
+
+def unquote(text):
+    """
+    Quita las comillas y las secuencias de escape de una cadena DOT
+    :param text: cadena con comillas
+    :return: contenido de la cadena
+    """
+    return text[1:-1].replace('\\\n', '').replace('\\"', '"')
+
+
+def is_plain(text):
+    return PLAIN_ID_RE.fullmatch(text) is not None and text.lower() not in KEYWORDS
+
+
+def tokenize(lines):
+    """
+    Divide en tokens una secuencia de líneas, sin tener más de una línea en memoria (salvo cadenas que ocupan varias
+    líneas). Los comentarios y las líneas de preprocesador (#) se descartan. Una línea que sólo contiene una arista
+    simple se entrega como un solo token 'edge_stmt' cuyo texto es la tupla (origen, operador, destino)
+    :param lines: iterable de líneas de texto
+    :return: generador de Token
+    """
+    in_comment = False
+    pending = ''
+    lineno = 0
+
+    for line in lines:
+        lineno += 1
+        if pending:
+            line = pending + line
+            pending = ''
+        elif not in_comment:
+            m = SIMPLE_EDGE_RE.fullmatch(line)
+            if m is not None and is_plain(m.group(1)) and is_plain(m.group(3)):
+                yield Token('edge_stmt', m.groups(), lineno)
+                continue
+
+        pos = 0
+        end = len(line)
+        while pos < end:
+            if in_comment:
+                close = line.find('*/', pos)
+                if close < 0:
+                    pos = end
+                    break
+                in_comment = False
+                pos = close + 2
+                continue
+
+            m = TOKEN_RE.match(line, pos)
+            if m is None:
+                raise DotError('carácter inesperado ' + repr(line[pos]), lineno)
+
+            kind = m.lastgroup
+            pos = m.end()
+            if kind == 'space' or kind == 'comment':
+                continue
+            if kind == 'open_comment':
+                in_comment = True
+                continue
+            if kind == 'open_string':
+                # cadena que continúa en la siguiente línea
+                pending = line[m.start():]
+                break
+
+            if kind == 'string':
+                yield Token('id', unquote(m.group()), lineno)
+            elif kind == 'html':
+                yield Token('id', m.group()[1:-1], lineno)
+            elif kind == 'id' or kind == 'edgeop':
+                yield Token(kind, m.group(), lineno)
+            else:
+                yield Token(m.group(), m.group(), lineno)
+
+    if pending:
+        raise DotError('cadena sin cerrar', lineno)
+
+
+class Parser:
+    """
+    Analizador de DOT por descenso recursivo que consume los tokens conforme los necesita
+
+    por cada nodo y arista encontrados llama a on_node(nombre, atributos) y on_edge(origen, destino, operador,
+    atributos); los atributos predeterminados (node [...], edge [...]) se aplican según el alcance de cada subgrafo
+    """
+
+    def __init__(self, tokens, on_node, on_edge):
+        self.tokens = tokens
+        self.on_node = on_node
+        self.on_edge = on_edge
+        self.pending = []
+        self._tok = None
+        self.directed = True
+        self.advance()
+
+    def advance(self):
+        if self.pending:
+            self._tok = self.pending.pop()
+        else:
+            self._tok = next(self.tokens, None)
+
+    @property
+    def tok(self):
+        """
+        Token actual; si es un 'edge_stmt' fuera del inicio de un enunciado se separa en sus tokens
+        """
+        t = self._tok
+        if t is not None and t.kind == 'edge_stmt':
+            a, op, b = t.text
+            self.pending.extend((Token(';', ';', t.line), Token('id', b, t.line), Token('edgeop', op, t.line)))
+            self._tok = Token('id', a, t.line)
+        return self._tok
+
+    def error(self, msg):
+        raise DotError(msg, self.tok.line if self.tok is not None else -1)
+
+    def expect(self, kind):
+        if self.tok is None or self.tok.kind != kind:
+            self.error('se esperaba ' + repr(kind))
+        tok = self.tok
+        self.advance()
+        return tok
+
+    def accept(self, kind):
+        if self.tok is not None and self.tok.kind == kind:
+            self.advance()
+            return True
+        return False
+
+    def parse(self):
+        """
+        graph : [strict] (graph | digraph) [ID] '{' stmt_list '}'
+        :return: None
+        """
+        while self.tok is not None:
+            if self.tok.is_keyword('strict'):
+                self.advance()
+            if self.tok is None or not (self.tok.is_keyword('graph') or self.tok.is_keyword('digraph')):
+                self.error('se esperaba graph o digraph')
+            self.directed = self.tok.is_keyword('digraph')
+            self.advance()
+            if self.tok is not None and self.tok.kind == 'id':
+                self.advance()
+            self.expect('{')
+            self.stmt_list({}, {}, None)
+            self.expect('}')
+
+    def stmt_list(self, node_defaults, edge_defaults, members):
+        """
+        Lee enunciados hasta encontrar '}'
+        :param node_defaults: atributos predeterminados de los nodos en este alcance
+        :param edge_defaults: atributos predeterminados de las aristas en este alcance
+        :param members: diccionario (usado como conjunto ordenado) donde se agregan los nodos que aparecen en el
+            alcance
+        :return: None
+        """
+        while self.tok is not None and self.tok.kind != '}':
+            self.stmt(node_defaults, edge_defaults, members)
+            self.accept(';')
+
+            while self._tok is not None and self._tok.kind == 'edge_stmt':
+                a, op, b = self._tok.text
+                if node_defaults or members is not None:
+                    self.operand_name(a, node_defaults, members)
+                    self.operand_name(b, node_defaults, members)
+                self.on_edge(a, b, op, edge_defaults)
+                self.advance()
+
+    def stmt(self, node_defaults, edge_defaults, members):
+        tok = self.tok
+        if tok.kind == 'id' and tok.text.lower() in ('graph', 'node', 'edge'):
+            self.advance()
+            attrs = self.attr_list()
+            if tok.is_keyword('node'):
+                node_defaults.update(attrs)
+            elif tok.is_keyword('edge'):
+                edge_defaults.update(attrs)
+            return
+
+        left = self.operand(node_defaults, edge_defaults, members)
+        if left is None:
+            # asignación ID '=' ID a nivel de grafo
+            return
+
+        if self.tok is None or self.tok.kind != 'edgeop':
+            attrs = self.attr_list()
+            for name in left:
+                self.on_node(name, merge(node_defaults, attrs))
+            return
+
+        chain = [left]
+        ops = []
+        while self.tok is not None and self.tok.kind == 'edgeop':
+            ops.append(self.tok.text)
+            self.advance()
+            chain.append(self.operand(node_defaults, edge_defaults, members, allow_assign=False))
+
+        attrs = merge(edge_defaults, self.attr_list())
+        for i in range(len(ops)):
+            for a in chain[i]:
+                for b in chain[i + 1]:
+                    self.on_edge(a, b, ops[i], attrs)
+
+    def operand(self, node_defaults, edge_defaults, members, allow_assign=True):
+        """
+        Lee un node_id o un subgrafo
+        :return: lista de nombres de nodos que representa el operando, o None si era una asignación
+        """
+        tok = self.tok
+        if tok is None:
+            self.error('fin de archivo inesperado')
+
+        if tok.is_keyword('subgraph') or tok.kind == '{':
+            if tok.is_keyword('subgraph'):
+                self.advance()
+                if self.tok is not None and self.tok.kind == 'id':
+                    self.advance()
+            self.expect('{')
+            inner = {}
+            self.stmt_list(dict(node_defaults), dict(edge_defaults), inner)
+            self.expect('}')
+            if members is not None:
+                members.update(inner)
+            return list(inner)
+
+        name = self.expect('id').text
+        if allow_assign and self.accept('='):
+            self.expect('id')
+            return None
+
+        # puerto, se ignora
+        while self.accept(':'):
+            self.expect('id')
+
+        self.operand_name(name, node_defaults, members)
+        return [name]
+
+    def operand_name(self, name, node_defaults, members):
+        if members is not None:
+            members[name] = True
+        self.on_node(name, node_defaults)
+
+    def attr_list(self):
+        """
+        attr_list : '[' [a_list] ']' [attr_list]
+        :return: diccionario con los atributos
+        """
+        attrs = {}
+        while self.accept('['):
+            while self.tok is not None and self.tok.kind != ']':
+                key = self.expect('id').text
+                if self.accept('='):
+                    attrs[key] = self.expect('id').text
+                else:
+                    attrs[key] = 'true'
+                if not self.accept(','):
+                    self.accept(';')
+            self.expect(']')
+        return attrs
+
+
+def merge(defaults, attrs):
+    if not defaults:
+        return attrs
+    ret = dict(defaults)
+    ret.update(attrs)
+    return ret
+
+
+def parse_pos(text):
+    """
+    Convierte el atributo pos de DOT ("x,y" o "x,y!") a una tupla de flotantes
+    :param text: valor del atributo
+    :return: (x, y) o None si no se puede convertir
+    """
+    try:
+        x, y = text.rstrip('!').split(',')[:2]
+        return float(x), float(y)
+    except ValueError:
+        return None
+
+
+class DotReader:
+    """
+    Clase que lee un archivo DOT línea por línea y agrega sus nodos y aristas a un grafo por bloques
+    """
+
+    def __init__(self, g, chunk_size=CHUNK_SIZE, progress=None):
+        """
+        Constructor
+        :param g: grafo donde se agregan los nodos y aristas
+        :param chunk_size: número de aristas por bloque
+        :param progress: función progress(bytes_leidos, bytes_totales) que se llama después de cada bloque
+        """
+        self.graph = g
+        self.chunk_size = max(1, chunk_size)
+        self.progress = progress
+        self.nodes = []
+        self.node_attrs = []
+        self.edges = []
+        self.edge_names = []
+        self.edge_attrs = []
+        self.named = False
+        self.read = 0
+        self.total = 0
+
+    def on_node(self, name, attrs):
+        self.nodes.append(name)
+        if attrs:
+            self.node_attrs.append((name, attrs))
+        if len(self.nodes) >= 2 * self.chunk_size:
+            self.flush()
+
+    def on_edge(self, a, b, op, attrs):
+        # en un digraph el nombre es el mismo que el grafo construye por omisión, sólo se guarda en los demás casos
+        if op != '->':
+            self.named = True
+        if attrs:
+            self.edge_attrs.append((len(self.edges), attrs))
+        self.edges.append((a, b))
+        self.edge_names.append(a + op + b)
+        if len(self.edges) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Inserta en el grafo el bloque acumulado. Los atributos se asignan por columna a los renglones de node_data y
+        edge_data; pos se convierte a las coordenadas del nodo y un pos con '!' marca el nodo como fijo (ATTR_PINNED)
+        :return: None
+        """
+        g = self.graph
+        if self.nodes:
+            g.add_nodes_from(self.nodes)
+        if self.edges:
+            ids = g.add_edges_from(self.edges, names=self.edge_names if self.named else None, return_ids=True)
+            rows = [ids[k] for k, attrs in self.edge_attrs]
+            self.assign(g.edge_data, rows, [attrs for k, attrs in self.edge_attrs], len(g.edge_list))
+
+        if self.node_attrs:
+            index = g.node_index
+            rows = []
+            attrs = []
+            moved = []
+            for name, a in self.node_attrs:
+                i = index[name]
+                if 'pos' in a:
+                    pos = parse_pos(a['pos'])
+                    if pos is not None:
+                        moved.append((i, pos, a['pos'].endswith('!')))
+                        a = {k: v for k, v in a.items() if k != 'pos'}
+                rows.append(i)
+                attrs.append(a)
+            n = len(g.node_names)
+            self.assign(g.node_data, rows, attrs, n)
+            if moved:
+                i, pos, pinned = zip(*moved)
+                i = numpy.array(i)
+                g.pos.data[i] = pos
+                g.node_data.assign(ATTR_PINNED, i, numpy.array(pinned), n)
+                g.positions_changed()
+
+        self.nodes = []
+        self.node_attrs = []
+        self.edges = []
+        self.edge_names = []
+        self.edge_attrs = []
+
+        if self.progress is not None:
+            self.progress(self.read, self.total)
+
+    @staticmethod
+    def assign(table, rows, attrs, size):
+        """
+        Asigna los atributos leídos agrupándolos por nombre, una llamada a la tabla por atributo
+        :param table: AttrTable
+        :param rows: renglón de cada diccionario de atributos
+        :param attrs: lista de diccionarios de atributos
+        :param size: número de renglones de la tabla
+        :return: None
+        """
+        columns = {}
+        for row, a in zip(rows, attrs):
+            for key, value in a.items():
+                column = columns.setdefault(key, ([], []))
+                column[0].append(row)
+                column[1].append(value)
+        for key, (index, values) in columns.items():
+            table.assign(key, numpy.array(index, dtype=numpy.int64), numpy.array(values, dtype=object), size)
+
+    def lines(self, f):
+        for raw in f:
+            self.read += len(raw)
+            yield raw.decode('utf-8')
+
+    def read_file(self, archivo):
+        """
+        Lee un archivo DOT completo
+        :param archivo: nombre del archivo
+        :return: el grafo
+        """
+        self.total = os.path.getsize(archivo)
+        with open(archivo, 'rb') as f, self.graph.bulk_insert():
+            parser = Parser(tokenize(self.lines(f)), self.on_node, self.on_edge)
+            parser.parse()
+            self.flush()
+        self.graph.directed = parser.directed
+        return self.graph
+
+
+def quote(name):
+    """
+    Convierte un nombre en un ID de DOT, agregando comillas si hace falta
+    :param name: nombre del nodo
+    :return: ID válido en DOT
+    """
+    name = str(name)
+    if is_plain(name):
+        return name
+    return '"' + name.replace('"', '\\"') + '"'
+
+
+def format_value(value):
+    """
+    Convierte el valor de un atributo a un ID de DOT
+    :param value: valor de una columna de atributos
+    :return: ID válido en DOT
+    """
+    if isinstance(value, numpy.generic):
+        value = value.item()
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return quote(value)
+
+
+def format_attrs(columns, i):
+    """
+    Lista de atributos de un renglón, con el formato de DOT
+    :param columns: diccionario nombre -> (valores, renglones asignados o None si están todos)
+    :param i: número de renglón
+    :return: ' [a=x, b=y]' o '' si el renglón no tiene atributos
+    """
+    attrs = [quote(name) + '=' + format_value(values[i])
+             for name, (values, present) in columns.items() if present is None or present[i]]
+    return ' [' + ', '.join(attrs) + ']' if attrs else ''
+
+
+def write(g, f, positions=False):
+    """
+    Escribe el grafo en formato DOT, ver write_arrays
+    :param g: grafo
+    :param f: archivo abierto en modo texto
+    :param positions: escribir la posición de todos los nodos, no sólo la de los que la traían al leerlos
+    :return: None
+    """
+    n = len(g.node_list)
+    m = len(g.edge_list)
+    node_attrs = {name: (g.node_data.column(name, n), g.node_data.present[name].view()[:n]) for name in g.node_data}
+    edge_attrs = {name: (g.edge_data.column(name, m), g.edge_data.present[name].view()[:m]) for name in g.edge_data}
+    write_arrays(f, g.node_names, g.src.view()[:m], g.dst.view()[:m], g.directed, node_attrs, edge_attrs,
+                 g.pos.view()[:n], positions)
+
+
+def write_arrays(f, names, src, dst, directed=True, node_attrs=None, edge_attrs=None, pos=None, positions=False):
+    """
+    Escribe un grafo en formato DOT, una arista por línea, sin construir todo el texto en memoria; un grafo no
+    dirigido se escribe como graph con --.
+
+    Se escriben como enunciados de nodo los nodos sin aristas y los que tienen atributos, antes de las aristas. Si así
+    los nodos no se crearían en el mismo órden al volver a leer el archivo, se escriben todos. Las columnas cuyo nombre
+    empieza con '_' son internas y no se escriben, salvo ATTR_PINNED, que decide a qué nodos se les escribe pos
+    :param f: archivo abierto en modo texto
+    :param names: secuencia con el nombre de cada nodo
+    :param src: arreglo con el índice del nodo origen de cada arista
+    :param dst: arreglo con el índice del nodo destino de cada arista
+    :param directed: escribir digraph con -> o graph con --
+    :param node_attrs: diccionario nombre -> (valores, renglones asignados o None si están todos) de los nodos
+    :param edge_attrs: diccionario nombre -> (valores, renglones asignados o None si están todos) de las aristas
+    :param pos: arreglo (n, 2) con la posición de cada nodo, opcional
+    :param positions: escribir la posición de todos los nodos; si es False sólo la de los que tienen ATTR_PINNED
+    :return: None
+    """
+    n = len(names)
+    node_attrs = node_attrs or {}
+    node_columns = {k: v for k, v in node_attrs.items() if not k.startswith('_')}
+    edge_columns = {k: v for k, v in (edge_attrs or {}).items() if not k.startswith('_')}
+    if pos is not None and (positions or ATTR_PINNED in node_attrs):
+        pinned, present = node_attrs.get(ATTR_PINNED, (numpy.zeros(n, dtype=bool), None))
+        node_columns['pos'] = (PosColumn(pos, pinned), None if positions else present)
+
+    ends = numpy.empty(2 * len(src), dtype=numpy.int64)
+    ends[0::2] = src
+    ends[1::2] = dst
+    flagged = numpy.bincount(ends, minlength=n) == 0
+    for values, present in node_columns.values():
+        if present is None:
+            flagged[:] = True
+        else:
+            flagged |= numpy.asarray(present, dtype=bool)
+
+    # órden en que se crearían los nodos al leer: primero los enunciados de nodo y luego según aparecen en las aristas
+    first = numpy.unique(ends, return_index=True)[1]
+    mentioned = numpy.full(n, len(ends), dtype=numpy.int64)
+    mentioned[ends[first]] = first
+    rest = numpy.flatnonzero(~flagged)
+    if numpy.any(numpy.diff(mentioned[rest]) < 0) or (len(rest) and numpy.any(flagged[rest[0]:])):
+        flagged[:] = True
+
+    op = ' -> ' if directed else ' -- '
+    f.write('digraph X {\n' if directed else 'graph X {\n')
+    for i in numpy.flatnonzero(flagged).tolist():
+        f.write(quote(names[i]) + format_attrs(node_columns, i) + ';\n')
+    for e, (u, v) in enumerate(zip(src.tolist(), dst.tolist())):
+        f.write(quote(names[u]) + op + quote(names[v]) + format_attrs(edge_columns, e) + ';\n')
+    f.write('}\n')
+
+
+class PosColumn:
+    """
+    Columna con el atributo pos de DOT de cada nodo, se forma cuando se pide
+    """
+
+    def __init__(self, pos, pinned):
+        self.pos = pos
+        self.pinned = pinned
+
+    def __getitem__(self, i):
+        x, y = self.pos[i].tolist()
+        return repr(x) + ',' + repr(y) + ('!' if self.pinned[i] else '')
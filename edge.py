@@ -1,50 +1,192 @@
+import collections.abc
+import types
+
 import pygame
 
 from util import draw_dashed_line
 from names import *
 
 
+# estilo por omisión, compartido por todas las aristas hasta que alguna lo cambia con Edge.style()
+DEFAULT_STYLE = types.MappingProxyType({
+    STYLE_COLOR: (200, 200, 200),
+    STYLE_THICKNESS: 1,
+    STYLE_DOTTED: False,
+    STYLE_SIZE: 10,
+    STYLE_SHOW_ID: False,
+    STYLE_ANTIALIAS: False,
+})
+
+def style_key(style):
+    """
+    Llave para buscar un estilo en la tabla de estilos compartidos
+    :param style: diccionario de estilo
+    :return: tupla con las parejas (llave, valor) o None si algún valor no se puede usar como llave
+    """
+    key = tuple(sorted(style.items(), key=lambda kv: kv[0]))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class EdgeAttrs(collections.abc.MutableMapping):
+    """
+    Clase que presenta los atributos de una arista como el diccionario atrib de antes: ATTR_STYLE es el estilo
+    compartido (de sólo lectura, se cambia con Edge.style()) y las demás llaves son columnas de graph.edge_data
+    """
+
+    __slots__ = ('edge',)
+
+    def __init__(self, edge):
+        self.edge = edge
+
+    def __getitem__(self, key):
+        g = self.edge.graph
+        if key == ATTR_STYLE:
+            return g.edge_style(self.edge.index)
+        return g.edge_data.get(key, self.edge.index)
+
+    def __setitem__(self, key, value):
+        g = self.edge.graph
+        if key == ATTR_STYLE:
+            g.set_edge_style(self.edge.index, value)
+        else:
+            g.edge_data.set(key, self.edge.index, value, len(g.edge_list))
+
+    def __delitem__(self, key):
+        if key == ATTR_STYLE:
+            raise KeyError(key)
+        self.edge.graph.edge_data.unset(key, self.edge.index)
+
+    def __iter__(self):
+        yield ATTR_STYLE
+        yield from (name for name in self.edge.graph.edge_data.names(self.edge.index) if name != ATTR_STYLE)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class EdgeList(collections.abc.Sequence):
+    """
+    Clase secuencia de las aristas de un grafo en órden de inserción; los objetos Edge se crean cuando se piden
+    """
+
+    __slots__ = ('graph',)
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph.dst)
+
+    def __getitem__(self, i):
+        m = len(self)
+        if isinstance(i, slice):
+            return [Edge(self.graph, e) for e in range(*i.indices(m))]
+        if i < 0:
+            i += m
+        if not 0 <= i < m:
+            raise IndexError(i)
+        return Edge(self.graph, i)
+
+    def __iter__(self):
+        g = self.graph
+        for e in range(len(self)):
+            yield Edge(g, e)
+
+
+class EdgeMap(collections.abc.Mapping):
+    """
+    Clase diccionario nombre -> arista de un grafo, sobre Graph.edge_index()
+    """
+
+    __slots__ = ('graph',)
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        return Edge(self.graph, self.graph.edge_index()[name])
+
+    def __contains__(self, name):
+        return name in self.graph.edge_index()
+
+    def __iter__(self):
+        return iter(self.graph.edge_index())
+
+    def __len__(self):
+        return len(self.graph.edge_index())
+
+
 class Edge:
     """
     Clase arista
+
+    es sólo una referencia (grafo, número de arista): los extremos están en los arreglos src y dst del grafo, el estilo
+    en su tabla de estilos compartidos y los demás atributos en las columnas de graph.edge_data. Dos objetos Edge con
+    el mismo grafo y número son la misma arista
     """
 
-    def __init__(self, source, target, id):
+    __slots__ = ('graph', 'index')
+
+    def __init__(self, graph, index):
         """
         Constructor
-        :param source: nodo fuente
-        :param target: nodo destino
-        :param id: identificador de la arista
+        :param graph: grafo al que pertenece la arista
+        :param index: número de la arista en el grafo
         """
-        self.n0 = source
-        self.n1 = target
-        self.id = id
-        self.atrib = {
-            ATTR_STYLE: {
-                STYLE_COLOR: (200, 200, 200),
-                STYLE_THICKNESS: 1,
-                STYLE_DOTTED: False,
-                STYLE_SIZE: 10,
-                STYLE_SHOW_ID: False,
-                STYLE_ANTIALIAS: False,
-            },
-        }
+        self.graph = graph
+        self.index = index
+
+    @property
+    def u(self):
+        return int(self.graph.src.data[self.index])
+
+    @property
+    def v(self):
+        return int(self.graph.dst.data[self.index])
+
+    @property
+    def n0(self):
+        return self.graph.node_list[self.graph.src.data[self.index]]
+
+    @property
+    def n1(self):
+        return self.graph.node_list[self.graph.dst.data[self.index]]
+
+    @property
+    def id(self):
+        return self.graph.edge_name(self.index)
+
+    @property
+    def atrib(self):
+        return EdgeAttrs(self)
+
+    def __eq__(self, other):
+        return isinstance(other, Edge) and self.graph is other.graph and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.graph), self.index))
 
     def __str__(self):
         """
         Convertir arista en str
         :return: representación textual de la arista
         """
-        return self.id
+        return str(self.id)
 
     def style(self, est, val):
         """
-        Establece un valor de estilo en la arista
+        Establece un valor de estilo en la arista; el estilo nuevo se comparte con las aristas que tengan el mismo
         :param est: llave del estilo
         :param val: valor del estilo
         :return:
         """
-        self.atrib[ATTR_STYLE][est] = val
+        style = dict(self.graph.edge_style(self.index))
+        style[est] = val
+        self.graph.set_edge_style(self.index, style)
 
     def draw(self, viewport, transform=None):
         """
@@ -55,31 +197,27 @@ class Edge:
         surf = viewport.frame.surf
         # n0 = g.transform.transformar(self.n0.atrib[nodo.ATTR_POS])
         # n1 = g.transform.transformar(self.n1.atrib[nodo.ATTR_POS])
-        n0 = self.n0.attr[ATTR_POS_VP]
-        n1 = self.n1.attr[ATTR_POS_VP]
-        if self.atrib[ATTR_STYLE][STYLE_DOTTED]:
-            draw_dashed_line(surf, self.atrib[ATTR_STYLE][STYLE_COLOR],
+        n0 = self.n0.pos_vp
+        n1 = self.n1.pos_vp
+        style = self.graph.edge_style(self.index)
+        if style[STYLE_DOTTED]:
+            draw_dashed_line(surf, style[STYLE_COLOR],
                              n0,
                              n1,
-                             self.atrib[ATTR_STYLE][STYLE_THICKNESS],
-                             self.atrib[ATTR_STYLE][STYLE_SIZE])
-        elif self.atrib[ATTR_STYLE][STYLE_ANTIALIAS]:
-            pygame.draw.aaline(surf, self.atrib[ATTR_STYLE][STYLE_COLOR],
+                             style[STYLE_THICKNESS],
+                             style[STYLE_SIZE])
+        elif style[STYLE_ANTIALIAS]:
+            pygame.draw.aaline(surf, style[STYLE_COLOR],
                                n0,
                                n1,
-                               self.atrib[ATTR_STYLE][STYLE_THICKNESS])
+                               style[STYLE_THICKNESS])
         else:
-            pygame.draw.line(surf, self.atrib[ATTR_STYLE][STYLE_COLOR],
+            pygame.draw.line(surf, style[STYLE_COLOR],
                              n0,
                              n1,
-                             self.atrib[ATTR_STYLE][STYLE_THICKNESS])
-
-        try:
-            if self.atrib[ATTR_STYLE][STYLE_SHOW_ID]:
-                pos = (n0 + n1) / 2
-                lon = len(str(self.id)) * viewport.tam_fuente / 4
-                viewport.frame.text((pos[0] - lon, pos[1] - viewport.tam_fuente / 3),
-                                    self.atrib[ATTR_STYLE][STYLE_COLOR],
-                                    str(self.id))
-        except:
-            print('Except: g.fuente.render_to()')
+                             style[STYLE_THICKNESS])
+
+        if style[STYLE_SHOW_ID]:
+            label = viewport.frame.label(style[STYLE_COLOR], str(self.id))
+            pos = (n0 + n1) / 2
+            surf.blit(label, (pos[0] - label.get_width() / 2, pos[1] - label.get_height() / 2))
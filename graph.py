@@ -1,15 +1,210 @@
+import contextlib
+import io
 import math
 import random
 import numpy
 import threading
+import types
+import warnings
 
-from edge import Edge
-from node import Node
-from util import draw_dashed_rect, Transform
+import csr
+import dot
+
+from edge import Edge, EdgeList, EdgeMap, style_key, DEFAULT_STYLE as EDGE_STYLE
+from node import Node, NodeList, NodeMap, DEFAULT_STYLE as NODE_STYLE
+from render import GraphRenderer
+from util import draw_dashed_rect, Transform, GrowableArray, AttrTable, gc_paused
 from names import *
 
 WRITING_LOCK = threading.Lock()
 
+ADJ_TAIL = 1024     # aristas nuevas que se recorren sin reconstruir la adyacencia
+
+
+def intern_style(styles, index, style):
+    """
+    Busca o agrega un estilo a una tabla de estilos compartidos
+    :param styles: lista de estilos (de sólo lectura)
+    :param index: diccionario style_key -> posición en styles
+    :param style: diccionario de estilo
+    :return: posición del estilo en styles
+    """
+    key = style_key(style)
+    ix = index.get(key) if key is not None else None
+    if ix is None:
+        ix = len(styles)
+        styles.append(types.MappingProxyType(dict(style)))
+        if key is not None:
+            index[key] = ix
+    return ix
+
+
+def extent_of(pos):
+    """
+    Rectángulo que delimita un conjunto de posiciones
+    :param pos: arreglo (n, 2)
+    :return: arreglo [[xmin, ymin], [xmax, ymax]], o [[-1, -1], [1, 1]] si las posiciones no delimitan un área
+    """
+    if len(pos) == 0:
+        return extent_from(numpy.full(2, math.inf), numpy.full(2, -math.inf))
+    return extent_from(pos.min(axis=0), pos.max(axis=0))
+
+
+def extent_from(I, F):
+    """
+    Rectángulo a partir de las esquinas de un conjunto de posiciones
+    :param I: esquina inferior (xmin, ymin)
+    :param F: esquina superior (xmax, ymax)
+    :return: arreglo [[xmin, ymin], [xmax, ymax]], o [[-1, -1], [1, 1]] si las esquinas no delimitan un área
+    """
+    if F[0] <= I[0] or F[1] <= I[1]:
+        return numpy.array(
+            [numpy.array([-1.0, -1.0]), numpy.array([1.0, 1.0])])
+    return numpy.array([I, F], dtype=float)
+
+
+class ExtentTracker:
+    """
+    Clase que mantiene las esquinas del rectángulo que delimita las posiciones de los nodos
+
+    los nodos nuevos y los que se mueven hacia afuera sólo agrandan el rectángulo; si un nodo que estaba en el borde
+    se mueve hacia adentro, o si se escriben muchas posiciones a la vez, el rectángulo se marca como sucio y se
+    recalcula con una sola reducción de NumPy hasta que se vuelve a pedir
+    """
+
+    def __init__(self, pos):
+        """
+        Constructor
+        :param pos: GrowableArray (n, 2) con las posiciones
+        """
+        self.pos = pos
+        self.lo = [math.inf, math.inf]
+        self.hi = [-math.inf, -math.inf]
+        self.n = 0              # las primeras n posiciones están dentro de [lo, hi]
+        self.dirty = False
+        self.recomputed = 0     # número de veces que se recorrieron todas las posiciones
+
+    def moved(self, i, old, new):
+        """
+        Avisa que se movió un nodo
+        :param i: índice del nodo
+        :param old: posición anterior (x, y)
+        :param new: posición nueva (x, y)
+        :return: None
+        """
+        if self.dirty or i >= self.n:
+            return
+        lo = self.lo
+        hi = self.hi
+        for c in (0, 1):
+            if (old[c] == lo[c] and new[c] > lo[c]) or (old[c] == hi[c] and new[c] < hi[c]):
+                self.dirty = True
+                return
+        for c in (0, 1):
+            lo[c] = min(lo[c], new[c])
+            hi[c] = max(hi[c], new[c])
+
+    def changed(self):
+        """
+        Avisa que se escribieron posiciones de cualquier nodo
+        :return: None
+        """
+        self.dirty = True
+
+    def bounds(self):
+        """
+        Esquinas del rectángulo que delimita todas las posiciones
+        :return: (lo, hi) como arreglos (2,)
+        """
+        n = len(self.pos)
+        if self.dirty:
+            # se limpia antes de leer: un cambio mientras se recorre vuelve a marcarlo
+            self.dirty = False
+            self.lo = [math.inf, math.inf]
+            self.hi = [-math.inf, -math.inf]
+            self.n = 0
+            self.recomputed += 1
+        if n > self.n:
+            pos = self.pos.data[self.n:n]
+            self.lo = numpy.minimum(self.lo, pos.min(axis=0)).tolist()
+            self.hi = numpy.maximum(self.hi, pos.max(axis=0)).tolist()
+            self.n = n
+        return numpy.array(self.lo), numpy.array(self.hi)
+
+
+MAX_PAIR_NODES = 1 << 32      # los códigos de parejas de PairIndex guardan cada índice de nodo en 32 bits
+
+
+def pair_codes(u, v):
+    """
+    Códigos de parejas (origen, destino): origen * 2**32 + destino, sin signo
+    :param u: índices de los nodos origen, menores que MAX_PAIR_NODES
+    :param v: índices de los nodos destino, menores que MAX_PAIR_NODES
+    :return: arreglo de uint64
+    """
+    return (numpy.asarray(u).astype(numpy.uint64) << numpy.uint64(32)) | numpy.asarray(v).astype(numpy.uint64)
+
+
+class PairIndex:
+    """
+    Clase índice de las parejas (origen, destino) de las aristas, para descartar las repetidas al agregar por bloques
+
+    los códigos de las parejas se guardan en corridas ordenadas, cada una con los números de sus aristas. Una corrida
+    nueva se mezcla con la última mientras ésta no sea más del doble de grande, así las corridas decrecen
+    geométricamente, hay O(log m) y cada arista se vuelve a copiar O(log m) veces en total
+    """
+
+    def __init__(self):
+        self.runs = []      # lista de (códigos ordenados, números de arista), de la más grande a la más chica
+
+    def __len__(self):
+        return sum(len(codes) for codes, _ in self.runs)
+
+    def add(self, codes, ids):
+        """
+        Agrega parejas al índice
+        :param codes: códigos de las parejas (ver pair_codes)
+        :param ids: número de arista de cada pareja
+        :return: None
+        """
+        while self.runs and len(self.runs[-1][0]) <= 2 * len(codes):
+            prev_codes, prev_ids = self.runs.pop()
+            codes = numpy.concatenate((prev_codes, codes))
+            ids = numpy.concatenate((prev_ids, ids))
+        order = numpy.argsort(codes, kind='stable')
+        self.runs.append((codes[order], ids[order]))
+
+    def find(self, codes):
+        """
+        Busca parejas en el índice
+        :param codes: códigos de las parejas
+        :return: número de la primera arista que se agregó con cada pareja, -1 si no está
+        """
+        ret = numpy.full(len(codes), -1, dtype=numpy.int64)
+        for run_codes, run_ids in self.runs:
+            pos = numpy.searchsorted(run_codes, codes)
+            pos[pos == len(run_codes)] = 0
+            hit = run_codes[pos] == codes
+            # si la pareja está en varias corridas (aristas agregadas con nombre) gana la arista más vieja
+            found = hit & ((ret < 0) | (run_ids[pos] < ret))
+            ret[found] = run_ids[pos[found]]
+        return ret
+
+
+class PositionSnapshot:
+    """
+    Clase copia de las posiciones de los nodos en un momento dado, junto con el número de aristas que ya existían, la
+    versión de las posiciones (Graph.pos_version) y su rectángulo; quien la publica ya no la modifica
+    """
+
+    __slots__ = ('pos', 'm', 'version', 'extent')
+
+    def __init__(self, pos, m, version, extent):
+        self.pos = pos
+        self.m = m
+        self.version = version
+        self.extent = extent
+
 
 class Graph:
     """
@@ -23,8 +218,40 @@ class Graph:
         Constructor
         """
         self.id = 'grafo'
-        self.nodes = {}
-        self.edges = {}
+        self.directed = True        # False si se leyó de un graph (aristas --) de DOT, para escribirlo igual
+        # los nodos son índices, como las aristas: los objetos Node se crean cuando se piden a nodes o node_list
+        self.node_names = []        # nombre de cada nodo en órden de inserción, la posición es node.index
+        self.node_index = {}        # nombre -> índice del nodo
+        self.nodes = NodeMap(self)
+        self.node_list = NodeList(self)
+        self.node_data = AttrTable()    # atributos de los nodos que no son posición ni estilo
+        self.deg = GrowableArray(numpy.int64)   # grado de cada nodo
+        self.pos = GrowableArray(float, (2,))   # coordenadas de los nodos, renglón node.index
+        self.pos_vp = None          # coordenadas de los nodos en el viewport, las calcula draw()
+        self.pos_version = 0        # cambia cada vez que se mueven nodos, ver positions_changed()
+        self.bounds = ExtentTracker(self.pos)   # esquinas de las posiciones, se actualizan al mover o agregar nodos
+        self.snapshot = None        # última PositionSnapshot publicada por un LayoutWorker, None si no hay
+        self.node_styles = [NODE_STYLE]
+        self._node_style_index = {style_key(NODE_STYLE): 0}
+        self.node_style_ix = GrowableArray(numpy.int32)     # índice en node_styles del estilo de cada nodo
+
+        # las aristas son números: sus extremos están en src y dst, su estilo es un índice a edge_styles y los
+        # demás atributos son columnas de edge_data
+        self.src = GrowableArray(numpy.int64)   # índice del nodo origen de cada arista
+        self.dst = GrowableArray(numpy.int64)   # índice del nodo destino de cada arista
+        self.edge_list = EdgeList(self)
+        self.edge_data = AttrTable()
+        self.edge_styles = [EDGE_STYLE]
+        self._style_index = {style_key(EDGE_STYLE): 0}
+        self._edges = {}            # nombre -> número de arista
+        self._names = {}            # número de arista -> nombre, sólo de las aristas que se agregaron con nombre
+        self._named = 0             # las primeras _named aristas ya están en el diccionario _edges
+        self._pairs = None          # PairIndex de las primeras _pair_count aristas, sólo durante bulk_insert()
+        self._pair_count = 0
+        self._bulk = 0              # bulk_insert() anidados
+        self._adj = None            # adyacencia CSR de las primeras _adj_m aristas
+        self._adj_m = 0
+
         self.attr = {
             ATTR_STYLE: {
                 STYLE_BACKGROUND: (20, 20, 20),
@@ -36,18 +263,20 @@ class Graph:
             ATTR_LAYERED: False,
         }
         self.threading = False
+        self.renderer = GraphRenderer(self)
 
     def clone(self):
         ret = Graph()
 
         ret.id = self.id + "_clon"
-        for n in self.nodes.values():
-            nn = ret.addNode(n.id)
-            nn.attr = n.attr.copy()
-            nn.attr[ATTR_NEIGHBORS] = []
-            nn.attr[ATTR_EDGES] = []
-
-        for m in self.edges.values():
+        ret.directed = self.directed
+        for i, name in enumerate(self.node_names):
+            nn = ret.addNode(name)
+            nn.pos = self.pos.data[i]
+            ret.set_node_style(i, self.node_style(i))
+        ret.node_data = self.node_data.copy()
+
+        for m in self.edge_list:
             e = ret.addEdge(m.id, m.n0.id, m.n1.id)
             # e.atrib = m.atrib.copy()
 
@@ -56,21 +285,186 @@ class Graph:
 
         return ret
 
+    @property
+    def edges(self):
+        """
+        Diccionario nombre -> arista
+        :return: EdgeMap del grafo
+        """
+        return EdgeMap(self)
+
+    def edge_index(self):
+        """
+        Diccionario nombre -> número de arista. Las aristas agregadas sin nombre se agregan al diccionario, con el
+        nombre 'origen->destino', hasta que se consulta
+        :return: diccionario
+        """
+        m = len(self.dst)
+        if self._named < m:
+            taken = []
+            with gc_paused():
+                for e in range(self._named, m):
+                    name = self.edge_name(e)
+                    if self._edges.setdefault(name, e) != e:
+                        taken.append(name)
+            self._named = m
+            if taken:
+                warnings.warn(str(len(taken)) + ' aristas sin nombre quedan fuera de edges porque su nombre ya lo '
+                              'tiene otra arista, por ejemplo ' + repr(taken[0]))
+        return self._edges
+
+    def edge_name(self, e):
+        """
+        Nombre de una arista
+        :param e: número de arista
+        :return: el nombre con que se agregó o 'origen->destino'
+        """
+        name = self._names.get(e)
+        if name is None:
+            name = str(self.node_names[self.src.data[e]]) + '->' + str(self.node_names[self.dst.data[e]])
+        return name
+
+    def edge_style(self, e):
+        """
+        Estilo de una arista
+        :param e: número de arista
+        :return: estilo compartido (de sólo lectura)
+        """
+        col = self.edge_data.columns.get(ATTR_STYLE)
+        if col is None or e >= len(col):
+            return self.edge_styles[0]
+        return self.edge_styles[col.data[e]]
+
+    def set_edge_style(self, e, style):
+        """
+        Cambia el estilo de una arista por otro, que se comparte con las demás aristas que tengan el mismo
+        :param e: número de arista
+        :param style: diccionario de estilo
+        :return: None
+        """
+        self.edge_data.column(ATTR_STYLE, len(self.edge_list), numpy.int32, 0)[e] = self.intern_edge_style(style)
+
+    def intern_edge_style(self, style):
+        """
+        Busca o agrega un estilo a la tabla de estilos de aristas
+        :param style: diccionario de estilo
+        :return: índice del estilo en edge_styles
+        """
+        return intern_style(self.edge_styles, self._style_index, style)
+
+    def positions_changed(self):
+        """
+        Avisa que se movieron nodos que ya estaban en el grafo; quien escriba directamente en pos debe llamarla para
+        que se reconstruyan los índices espaciales y se recalcule el rectángulo del grafo
+        :return: None
+        """
+        self.pos_version += 1
+        self.bounds.changed()
+
+    def node_moved(self, i, old):
+        """
+        Avisa que se movió un solo nodo; el rectángulo del grafo se actualiza sin recorrer las demás posiciones
+        :param i: índice del nodo
+        :param old: posición anterior del nodo
+        :return: None
+        """
+        self.pos_version += 1
+        self.bounds.moved(i, old, self.pos.data[i].tolist())
+
+    def set_node_style(self, i, style):
+        """
+        Cambia el estilo de un nodo por otro, que se comparte con los demás nodos que tengan el mismo
+        :param i: índice del nodo
+        :param style: diccionario de estilo
+        :return: None
+        """
+        self.node_style_ix.data[i] = intern_style(self.node_styles, self._node_style_index, style)
+
+    def node_style(self, i):
+        """
+        Estilo de un nodo
+        :param i: índice del nodo
+        :return: estilo compartido (de sólo lectura)
+        """
+        return self.node_styles[self.node_style_ix.data[i]]
+
+    def _build_adjacency(self):
+        m = len(self.dst)
+        self._adj = csr.build_csr(len(self.node_list), self.src.view()[:m], self.dst.view()[:m])
+        self._adj_m = m
+
+    def adjacency(self):
+        """
+        Adyacencia CSR (no dirigida) de todo el grafo; sólo se reconstruye si el grafo creció desde la última vez
+        :return: (indptr, indices, edge_ids), ver csr.build_csr
+        """
+        if self._adj is None or self._adj_m < len(self.dst) or len(self._adj[0]) <= len(self.node_list):
+            self._build_adjacency()
+        return self._adj
+
+    def incident_edges(self, i):
+        """
+        Aristas que inciden en un nodo, en el órden en que se agregaron. Se usa la adyacencia CSR de las aristas que
+        ya había la última vez que se construyó más un recorrido de las que llegaron después; la adyacencia se
+        reconstruye cuando las aristas nuevas son muchas
+        :param i: índice del nodo
+        :return: arreglo con los números de las aristas, una vez por extremo (los lazos aparecen dos veces)
+        """
+        m = len(self.dst)
+        if self._adj is None or m - self._adj_m > max(ADJ_TAIL, self._adj_m // 8):
+            self._build_adjacency()
+        indptr, indices, edge_ids = self._adj
+        m0 = self._adj_m
+
+        ret = edge_ids[indptr[i]:indptr[i + 1]] if i + 1 < len(indptr) else numpy.empty(0, dtype=numpy.int64)
+        if m0 < m:
+            s = self.src.view()[m0:m]
+            d = self.dst.view()[m0:m]
+            tail = numpy.sort(numpy.concatenate((numpy.flatnonzero(s == i), numpy.flatnonzero(d == i))))
+            ret = numpy.concatenate((ret, tail + m0))
+        return ret
+
+    def neighbors(self, i):
+        """
+        Vecinos de un nodo
+        :param i: índice del nodo
+        :return: arreglo con los índices de los vecinos, uno por arista incidente
+        """
+        e = self.incident_edges(i)
+        s = self.src.data[e]
+        return numpy.where(s == i, self.dst.data[e], s)
+
+    def _new_node(self, name):
+        # la posición, el grado y el estilo se agregan antes que el nodo para que quien lea node_list siempre los
+        # encuentre
+        self.pos.append((random.random(), random.random()))
+        self.deg.append(0)
+        self.node_style_ix.append(0)
+        i = self.node_index[name] = len(self.node_names)
+        self.node_names.append(name)
+        return i
+
+    def _append_edges(self, u, v):
+        # dst se agrega al último: len(dst) es el número de aristas completas
+        self.src.extend(u)
+        self.dst.extend(v)
+        deg = self.deg.view()
+        numpy.add.at(deg, u, 1)
+        numpy.add.at(deg, v, 1)
+
     def addNode(self, name):
         """
         Agregar nodo al grafo, primero verifica si el nodo ya existe, de lo contrario lo crea y lo agrega al diccionario
         :param name: nombre del nodo
         :return: el nodo que we encontró o se creó
         """
-        node = self.nodes.get(name)
-
-        if node is None:
-            node = Node(name)
+        i = self.node_index.get(name)
 
+        if i is None:
             with WRITING_LOCK:
-                self.nodes[name] = node
+                i = self._new_node(name)
 
-        return node
+        return Node(name, i, self)
 
     def addEdge(self, name, node0, node1):
         """
@@ -80,23 +474,168 @@ class Graph:
         :param node1: nodo destino
         :return: la arista creada
         """
-        e = self.edges.get(name)
+        e = self.edge_index().get(name)
 
         if e is None:
             n0 = self.addNode(node0)
             n1 = self.addNode(node1)
-            e = Edge(n0, n1, name)
 
             with WRITING_LOCK:
-                self.edges[name] = e
-
-            n0.attr.get(ATTR_NEIGHBORS).append(n1)
-            n1.attr.get(ATTR_NEIGHBORS).append(n0)
-
-            n0.attr.get(ATTR_EDGES).append(e)
-            n1.attr.get(ATTR_EDGES).append(e)
-
-        return e
+                e = len(self.dst)
+                self.src.append(n0.index)
+                self.dst.append(n1.index)
+                self.deg.data[n0.index] += 1
+                self.deg.data[n1.index] += 1
+                self._edges[name] = e
+                self._names[e] = name
+                self._named = e + 1
+
+        return Edge(self, e)
+
+    def add_nodes_from(self, names):
+        """
+        Agrega varios nodos al grafo tomando el candado una sola vez
+        :param names: iterable o arreglo de NumPy con los nombres de los nodos, los que ya existen se ignoran
+        :return: número de nodos agregados
+        """
+        if isinstance(names, numpy.ndarray):
+            names = names.tolist()
+
+        with WRITING_LOCK, gc_paused():
+            n0 = len(self.node_names)
+            index = self.node_index
+            for name in names:
+                if name not in index:
+                    self._new_node(name)
+            return len(self.node_names) - n0
+
+    def add_edges_from(self, edges, names=None, nodes=None, return_ids=False):
+        """
+        Agrega varias aristas al grafo tomando el candado una sola vez.
+
+        Si no se dan nombres, las aristas repetidas (mismo origen y destino, dentro del bloque o ya en el grafo) se
+        ignoran y el nombre 'origen->destino' no se construye hasta que se consulta edges. Si se dan nombres, se
+        ignoran las aristas cuyo nombre ya existe, igual que en addEdge
+        :param edges: iterable de pares (origen, destino) o arreglo (m, 2). Si se da nodes son posiciones dentro de
+                      nodes, si no son los nombres de los nodos. Los nodos que no existen se crean
+        :param names: secuencia con el nombre de cada arista, opcional
+        :param nodes: secuencia con los nombres de los nodos a los que se refieren las posiciones en edges, opcional
+        :param return_ids: regresar el número de arista de cada renglón de edges en lugar de cuántas se agregaron
+        :return: número de aristas agregadas, o arreglo con el número de arista de cada renglón (el de la arista que
+                 ya existía para los repetidos)
+        """
+        with WRITING_LOCK, gc_paused():
+            if nodes is not None:
+                edges = numpy.asarray(edges, dtype=numpy.int64).reshape(-1, 2)
+                used = numpy.flatnonzero(numpy.bincount(edges.ravel(), minlength=len(nodes)))
+                index = numpy.zeros(len(nodes), dtype=numpy.int64)
+                index[used] = self._node_indices([nodes[i] for i in used.tolist()])
+                u = index[edges[:, 0]]
+                v = index[edges[:, 1]]
+            else:
+                if isinstance(edges, numpy.ndarray):
+                    edges = edges.tolist()
+                # los nodos nuevos se crean en el órden en que aparecen, origen y destino de cada arista
+                index = self._node_indices([name for edge in edges for name in edge])
+                u = index[0::2]
+                v = index[1::2]
+
+            if names is None:
+                keep, ids = self._new_pairs(u, v)
+            else:
+                by_name = self.edge_index()
+                keep = numpy.zeros(len(u), dtype=bool)
+                ids = numpy.empty(len(u), dtype=numpy.int64)
+                e = len(self.dst)
+                for k, name in enumerate(names):
+                    old = by_name.get(name)
+                    if old is None:
+                        by_name[name] = e
+                        self._names[e] = name
+                        keep[k] = True
+                        old = e
+                        e += 1
+                    ids[k] = old
+                self._named = e
+
+            u = u[keep]
+            v = v[keep]
+            self._append_edges(u, v)
+            if not self._bulk:
+                self._release_pairs()
+            return ids if return_ids else len(u)
+
+    @contextlib.contextmanager
+    def bulk_insert(self):
+        """
+        Mantiene entre llamadas a add_edges_from el índice de parejas con que se descartan las aristas repetidas, para
+        agregar un grafo grande por bloques sin reconstruirlo en cada bloque; al salir se libera
+        :return: administrador de contexto
+        """
+        self._bulk += 1
+        try:
+            yield self
+        finally:
+            self._bulk -= 1
+            if not self._bulk:
+                self._release_pairs()
+
+    def _node_indices(self, names):
+        """
+        Índices de los nodos con los nombres dados, creando los que no existen. Se llama con el candado tomado
+        :param names: lista de nombres
+        :return: arreglo con el índice de cada nodo
+        """
+        get = self.node_index.get
+        ret = [get(name) for name in names]
+        for k, i in enumerate(ret):
+            if i is None:
+                i = get(names[k])
+                ret[k] = i if i is not None else self._new_node(names[k])
+        return numpy.array(ret, dtype=numpy.int64)
+
+    def _new_pairs(self, u, v):
+        """
+        Marca las aristas (u, v) que no están repetidas dentro del bloque ni en el grafo, dejando la primera aparición.
+        Se llama con el candado tomado
+        :param u: índices de los nodos origen
+        :param v: índices de los nodos destino
+        :return: (arreglo booleano, True para las aristas que hay que agregar; número de arista de cada renglón, el
+                 de la arista que ya existía o el de la primera aparición en el bloque para los repetidos)
+        """
+        m = len(self.dst)
+        if len(self.node_names) > MAX_PAIR_NODES:
+            raise ValueError('no se pueden descartar aristas repetidas con más de 2**32 nodos')
+
+        # se agregan al índice las aristas que llegaron desde la última vez
+        if self._pairs is None:
+            self._pairs = PairIndex()
+            self._pair_count = 0
+        if self._pair_count < m:
+            s = self.src.view()[self._pair_count:m]
+            d = self.dst.view()[self._pair_count:m]
+            self._pairs.add(pair_codes(s, d), numpy.arange(self._pair_count, m))
+            self._pair_count = m
+
+        codes = pair_codes(u, v)
+        ids = self._pairs.find(codes)
+
+        # primera aparición de cada pareja dentro del bloque
+        order = numpy.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        first = numpy.ones(len(codes), dtype=bool)
+        first[1:] = sorted_codes[1:] != sorted_codes[:-1]
+        leader = numpy.empty(len(codes), dtype=numpy.int64)
+        leader[order] = order[first][numpy.cumsum(first) - 1]
+
+        keep = (ids < 0) & (leader == numpy.arange(len(codes)))
+        new_ids = m + numpy.cumsum(keep) - 1
+        ids = numpy.where(ids >= 0, ids, new_ids[leader])
+        return keep, ids
+
+    def _release_pairs(self):
+        self._pairs = None
+        self._pair_count = 0
 
     def getNode(self, name):
         """
@@ -116,7 +655,7 @@ class Graph:
         if n is None:
             return 0
 
-        return len(n.attr[ATTR_NEIGHBORS])
+        return int(self.deg.data[n.index])
 
     def __str__(self):
         """
@@ -138,38 +677,16 @@ class Graph:
         Genera una representación GV del grafo
         :return: representación en GV del grafo
         """
-        retVal = 'digraph X {\n'
-        for e in self.edges.values():
-            n0 = e.n0.id
-            n1 = e.n1.id
-            retVal += n0 + ' -> ' + n1 + ';\n'
-        retVal += '}\n'
-
-        return retVal
+        f = io.StringIO()
+        dot.write(self, f)
+        return f.getvalue()
 
     def compute_ext(self):
         """
-        Calcula el rectangulo que delimita la zona del grafo
+        Calcula el rectangulo que delimita la zona del grafo, a partir de las esquinas que mantiene bounds
         :return:
         """
-        # if len(self.nodos) < 2:
-        #     self.extent = numpy.array([numpy.array([-1.0, -1.0]), numpy.array([1.0, 1.0])])
-        #     return self.extent
-
-        I = numpy.array([math.inf, math.inf])
-        F = numpy.array([-math.inf, -math.inf])
-        for v in self.nodes.values():
-            I[0] = min(I[0], v.attr[ATTR_POS][0])
-            I[1] = min(I[1], v.attr[ATTR_POS][1])
-            F[0] = max(F[0], v.attr[ATTR_POS][0])
-            F[1] = max(F[1], v.attr[ATTR_POS][1])
-
-        if F[0] <= I[0] or F[1] <= I[0]:
-            self.extent = numpy.array(
-                [numpy.array([-1.0, -1.0]), numpy.array([1.0, 1.0])])
-        else:
-            self.extent = numpy.array([I, F])
-
+        self.extent = extent_from(*self.bounds.bounds())
         return self.extent
 
     def save(self, archivo):
@@ -179,34 +696,32 @@ class Graph:
         :return:
         """
         print('Guardando', archivo, ' ...', end='')
-        gv = self.toGraphviz()
-        f = open(archivo, 'w+')
-        f.write(gv)
-        print('Ok.', len(self.nodes), 'nodos,', len(self.edges), 'aristas')
+        with open(archivo, 'w') as f:
+            dot.write(self, f)
+        print('Ok.', len(self.nodes), 'nodos,', len(self.edge_list), 'aristas')
 
     @staticmethod
-    def load(archivo):
+    def load(archivo, chunk_size=dot.CHUNK_SIZE, progress=None):
         """
-        Lee el grafo de un archivo
+        Lee el grafo de un archivo DOT, línea por línea y agregando las aristas por bloques
         :param archivo: nombre del archivo
+        :param chunk_size: número de aristas por bloque
+        :param progress: función progress(bytes_leidos, bytes_totales) que se llama después de cada bloque
         :return:
         """
         print('Leyendo', archivo, ' ...', end='')
         g = Graph()
-        f = open(archivo, 'r')
-        lines = f.readlines()
-        for i in range(1, len(lines)):
-            tokens = lines[i].split(' ')
-            if len(tokens) < 3:
-                continue
-            tokens[2] = tokens[2].rstrip(';\n')
-            g.addEdge(tokens[0] + tokens[1] + tokens[2], tokens[0], tokens[2])
-
-        print('Ok.', len(g.nodes), 'nodos,', len(g.edges), 'aristas')
+        dot.DotReader(g, chunk_size, progress).read_file(archivo)
+
+        print('Ok.', len(g.nodes), 'nodos,', len(g.edge_list), 'aristas')
         return g
 
     def getRandomEdge(self):
-        return random.choice(list(self.edges.values()))
+        """
+        Elige una arista al azar, con la misma probabilidad para todas, en O(1)
+        :return: la arista
+        """
+        return Edge(self, random.randrange(len(self.dst)))
 
     def style(self, est, val):
         """
@@ -227,7 +742,12 @@ class Graph:
         #     layout.Random(self).ejecutar()
         #     self.atrib[Grafo.ATTR_ACOMODADO] = True
 
-        self.compute_ext()
+        # si un LayoutWorker está moviendo los nodos se dibuja la última copia completa que publicó
+        snapshot = self.snapshot
+        if snapshot is None:
+            self.compute_ext()
+        else:
+            self.extent = snapshot.extent
         self.transformacion = Transform(self.extent, viewport.rect)
 
         # viewport.frame.surf(self.atrib[Grafo.ATTR_ESTILO][Grafo.ESTILO_FONDO])
@@ -241,12 +761,9 @@ class Graph:
             draw_dashed_rect(viewport.surf, (255, 128, 128),
                              viewport.rect[0], viewport.rect[1])
 
-        for v in self.nodes.values():
-            v.attr[ATTR_POS_VP] = self.transformacion.transform(
-                v.attr[ATTR_POS])
-
-        for a in self.edges.values():
-            a.draw(viewport)
-
-        for v in self.nodes.values():
-            v.draw(viewport, self.transformacion)
+        if snapshot is None:
+            # primero las aristas: sus nodos siempre se agregan antes que ellas
+            m = len(self.edge_list)
+            n = len(self.node_list)
+            snapshot = PositionSnapshot(self.pos.data[:n], m, self.pos_version, self.extent)
+        self.renderer.draw(viewport, self.transformacion, snapshot)
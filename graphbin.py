@@ -0,0 +1,276 @@
+"""
+Formato binario de grafos
+
+    encabezado   MAGIC, versión, n, m, número de secciones, banderas
+    tabla        por sección: nombre, tipo de NumPy, desplazamiento, renglones, columnas
+    secciones    cada una alineada a ALIGN bytes
+
+Las secciones son arreglos de NumPy guardados tal cual (little endian), por lo que al abrir el archivo con
+numpy.memmap cada sección es una vista sin copia y el sistema operativo sólo lee las páginas que se tocan.
+
+Los atributos de los nodos y aristas son secciones 'n:nombre' y 'e:nombre'. Una columna de texto se guarda como
+desplazamientos en esa sección y los bytes UTF-8 en 'n:nombre/text'; si no todos los renglones tienen el atributo,
+'n:nombre/mask' dice cuáles sí.
+"""
+import struct
+
+import numpy
+
+import dot
+from csr import CSRGraph
+from graph import Graph
+
+MAGIC = b'PYGRAFO\x01'
+VERSION = 2
+ALIGN = 64
+
+HEADER = struct.Struct('<8sIQQII')          # magic, versión, n, m, número de secciones, banderas
+HEADER_V1 = struct.Struct('<8sIQQI')        # la versión 1 no tenía banderas, sus grafos son dirigidos
+FLAG_UNDIRECTED = 1
+NAME_SIZE = 24                              # bytes del nombre de una sección, en UTF-8
+SECTION = struct.Struct('<%ds8sQQQ' % NAME_SIZE)    # nombre, tipo, desplazamiento, renglones, columnas
+
+NODE_ATTR_PREFIX = 'n:'
+EDGE_ATTR_PREFIX = 'e:'
+TEXT_SUFFIX = '/text'
+MASK_SUFFIX = '/mask'
+
+
+class NameTable:
+    """
+    Tabla de nombres de nodos guardada como desplazamientos y un bloque de bytes UTF-8; cada nombre se decodifica sólo
+    cuando se pide
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @staticmethod
+    def encode(names):
+        """
+        Codifica una secuencia de nombres
+        :param names: secuencia de nombres (se convierten a str)
+        :return: (desplazamientos, bloque de bytes)
+        """
+        encoded = [str(name).encode('utf-8') for name in names]
+        offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return offsets, numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8)
+
+
+def save(g, archivo, node_attrs=None, edge_attrs=None, edge_names=True):
+    """
+    Guarda un grafo en formato binario. Además de las columnas dadas se guardan las que ya tiene el grafo (node_data y
+    edge_data de un Graph, node_attrs y edge_attrs de un CSRGraph)
+    :param g: CSRGraph o Graph
+    :param archivo: nombre del archivo
+    :param node_attrs: diccionario nombre -> arreglo (n,) o (n, k) con columnas de atributos de los nodos; con el
+        prefijo y el sufijo, el nombre debe caber en NAME_SIZE bytes
+    :param edge_attrs: diccionario nombre -> arreglo (m,) o (m, k) con columnas de atributos de las aristas; con el
+        prefijo y el sufijo, el nombre debe caber en NAME_SIZE bytes
+    :param edge_names: guardar los nombres de las aristas; si es False se reconstruyen como 'origen->destino'
+    :return: None
+    """
+    if isinstance(g, Graph):
+        g = CSRGraph.from_graph(g)
+
+    offsets, blob = NameTable.encode(g.names)
+    sections = [
+        ('names_offsets', offsets),
+        ('names', blob),
+        ('src', g.src),
+        ('dst', g.dst),
+        ('indptr', g.indptr),
+        ('indices', g.indices),
+        ('edge_ids', g.edge_ids),
+    ]
+    if g.pos is not None:
+        sections.append(('pos', numpy.asarray(g.pos, dtype=float)))
+    if edge_names:
+        e_offsets, e_blob = NameTable.encode(g.edge_name(e) for e in range(g.num_edges))
+        sections.append(('edge_names_offsets', e_offsets))
+        sections.append(('edge_names', e_blob))
+    sections += column_sections(NODE_ATTR_PREFIX, g.node_attrs, g.node_present, node_attrs)
+    sections += column_sections(EDGE_ATTR_PREFIX, g.edge_attrs, g.edge_present, edge_attrs)
+
+    # el nombre de la sección ocupa un campo fijo del encabezado; uno más largo se truncaría y podría chocar con otro
+    for name, _ in sections:
+        if len(name.encode('utf-8')) > NAME_SIZE:
+            raise ValueError('el nombre de sección ' + repr(name) + ' ocupa más de ' + str(NAME_SIZE) + ' bytes')
+
+    # desplazamiento de cada sección, alineado
+    table = []
+    offset = align(HEADER.size + SECTION.size * len(sections))
+    for name, arr in sections:
+        arr = numpy.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<'))
+        rows = arr.shape[0] if arr.ndim > 0 else 1
+        cols = arr.shape[1] if arr.ndim > 1 else 0
+        table.append((name, arr, offset, rows, cols))
+        offset = align(offset + arr.nbytes)
+
+    with open(archivo, 'wb') as f:
+        flags = 0 if g.directed else FLAG_UNDIRECTED
+        f.write(HEADER.pack(MAGIC, VERSION, g.num_nodes, g.num_edges, len(table), flags))
+        for name, arr, offset, rows, cols in table:
+            f.write(SECTION.pack(name.encode('utf-8'), arr.dtype.str.encode('ascii'), offset, rows, cols))
+        for name, arr, offset, rows, cols in table:
+            f.seek(offset)
+            f.write(memoryview(arr).cast('B'))
+
+
+def align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def column_sections(prefix, attrs, present, extra):
+    """
+    Secciones de las columnas de atributos de los nodos o de las aristas
+    :param prefix: NODE_ATTR_PREFIX o EDGE_ATTR_PREFIX
+    :param attrs: diccionario nombre -> columna del grafo
+    :param present: diccionario nombre -> renglones asignados de las columnas del grafo que no están completas
+    :param extra: diccionario nombre -> columna, completa, que reemplaza a la del grafo con el mismo nombre
+    :return: lista de (nombre de sección, arreglo)
+    """
+    columns = {name: (values, present.get(name)) for name, values in attrs.items()}
+    columns.update((name, (values, None)) for name, values in (extra or {}).items())
+
+    ret = []
+    for name, (values, mask) in columns.items():
+        if isinstance(values, NameTable):
+            ret.append((prefix + name, values.offsets))
+            ret.append((prefix + name + TEXT_SUFFIX, values.blob))
+        else:
+            values = numpy.asarray(values)
+            if values.dtype == object:
+                # en los renglones sin asignar se guarda la cadena vacía
+                if mask is not None:
+                    values = numpy.where(mask, values, '')
+                offsets, blob = NameTable.encode(values)
+                ret.append((prefix + name, offsets))
+                ret.append((prefix + name + TEXT_SUFFIX, blob))
+            else:
+                ret.append((prefix + name, values))
+        if mask is not None:
+            ret.append((prefix + name + MASK_SUFFIX, numpy.asarray(mask, dtype=bool)))
+    return ret
+
+
+def columns_of(sec, prefix):
+    """
+    Columnas de atributos guardadas en las secciones de un archivo
+    :param sec: diccionario nombre de sección -> arreglo
+    :param prefix: NODE_ATTR_PREFIX o EDGE_ATTR_PREFIX
+    :return: (diccionario nombre -> arreglo o NameTable, diccionario nombre -> renglones asignados)
+    """
+    attrs = {}
+    present = {}
+    for key, arr in sec.items():
+        if not key.startswith(prefix) or key.endswith(TEXT_SUFFIX) or key.endswith(MASK_SUFFIX):
+            continue
+        name = key[len(prefix):]
+        text = sec.get(key + TEXT_SUFFIX)
+        attrs[name] = arr if text is None else NameTable(arr, text)
+        if key + MASK_SUFFIX in sec:
+            present[name] = sec[key + MASK_SUFFIX]
+    return attrs, present
+
+
+def is_binary(archivo):
+    """
+    Revisa si un archivo está en formato binario
+    :param archivo: nombre del archivo
+    :return: True si empieza con MAGIC
+    """
+    with open(archivo, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def sections(archivo):
+    """
+    Abre un archivo binario como memmap y regresa sus secciones como vistas
+    :param archivo: nombre del archivo
+    :return: (n, m, dirigido, diccionario nombre -> arreglo)
+    """
+    mm = numpy.memmap(archivo, dtype=numpy.uint8, mode='r')
+    magic, version = struct.unpack_from('<8sI', bytes(mm[:12]))
+    if magic != MAGIC:
+        raise ValueError(archivo + ' no está en formato binario')
+    if version > VERSION:
+        raise ValueError(archivo + ': versión ' + str(version) + ' no soportada')
+
+    if version < 2:
+        header = HEADER_V1
+        magic, version, n, m, count = header.unpack(bytes(mm[:header.size]))
+        flags = 0
+    else:
+        header = HEADER
+        magic, version, n, m, count, flags = header.unpack(bytes(mm[:header.size]))
+
+    ret = {}
+    for i in range(count):
+        start = header.size + i * SECTION.size
+        name, dtype, offset, rows, cols = SECTION.unpack(bytes(mm[start:start + SECTION.size]))
+        name = name.rstrip(b'\0').decode('utf-8')
+        dtype = numpy.dtype(dtype.rstrip(b'\0').decode('ascii'))
+        shape = (rows, cols) if cols > 0 else (rows,)
+        nbytes = int(numpy.prod(shape)) * dtype.itemsize
+        ret[name] = mm[offset:offset + nbytes].view(dtype).reshape(shape)
+
+    return n, m, not flags & FLAG_UNDIRECTED, ret
+
+
+def load(archivo):
+    """
+    Abre un grafo en formato binario sin leerlo completo; los arreglos del CSRGraph son vistas del memmap
+    :param archivo: nombre del archivo
+    :return: CSRGraph, con los atributos en node_attrs y edge_attrs (las columnas de texto como NameTable)
+    """
+    n, m, directed, sec = sections(archivo)
+
+    edge_names = None
+    if 'edge_names' in sec:
+        edge_names = NameTable(sec['edge_names_offsets'], sec['edge_names'])
+
+    g = CSRGraph(NameTable(sec['names_offsets'], sec['names']), sec['src'], sec['dst'], pos=sec.get('pos'),
+                 edge_names=edge_names, csr=(sec['indptr'], sec['indices'], sec['edge_ids']), directed=directed)
+    g.node_attrs, g.node_present = columns_of(sec, NODE_ATTR_PREFIX)
+    g.edge_attrs, g.edge_present = columns_of(sec, EDGE_ATTR_PREFIX)
+    return g
+
+
+def gv_to_bin(gv, archivo, edge_names=True):
+    """
+    Convierte un archivo DOT a formato binario. Se guardan los nodos y aristas en el mismo órden, si el grafo es
+    dirigido y los atributos
+    :param gv: nombre del archivo DOT
+    :param archivo: nombre del archivo binario
+    :param edge_names: guardar los nombres de las aristas
+    :return: None
+    """
+    save(Graph.load(gv), archivo, edge_names=edge_names)
+
+
+def bin_to_gv(archivo, gv, positions=False):
+    """
+    Convierte un archivo binario a DOT, escribiendo una arista a la vez
+    :param archivo: nombre del archivo binario
+    :param gv: nombre del archivo DOT
+    :param positions: escribir la posición de todos los nodos, ver dot.write_arrays
+    :return: None
+    """
+    g = load(archivo)
+    node_attrs = {name: (values, g.node_present.get(name)) for name, values in g.node_attrs.items()}
+    edge_attrs = {name: (values, g.edge_present.get(name)) for name, values in g.edge_attrs.items()}
+    with open(gv, 'w') as f:
+        dot.write_arrays(f, g.names, g.src, g.dst, g.directed, node_attrs, edge_attrs, g.pos, positions)
@@ -0,0 +1,108 @@
+"""
+Etiquetas de texto ya rasterizadas
+
+LabelCache guarda la Surface de cada etiqueta por (texto, color, tamaño de fuente), así un texto que se repite en
+cada cuadro se rasteriza una sola vez y después sólo se copia con blit. one_per_cell y thin_labels quitan las
+etiquetas que se enciman con otras más importantes para que un grafo grande con nombres visibles se pueda seguir
+dibujando.
+"""
+from collections import OrderedDict
+
+import numpy
+
+LABEL_MEMORY = 8 << 20     # bytes máximos de las superficies guardadas en LabelCache
+
+
+class LabelCache:
+    """
+    Clase caché de superficies de etiquetas con desalojo de la menos usada recientemente
+
+    el tamaño de cada entrada se estima como ancho * alto * bytes por pixel de su Surface
+    """
+
+    def __init__(self, memory=LABEL_MEMORY):
+        """
+        Constructor
+        :param memory: bytes máximos de las superficies guardadas
+        """
+        self.memory = memory
+        self.used = 0
+        self.entries = OrderedDict()    # (texto, color, tamaño) -> Surface, de la menos a la más reciente
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, fuente, cad, col, tam):
+        """
+        Superficie con un texto rasterizado
+        :param fuente: fuente de pygame.freetype con la que se rasteriza el texto si no está guardado
+        :param cad: texto
+        :param col: color del texto
+        :param tam: tamaño de la fuente
+        :return: Surface con el texto sobre fondo transparente
+        """
+        key = (cad, tuple(col), tam)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surf
+
+        self.misses += 1
+        surf, _ = fuente.render(cad, col, size=tam)
+        self.entries[key] = surf
+        self.used += surf.get_width() * surf.get_height() * surf.get_bytesize()
+        while self.used > self.memory and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.used -= old.get_width() * old.get_height() * old.get_bytesize()
+        return surf
+
+    def clear(self):
+        """
+        Vacía la caché
+        :return: None
+        """
+        self.entries.clear()
+        self.used = 0
+
+
+def one_per_cell(points, cell):
+    """
+    Deja un solo punto por celda de una rejilla, el primero que cae en ella
+    :param points: arreglo (k, 2) con los puntos en pixeles, en órden de preferencia
+    :param cell: lado en pixeles de las celdas
+    :return: arreglo ordenado con los índices de los puntos que se quedan
+    """
+    if len(points) == 0:
+        return numpy.empty(0, dtype=numpy.int64)
+    c = numpy.floor(points / cell).astype(numpy.int64)
+    c -= c.min(axis=0)
+    _, first = numpy.unique(c[:, 1] * (int(c[:, 0].max()) + 1) + c[:, 0], return_index=True)
+    return numpy.sort(first)
+
+
+def thin_labels(lo, hi, cell):
+    """
+    Elige etiquetas que no se enciman, dando preferencia a las primeras: se aceptan en órden las que no tocan ninguna
+    celda ya ocupada por una etiqueta aceptada
+    :param lo: arreglo (k, 2) con la esquina superior izquierda de cada etiqueta en pixeles
+    :param hi: arreglo (k, 2) con la esquina inferior derecha de cada etiqueta en pixeles
+    :param cell: lado en pixeles de las celdas de ocupación
+    :return: arreglo ordenado con los índices de las etiquetas que se dibujan
+    """
+    if len(lo) == 0:
+        return numpy.empty(0, dtype=numpy.int64)
+
+    origin = lo.min(axis=0)
+    a = numpy.floor((lo - origin) / cell).astype(numpy.int64)
+    b = numpy.floor((hi - origin) / cell).astype(numpy.int64) + 1
+    busy = numpy.zeros(tuple(b.max(axis=0)[::-1]), dtype=bool)
+    keep = []
+    for i, ((x0, y0), (x1, y1)) in enumerate(zip(a.tolist(), b.tolist())):
+        area = busy[y0:y1, x0:x1]
+        if not area.any():
+            area[:] = True
+            keep.append(i)
+    return numpy.array(keep, dtype=numpy.int64)
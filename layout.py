@@ -1,12 +1,17 @@
 import abc
+import concurrent.futures
 import math
 import random
+import threading
+import time
 import numpy
 from abc import ABC
 
 import node
 import graph
-from quadtree import QuadTree, Rectangle, Point
+import sharedmem
+from quadtree import LinearQuadTree
+from sharedmem import SharedArrays
 
 stop_layinout = False
 
@@ -41,6 +46,128 @@ def mag(v2d):
     return math.sqrt((v2d[0] ** 2) + (v2d[1] ** 2))
 
 
+#####################################################################################################################
+ENGINE_PYTHON = 'python'    # recorre los nodos y aristas como objetos
+ENGINE_NUMPY = 'numpy'      # trabaja sobre arreglos de posiciones e índices
+
+BLOCK_SIZE = 1 << 20        # número máximo de pares (i, j) que se procesan a la vez en la repulsión
+
+
+class GraphArrays:
+    """
+    Clase que mantiene las posiciones de los nodos y los extremos de las aristas de un grafo como arreglos.
+
+    Los nodos y aristas sólo se agregan al grafo, nunca se quitan, y el grafo ya guarda los extremos de sus aristas
+    como arreglos de índices, por lo que al actualizar sólo se toman vistas de lo que haya crecido
+    """
+
+    def __init__(self, g):
+        self.graph = g
+        self.n = 0              # número de nodos
+        self.src = numpy.empty(0, dtype=numpy.int64)
+        self.dst = numpy.empty(0, dtype=numpy.int64)
+        self.base = None        # posiciones tal como se leyeron en positions()
+        self.version = -1       # Graph.pos_version al leerlas
+
+    def update(self):
+        """
+        Agrega los nodos y aristas que se hayan agregado al grafo desde la última actualización
+        :return: None
+        """
+        g = self.graph
+
+        # primero las aristas: sus nodos siempre se agregan antes que ellas
+        m = min(len(g.src), len(g.dst))
+        if m != len(self.src):
+            self.src = g.src.view()[:m]
+            self.dst = g.dst.view()[:m]
+
+        self.n = len(g.node_names)
+
+    def positions(self):
+        """
+        Extrae las posiciones de los nodos
+        :return: posiciones (n, 2)
+        """
+        self.base = self.graph.pos.view()[:self.n].copy()
+        self.version = self.graph.pos_version
+        return self.base.copy()
+
+    def store(self, pos):
+        """
+        Copia las posiciones del arreglo de regreso a los nodos. Si alguien movió nodos desde positions() (por
+        ejemplo la disposición incremental o la interfaz mientras el paso se calculaba sin WRITING_LOCK) no se
+        sobreescriben sus cambios: sólo se suma a las posiciones actuales el desplazamiento que calculó el algoritmo
+        :param pos: posiciones (n, 2)
+        :return: None
+        """
+        g = self.graph
+        if g.pos_version == self.version:
+            g.pos.data[:len(pos)] = pos
+        else:
+            g.pos.data[:len(pos)] += pos - self.base
+        g.positions_changed()
+
+
+def repulsion_forces(pos, k, block_size=BLOCK_SIZE, targets=None):
+    """
+    Fuerza de repulsión entre todos los pares de nodos, calculada por bloques de renglones para acotar la memoria
+    :param pos: posiciones (n, 2)
+    :param k: distancia ideal
+    :param block_size: número máximo de pares por bloque
+    :param targets: índices de los nodos sobre los que se calcula la fuerza (que reciben la repulsión de todos),
+                    None para todos
+    :return: desplazamiento (len(targets), 2) de cada nodo
+    """
+    n = len(pos)
+    tpos = pos if targets is None else pos[targets]
+    disp = numpy.zeros((len(tpos), 2))
+    rows = max(1, block_size // max(n, 1))
+    k2 = k ** 2
+
+    for i in range(0, len(tpos), rows):
+        delta = tpos[i:i + rows, None, :] - pos[None, :, :]
+        d2 = numpy.einsum('ijk,ijk->ij', delta, delta)
+        # (delta / d) * fr(k, d) = delta * k^2 / d^2
+        f = numpy.divide(k2, d2, out=numpy.zeros_like(d2), where=d2 > 0)
+        disp[i:i + rows] = numpy.einsum('ijk,ij->ik', delta, f)
+
+    return disp
+
+
+def attraction_forces(pos, src, dst, k, disp):
+    """
+    Agrega la fuerza de atracción de las aristas al desplazamiento de sus extremos
+    :param pos: posiciones (n, 2)
+    :param src: índice del origen de cada arista
+    :param dst: índice del destino de cada arista
+    :param k: distancia ideal
+    :param disp: desplazamiento (n, 2) que se actualiza
+    :return: None
+    """
+    delta = pos[src] - pos[dst]
+    d = numpy.sqrt(numpy.einsum('ij,ij->i', delta, delta))
+    ok = d > 0
+    # (delta / d) * fa(k, d) = delta * d / k
+    f = delta[ok] * (d[ok] / k)[:, None]
+    numpy.subtract.at(disp, src[ok], f)
+    numpy.add.at(disp, dst[ok], f)
+
+
+def move(pos, disp, advance):
+    """
+    Mueve cada nodo una distancia advance en la dirección de su desplazamiento
+    :param pos: posiciones (n, 2) que se actualizan
+    :param disp: desplazamiento (n, 2)
+    :param advance: magnitud del movimiento
+    :return: (suma de los movimientos aplicados, energía)
+    """
+    d = numpy.sqrt(numpy.einsum('ij,ij->i', disp, disp))
+    unit = numpy.divide(disp, d[:, None], out=numpy.zeros_like(disp), where=d[:, None] > 0)
+    pos += unit * advance
+    return unit.sum(axis=0) * advance, float(numpy.dot(d, d))
+
+
 #####################################################################################################################
 class Layout(ABC):
     """
@@ -56,6 +183,13 @@ class Layout(ABC):
     def step(self):
         return False
 
+    def close(self):
+        """
+        Libera los recursos que el algoritmo mantiene entre pasos
+        :return: None
+        """
+        pass
+
     def run(self):
         global stop_layinout
         while not stop_layinout:
@@ -95,9 +229,12 @@ class FruchtermanReingold(Layout):
     con la mejora introducida por R. Fletcher (2000) para el enfriamiento del procesamiento
     """
 
-    def __init__(self, g, k=50, t=0.95, advance=20, conv_threshold=3.0):
+    def __init__(self, g, k=50, t=0.95, advance=20, conv_threshold=3.0, engine=ENGINE_NUMPY, block_size=BLOCK_SIZE):
         super().__init__(g)
         # math.sqrt((self.res[0] * self.res[1]) / len(self.grafo.nodes))
+        self.engine = engine
+        self.block_size = block_size
+        self.arrays = GraphArrays(g)
         self.k = k
         self.t = t
         self.advance = advance
@@ -112,40 +249,17 @@ class FruchtermanReingold(Layout):
         :return: True si el algoritmo ha convergido, False de otra forma
         """
         if self.converged:
-            return
+            return True
 
         # para el enfriamiento
         prev_energy = self.energy
         self.energy = 0
 
         with graph.WRITING_LOCK:
-            # fuerza de repulsion
-            for v in self.graph.nodes.values():
-                v.attr[node.ATTR_DISP] = numpy.array([0, 0])
-                for u in self.graph.nodes.values():
-                    if v != u:
-                        delta = v.attr[node.ATTR_POS] - u.attr[node.ATTR_POS]
-                        m_delta = mag(delta)
-                        if m_delta > 0:
-                            v.attr[node.ATTR_DISP] = v.attr[node.ATTR_DISP] + \
-                                (delta / m_delta) * fr(self.k, m_delta)
-
-            # fuerza de atracción
-            for e in self.graph.edges.values():
-                delta = e.n0.attr[node.ATTR_POS] - e.n1.attr[node.ATTR_POS]
-                e.n0.attr[node.ATTR_DISP] = e.n0.attr[node.ATTR_DISP] - \
-                    (delta / mag(delta)) * fa(self.k, mag(delta))
-                e.n1.attr[node.ATTR_DISP] = e.n1.attr[node.ATTR_DISP] + \
-                    (delta / mag(delta)) * fa(self.k, mag(delta))
-
-            # mover los nodes de acuerdo a la fuerza resultante
-            dif = numpy.array([0, 0])
-            for v in self.graph.nodes.values():
-                dif = dif + (v.attr[node.ATTR_DISP] /
-                             mag(v.attr[node.ATTR_DISP])) * self.advance
-                v.attr[node.ATTR_POS] = v.attr[node.ATTR_POS] + (
-                    v.attr[node.ATTR_DISP] / mag(v.attr[node.ATTR_DISP])) * self.advance
-                self.energy = self.energy + mag(v.attr[node.ATTR_DISP]) ** 2
+            if self.engine == ENGINE_NUMPY:
+                dif = self.step_numpy()
+            else:
+                dif = self.step_python()
 
         self.update_step(prev_energy)
 
@@ -154,6 +268,56 @@ class FruchtermanReingold(Layout):
 
         return self.converged
 
+    def step_python(self):
+        """
+        Paso del algoritmo recorriendo los nodos uno por uno
+        :return: suma de los desplazamientos aplicados
+        """
+        # fuerza de repulsion
+        for v in self.graph.nodes.values():
+            v.attr[node.ATTR_DISP] = numpy.array([0, 0])
+            for u in self.graph.nodes.values():
+                if v != u:
+                    delta = v.attr[node.ATTR_POS] - u.attr[node.ATTR_POS]
+                    m_delta = mag(delta)
+                    if m_delta > 0:
+                        v.attr[node.ATTR_DISP] = v.attr[node.ATTR_DISP] + \
+                            (delta / m_delta) * fr(self.k, m_delta)
+
+        # fuerza de atracción
+        for e in self.graph.edges.values():
+            delta = e.n0.attr[node.ATTR_POS] - e.n1.attr[node.ATTR_POS]
+            e.n0.attr[node.ATTR_DISP] = e.n0.attr[node.ATTR_DISP] - \
+                (delta / mag(delta)) * fa(self.k, mag(delta))
+            e.n1.attr[node.ATTR_DISP] = e.n1.attr[node.ATTR_DISP] + \
+                (delta / mag(delta)) * fa(self.k, mag(delta))
+
+        # mover los nodes de acuerdo a la fuerza resultante
+        dif = numpy.array([0, 0])
+        for v in self.graph.nodes.values():
+            dif = dif + (v.attr[node.ATTR_DISP] /
+                         mag(v.attr[node.ATTR_DISP])) * self.advance
+            v.attr[node.ATTR_POS] = v.attr[node.ATTR_POS] + (
+                v.attr[node.ATTR_DISP] / mag(v.attr[node.ATTR_DISP])) * self.advance
+            self.energy = self.energy + mag(v.attr[node.ATTR_DISP]) ** 2
+
+        return dif
+
+    def step_numpy(self):
+        """
+        Paso del algoritmo con todas las posiciones en un arreglo (n, 2)
+        :return: suma de los desplazamientos aplicados
+        """
+        self.arrays.update()
+        pos = self.arrays.positions()
+
+        disp = repulsion_forces(pos, self.k, self.block_size)
+        attraction_forces(pos, self.arrays.src, self.arrays.dst, self.k, disp)
+        dif, self.energy = move(pos, disp, self.advance)
+
+        self.arrays.store(pos)
+        return dif
+
     def update_step(self, prev_energy):
         """
         Actualizar la magnitud del cambio de posición de los nodos, de acuerdo a como lo menciona R. Fletcher (2000)
@@ -173,8 +337,23 @@ class FruchtermanReingold(Layout):
 
 
 #####################################################################################################################
-ATTR_CENTER_OF_MASS = 1
-ATTR_MASS = 0
+def bh_repulsion_worker(spec, k, theta, first, last):
+    """
+    Calcula en un proceso de trabajo la repulsión de un rango de hojas del quadtree publicado en memoria compartida
+    :param spec: descripción de los arreglos compartidos (SharedArrays.spec())
+    :param k: distancia ideal
+    :param theta: criterio de apertura
+    :param first: primera hoja del rango
+    :param last: última hoja del rango (sin incluir)
+    :return: None
+    """
+    arrays, blocks = sharedmem.attach(spec)
+    try:
+        tree = LinearQuadTree.from_arrays(arrays)
+        tree.self_repulsion_forces(k, theta, leaves=(first, last), out=arrays['force'])
+        del tree
+    finally:
+        sharedmem.detach(arrays, blocks)
 
 
 class BarnesHut(Layout):
@@ -183,10 +362,14 @@ class BarnesHut(Layout):
     con la mejora introducida por R. Fletcher (2000) para el enfriamiento del procesamiento
     """
 
-    def __init__(self, g, k=50, t=0.95, advance=20, conv_threshold=3.0, points_by_region=4):
+    def __init__(self, g, k=50, t=0.95, advance=20, conv_threshold=3.0, points_by_region=4, workers=1):
         super().__init__(g)
         self.qtree = None
+        self.arrays = GraphArrays(g)
         self.points_by_region = points_by_region
+        self.workers = workers      # número de procesos para la repulsión, 1 para calcularla en este proceso
+        self.pool = None
+        self.shared = None          # quadtree y fuerzas en memoria compartida, se reusan entre pasos
         self.theta = 1
         self.k = k
         self.t = t
@@ -199,76 +382,77 @@ class BarnesHut(Layout):
         self.progress = 0
         self.steps = 0
 
-    def build_quadtree(self):
-        self.qtree = QuadTree(Rectangle(self.graph.extent[0][0], self.graph.extent[0][1], self.graph.extent[1][0],
-                                        self.graph.extent[1][1]), self.points_by_region)
-        for v in self.graph.nodes.values():
-            p = Point(v.attr[node.ATTR_POS][0], v.attr[node.ATTR_POS][1], v)
-            self.qtree.insert(p)
-
-    def compute_mass(self, qtree):
-        qtree.attr[ATTR_CENTER_OF_MASS] = numpy.array([0, 0])
-        qtree.attr[ATTR_MASS] = 0
-
-        for p in qtree.points:
-            qtree.attr[ATTR_CENTER_OF_MASS] = qtree.attr[ATTR_CENTER_OF_MASS] + \
-                numpy.array([p.x, p.y])
-            qtree.attr[ATTR_MASS] = qtree.attr[ATTR_MASS] + 1
-
-        if qtree.is_divided:
-            self.compute_mass(qtree.I)
-            self.compute_mass(qtree.II)
-            self.compute_mass(qtree.III)
-            self.compute_mass(qtree.IV)
-
-            if qtree.I.attr[ATTR_MASS] > 0:
-                qtree.attr[ATTR_MASS] += qtree.I.attr[ATTR_MASS]
-                qtree.attr[ATTR_CENTER_OF_MASS] = qtree.attr[ATTR_CENTER_OF_MASS] + \
-                    qtree.I.attr[ATTR_CENTER_OF_MASS] * \
-                    qtree.I.attr[ATTR_MASS]
-
-            if qtree.II.attr[ATTR_MASS] > 0:
-                qtree.attr[ATTR_MASS] += qtree.II.attr[ATTR_MASS]
-                qtree.attr[ATTR_CENTER_OF_MASS] = qtree.attr[ATTR_CENTER_OF_MASS] + \
-                    qtree.II.attr[ATTR_CENTER_OF_MASS] * \
-                    qtree.II.attr[ATTR_MASS]
-
-            if qtree.III.attr[ATTR_MASS] > 0:
-                qtree.attr[ATTR_MASS] += qtree.III.attr[ATTR_MASS]
-                qtree.attr[ATTR_CENTER_OF_MASS] = qtree.attr[ATTR_CENTER_OF_MASS] + \
-                    qtree.III.attr[ATTR_CENTER_OF_MASS] * \
-                    qtree.III.attr[ATTR_MASS]
-
-            if qtree.IV.attr[ATTR_MASS] > 0:
-                qtree.attr[ATTR_MASS] += qtree.IV.attr[ATTR_MASS]
-                qtree.attr[ATTR_CENTER_OF_MASS] = qtree.attr[ATTR_CENTER_OF_MASS] + \
-                    qtree.IV.attr[ATTR_CENTER_OF_MASS] * \
-                    qtree.IV.attr[ATTR_MASS]
-
-        if qtree.attr[ATTR_MASS] > 0:
-            qtree.attr[ATTR_CENTER_OF_MASS] = qtree.attr[ATTR_CENTER_OF_MASS] / \
-                qtree.attr[ATTR_MASS]
-
-    def compute_repulsion_force(self, p, qtree):
-        force = numpy.array([0.0, 0.0])
-
-        vec = p.data.attr[node.ATTR_POS] - qtree.attr[ATTR_CENTER_OF_MASS]
-        r = numpy.linalg.norm(vec)
-        # d = math.sqrt(qtree.limite.w * qtree.limite.h)
-        d = min(qtree.limits.w, qtree.limits.h)
-
-        if not r > 0:
-            return numpy.array([0.0, 0.0])
-
-        if d / r < self.theta or not qtree.is_divided:
-            force = force + (vec / r) * fr(self.k, r) * qtree.attr[ATTR_MASS]
-            return force
+    def build_quadtree(self, pos, bounds=None):
+        """
+        Construye el quadtree lineal con las posiciones actuales
+        :param pos: posiciones (n, 2) de los nodos
+        :param bounds: esquinas (lo, hi) que contienen a todas las posiciones, opcional
+        :return: None
+        """
+        self.qtree = LinearQuadTree(pos, self.points_by_region, bounds=bounds)
+
+    def repulsion_forces(self, pos, bounds=None):
+        """
+        Fuerza de repulsión sobre cada nodo usando el quadtree
+        :param pos: posiciones (n, 2) de los nodos
+        :param bounds: esquinas (lo, hi) que contienen a todas las posiciones, opcional
+        :return: desplazamiento (n, 2) de cada nodo
+        """
+        self.build_quadtree(pos, bounds)
+
+        if self.workers > 1:
+            forces = self.parallel_repulsion_forces()
         else:
-            force = force + self.compute_repulsion_force(p, qtree.I)
-            force = force + self.compute_repulsion_force(p, qtree.II)
-            force = force + self.compute_repulsion_force(p, qtree.III)
-            force = force + self.compute_repulsion_force(p, qtree.IV)
-            return force
+            forces = self.qtree.self_repulsion_forces(self.k, self.theta)
+
+        disp = numpy.empty_like(pos)
+        disp[self.qtree.order] = forces
+        return disp
+
+    def parallel_repulsion_forces(self):
+        """
+        Reparte las hojas del quadtree entre los procesos de trabajo. El árbol y las fuerzas viven en memoria
+        compartida; cada hoja se calcula igual que en un solo proceso, así que el resultado es idéntico
+        :return: fuerza (n, 2) en el órden de los puntos del quadtree
+        """
+        if self.pool is None:
+            self.pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+        if self.shared is None:
+            self.shared = SharedArrays()
+
+        # los bloques sólo se vuelven a crear cuando el árbol crece más allá de su capacidad
+        shared = self.shared
+        for name, arr in self.qtree.arrays().items():
+            shared.fit(name, arr.shape, arr.dtype)[...] = arr
+        shared.fit('force', (len(self.qtree.px), 2), float)
+
+        # varios bloques por proceso para repartir mejor la carga
+        bounds = numpy.linspace(0, len(self.qtree.leaf_order), 4 * self.workers + 1).astype(int)
+        spec = shared.spec()
+        tasks = [self.pool.submit(bh_repulsion_worker, spec, self.k, self.theta, first, last)
+                 for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+        for task in tasks:
+            task.result()
+
+        return shared['force'].copy()
+
+    def close(self):
+        """
+        Termina los procesos de trabajo y libera la memoria compartida; si se ejecuta otro paso se vuelven a crear
+        :return: None
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def step(self):
         """
@@ -279,38 +463,33 @@ class BarnesHut(Layout):
         #     return
 
         self.steps += 1
-        self.build_quadtree()
-        self.compute_mass(self.qtree)
 
         # para el enfriamiento
         prev_energy = self.energy
-        self.energy = 0
 
         with graph.WRITING_LOCK:
-            # fuerza de repulsion
-            for v in self.graph.nodes.values():
-                p = Point(v.attr[node.ATTR_POS][0],
-                          v.attr[node.ATTR_POS][1], v)
-                v.attr[node.ATTR_DISP] = self.compute_repulsion_force(
-                    p, self.qtree)
-
-            # fuerza de atracción
-            for e in self.graph.edges.values():
-                delta = e.n0.attr[node.ATTR_POS] - e.n1.attr[node.ATTR_POS]
-                m = mag(delta)
-                if m > 0:
-                    e.n0.attr[node.ATTR_DISP] -= (delta / m) * fa(self.k, m)
-                    e.n1.attr[node.ATTR_DISP] += (delta / m) * fa(self.k, m)
-
-            # mover los nodes de acuerdo a la fuerza resultante
-            for v in self.graph.nodes.values():
-                m = mag(v.attr[node.ATTR_DISP])
-                v.attr[node.ATTR_POS] = v.attr[node.ATTR_POS] + \
-                    (v.attr[node.ATTR_DISP] / m) * self.advance
-                self.energy += m ** 2
+            self.arrays.update()
+            pos = self.arrays.positions()
+            # las esquinas que mantiene el grafo también sirven para dibujarlo hasta el siguiente paso
+            bounds = self.graph.bounds.bounds()
+        if len(pos) == 0:
+            return self.converged
+
+        # fuerza de repulsion, se calcula sin bloquear el grafo
+        disp = self.repulsion_forces(pos, bounds)
+
+        # fuerza de atracción
+        attraction_forces(pos, self.arrays.src, self.arrays.dst, self.k, disp)
+
+        # mover los nodes de acuerdo a la fuerza resultante
+        dif, self.energy = move(pos, disp, self.advance)
+        with graph.WRITING_LOCK:
+            self.arrays.store(pos)
 
         if not self.converged:
             self.update_step(prev_energy)
+            if self.converged:
+                self.close()
 
         return self.converged
 
@@ -398,3 +577,240 @@ class Spring(Layout):
                         n.attr[node.ATTR_DISP] * (0.1 / self.c4)
 
         return False
+
+
+#####################################################################################################################
+class Incremental(Layout):
+    """
+    Clase que acomoda sólo lo que cambia cuando el grafo crece
+
+    cada nodo nuevo se pone en el baricentro de sus vecinos ya acomodados y después se relaja con las fuerzas de
+    Fruchterman y Reingold una vecindad de hasta hops saltos alrededor de los nodos nuevos (a lo más max_region
+    nodos), con su propia temperatura que empieza en advance en cada inserción; los demás nodos quedan fijos. Los
+    nodos con más de max_degree vecinos no se mueven ni se expanden, así que el costo de una inserción no depende del
+    tamaño del grafo
+    """
+
+    def __init__(self, g, k=50, hops=2, max_region=64, max_degree=16, iterations=15, advance=20, t=0.85):
+        super().__init__(g)
+        self.k = k
+        self.hops = hops
+        self.max_region = max_region
+        self.max_degree = max_degree
+        self.iterations = iterations
+        self.advance = advance
+        self.t = t
+        self.placed = len(g.node_list)  # los primeros placed nodos ya están acomodados
+        self.adj = None                 # adyacencia CSR de las primeras adj_m aristas
+        self.adj_m = 0
+        self.extra = {}                 # nodo -> lista de (vecino, arista) de las aristas a partir de adj_m
+        self.m = 0                      # aristas que ya están en adj o en extra
+
+    def update_adjacency(self):
+        """
+        Agrega a extra las aristas que llegaron desde la última vez; cuando son muchas se vuelve a tomar la
+        adyacencia CSR del grafo
+        :return: None
+        """
+        g = self.graph
+        m = len(g.dst)
+        if self.adj is None or m - self.adj_m > max(graph.ADJ_TAIL, self.adj_m // 8):
+            self.adj = g.adjacency()
+            self.adj_m = len(self.adj[1]) // 2
+            self.extra = {}
+            self.m = self.adj_m
+        for e, u, v in zip(range(self.m, m), g.src.data[self.m:m].tolist(), g.dst.data[self.m:m].tolist()):
+            self.extra.setdefault(u, []).append((v, e))
+            self.extra.setdefault(v, []).append((u, e))
+        self.m = m
+
+    def incident(self, i):
+        """
+        Vecinos y aristas de un nodo
+        :param i: índice del nodo
+        :return: (arreglo con los vecinos, arreglo con las aristas), una entrada por arista incidente
+        """
+        indptr, indices, edge_ids = self.adj
+        if i + 1 < len(indptr):
+            nbrs = indices[indptr[i]:indptr[i + 1]]
+            edges = edge_ids[indptr[i]:indptr[i + 1]]
+        else:
+            nbrs = edges = numpy.empty(0, dtype=numpy.int64)
+        extra = self.extra.get(i)
+        if extra:
+            more = numpy.array(extra, dtype=numpy.int64)
+            nbrs = numpy.concatenate((nbrs, more[:, 0]))
+            edges = numpy.concatenate((edges, more[:, 1]))
+        return nbrs, edges
+
+    def place(self, new):
+        """
+        Pone cada nodo nuevo cerca del baricentro de sus vecinos ya acomodados, o cerca de un nodo acomodado al azar
+        si no tiene ninguno
+        :param new: índices de los nodos nuevos, en órden
+        :return: None
+        """
+        g = self.graph
+        pos = g.pos.data
+        for i in new:
+            nbrs, _ = self.incident(i)
+            nbrs = nbrs[nbrs < i]
+            if len(nbrs) > 0:
+                center = pos[nbrs].mean(axis=0)
+            elif i > 0:
+                center = pos[random.randrange(i)]
+            else:
+                continue
+            angle = random.uniform(0, 2 * math.pi)
+            old = pos[i].tolist()
+            pos[i] = center + (self.k / 4) * numpy.array([math.cos(angle), math.sin(angle)])
+            g.node_moved(i, old)
+
+    def region(self, new):
+        """
+        Nodos que se van a mover: los nuevos y los que están a hops saltos o menos, sin pasar por nodos de grado
+        mayor que max_degree
+        :param new: índices de los nodos nuevos
+        :return: arreglo con los índices de los nodos
+        """
+        deg = self.graph.deg.data
+        seen = set(new)
+        frontier = list(new)
+        for _ in range(self.hops):
+            nxt = []
+            for v in frontier:
+                nbrs, _ = self.incident(v)
+                for w in nbrs[:self.max_region].tolist():
+                    if w not in seen and deg[w] <= self.max_degree:
+                        seen.add(w)
+                        nxt.append(w)
+                        if len(seen) >= self.max_region:
+                            return numpy.array(sorted(seen), dtype=numpy.int64)
+            frontier = nxt
+        return numpy.array(sorted(seen), dtype=numpy.int64)
+
+    def relax(self, movable):
+        """
+        Relaja las posiciones de un conjunto de nodos con las fuerzas de sus aristas y la repulsión entre ellos y sus
+        vecinos fijos, enfriando la temperatura en cada iteración
+        :param movable: índices ordenados de los nodos que se mueven
+        :return: None
+        """
+        g = self.graph
+        edges = numpy.unique(numpy.concatenate([self.incident(v)[1] for v in movable.tolist()]))
+        s = g.src.data[edges]
+        d = g.dst.data[edges]
+        local = numpy.unique(numpy.concatenate((movable, s, d)))
+        ls = numpy.searchsorted(local, s)
+        ld = numpy.searchsorted(local, d)
+        fixed = ~numpy.isin(local, movable)
+
+        pos = g.pos.data[local].copy()
+        mov = numpy.flatnonzero(~fixed)
+        advance = self.advance
+        for _ in range(self.iterations):
+            disp = numpy.zeros_like(pos)
+            disp[mov] = repulsion_forces(pos, self.k, targets=mov)
+            attraction_forces(pos, ls, ld, self.k, disp)
+            disp[fixed] = 0
+            move(pos, disp, advance)
+            advance *= self.t
+
+        for j, v in zip(mov.tolist(), local[mov].tolist()):
+            old = g.pos.data[v].tolist()
+            g.pos.data[v] = pos[j]
+            g.node_moved(v, old)
+
+    def step(self):
+        """
+        Acomoda los nodos que llegaron desde el último paso
+        :return: True si no había nodos nuevos, False de otra forma
+        """
+        g = self.graph
+        with graph.WRITING_LOCK:
+            n = len(g.node_list)
+            if n == self.placed:
+                return True
+            new = list(range(self.placed, n))
+            self.placed = n
+            self.update_adjacency()
+            self.place(new)
+            self.relax(self.region(new))
+        return False
+
+
+#####################################################################################################################
+class LayoutWorker(threading.Thread):
+    """
+    Clase hilo que ejecuta un algoritmo de disposición fuera del ciclo de dibujo
+
+    el algoritmo sigue escribiendo en las posiciones del grafo; cada steps_per_publish pasos el hilo copia las
+    posiciones y publica la copia en graph.snapshot (cambiar la referencia es atómico), y Graph.draw dibuja siempre
+    la última copia completa sin tomar WRITING_LOCK. Al terminar se quita la copia, si sigue siendo la publicada por
+    este hilo, y se vuelve a dibujar el grafo
+    """
+
+    def __init__(self, layout, steps_per_publish=1, budget=1.0):
+        """
+        Constructor
+        :param layout: algoritmo de disposición (Layout)
+        :param steps_per_publish: pasos del algoritmo entre cada copia publicada
+        :param budget: fracción del tiempo que el hilo puede ocupar, entre 0 y 1; el resto lo pasa dormido
+        """
+        super().__init__(daemon=True)
+        self.layout = layout
+        self.graph = layout.graph
+        self.steps_per_publish = max(1, steps_per_publish)
+        self.budget = min(1.0, max(0.01, budget))
+        self.running = True
+        self.converged = False
+        self.steps = 0
+        self.published = None   # última copia publicada por este hilo
+
+    def run(self):
+        try:
+            while self.running and not self.converged:
+                start = time.perf_counter()
+                for _ in range(self.steps_per_publish):
+                    # algunos algoritmos regresan None en lugar de False
+                    self.converged = bool(self.layout.step())
+                    self.steps += 1
+                    if self.converged or not self.running:
+                        break
+                if not self.running:
+                    break
+                self.publish()
+
+                if self.budget < 1.0:
+                    time.sleep((time.perf_counter() - start) * (1.0 - self.budget) / self.budget)
+        finally:
+            self.layout.close()
+            # otro hilo pudo haber publicado ya su propia copia, sólo se quita la de éste
+            if self.graph.snapshot is self.published:
+                self.graph.snapshot = None
+
+    def publish(self):
+        """
+        Publica una copia de sólo lectura de las posiciones actuales
+        :return: None
+        """
+        g = self.graph
+        with graph.WRITING_LOCK:
+            # primero las aristas: sus nodos siempre se agregan antes que ellas
+            m = len(g.edge_list)
+            n = len(g.node_list)
+            pos = g.pos.view()[:n].copy()
+            version = g.pos_version
+        pos.flags.writeable = False
+        self.published = graph.PositionSnapshot(pos, m, version, graph.extent_of(pos))
+        g.snapshot = self.published
+
+    def stop(self, wait=True):
+        """
+        Detiene el hilo al terminar el paso en curso
+        :param wait: esperar a que el hilo termine
+        :return: None
+        """
+        self.running = False
+        if wait and self.is_alive():
+            self.join()
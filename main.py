@@ -7,6 +7,7 @@ import pygame
 import algoritmos
 import ui
 import layout
+import render
 from graph import Graph
 
 from node import Node
@@ -14,34 +15,48 @@ from ui import Viewport, Frame, ColorScheme, DarkGrayColorScheme, LightGrayColor
 
 
 class MyView(Viewport):
+    incremental = None      # disposición local de los nodos que se agregan con la tecla d
+
     def key_manage(self, pressed):
         if pressed[pygame.K_b]:
             if not self.layinout:
+                self.stop_layout()
                 self.layinout = True
                 self.layout = layout.BarnesHut(self.graph)
                 self.layout.conv_threshold = 1.0
         elif pressed[pygame.K_s]:
             if not self.layinout:
+                self.stop_layout()
                 self.layinout = True
                 self.layout = layout.Spring(self.graph)
         elif pressed[pygame.K_f]:
             if not self.layinout:
+                self.stop_layout()
                 self.layinout = True
                 self.layout = layout.FruchtermanReingold(self.graph)
         elif pressed[pygame.K_ESCAPE]:
             self.layinout = False
+            self.stop_layout()
         elif pressed[pygame.K_a]:
-            for a in self.graph.edges.values():
-                a.atrib[ui.ATTR_STYLE][ui.STYLE_ANTIALIAS] = \
-                    not a.atrib[ui.ATTR_STYLE][ui.STYLE_ANTIALIAS]
+            for a in self.graph.edge_list:
+                a.style(ui.STYLE_ANTIALIAS, not a.atrib[ui.ATTR_STYLE][ui.STYLE_ANTIALIAS])
         elif pressed[pygame.K_r]:
             if not self.layinout:
+                self.stop_layout()
                 layout.Random(self.graph).run()
         elif pressed[pygame.K_g]:
             if not self.layinout:
+                self.stop_layout()
                 layout.Grid(self.graph).run()
         elif pressed[pygame.K_d]:
+            if self.incremental is None:
+                self.incremental = layout.Incremental(self.graph)
             algoritmos.event_DorogovtsevMendes(self.graph)
+            # sólo se acomodan el nodo nuevo y su vecindad, aunque la disposición global ya haya convergido
+            self.incremental.step()
+        elif pressed[pygame.K_l]:
+            renderer = self.graph.renderer
+            renderer.lod_pixels = None if renderer.lod_pixels is not None else render.LOD_PIXELS
 
 
 if __name__ == '__main__':
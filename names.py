@@ -5,6 +5,7 @@ ATTR_POS = '__pos__'
 ATTR_POS_VP = '__POS__'
 ATTR_DISP = '__desp__'
 ATTR_LAYERED = '__acomodado__'
+ATTR_PINNED = '__fijo__'
 
 FORM_CIRCLE = 'circulo'
 FORM_SQUARE = 'cuadro'
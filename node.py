@@ -1,57 +1,310 @@
+import collections.abc
 import random
+import types
 
 import numpy
-import pygame
 
+from edge import Edge
+from sprites import SPRITES, draw_shape, sprite_key
 from names import *
 
 
+# estilo por omisión, compartido por todos los nodos hasta que alguno lo cambia con Node.style()
+DEFAULT_STYLE = types.MappingProxyType({
+    STYLE_FORM: FORM_CIRCLE,
+    STYLE_SIZE: 10,
+    STYLE_BORDERCOLOR: (50, 50, 50),
+    STYLE_FILLCOLOR: (255, 255, 255),
+    STYLE_THICKNESS: 1,
+    STYLE_FILLED: True,
+    STYLE_BORDERED: True,
+    STYLE_SCALED: False,
+    STYLE_SHOW_ID: False,
+})
+
+# llaves que se guardan en los campos del nodo o en los arreglos del grafo y no en las columnas de atributos
+FIELDS = (ATTR_EDGES, ATTR_NEIGHBORS, ATTR_POS, ATTR_POS_VP, ATTR_STYLE)
+
+
+class NodeAttrs(collections.abc.MutableMapping):
+    """
+    Clase que presenta los atributos de un nodo como el diccionario attr de antes.
+
+    Las llaves ATTR_POS, ATTR_POS_VP, ATTR_EDGES, ATTR_NEIGHBORS y ATTR_STYLE se leen y escriben en los arreglos del
+    grafo; cualquier otra llave es una columna de graph.node_data. Un nodo sin grafo guarda todo en un diccionario
+    """
+
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    def __getitem__(self, key):
+        node = self.node
+        if key == ATTR_POS:
+            return node.pos
+        if key == ATTR_POS_VP:
+            return node.pos_vp
+        if key == ATTR_EDGES:
+            return node.edges
+        if key == ATTR_NEIGHBORS:
+            return node.neighbors
+        if key == ATTR_STYLE:
+            return node.shared_style
+        if node.graph is None:
+            return node._extra[key]
+        return node.graph.node_data.get(key, node.index)
+
+    def __setitem__(self, key, value):
+        node = self.node
+        if key == ATTR_POS:
+            node.pos = value
+        elif key == ATTR_POS_VP:
+            node.pos_vp = value
+        elif key in (ATTR_EDGES, ATTR_NEIGHBORS):
+            # las aristas y los vecinos se obtienen del grafo
+            pass
+        elif key == ATTR_STYLE:
+            node.set_style(value)
+        elif node.graph is None:
+            node._extra[key] = value
+        else:
+            node.graph.node_data.set(key, node.index, value, len(node.graph.node_list))
+
+    def __delitem__(self, key):
+        node = self.node
+        if key in FIELDS:
+            raise KeyError(key)
+        if node.graph is None:
+            del node._extra[key]
+        else:
+            node.graph.node_data.unset(key, node.index)
+
+    def __iter__(self):
+        yield ATTR_EDGES
+        yield ATTR_NEIGHBORS
+        yield ATTR_POS
+        yield ATTR_STYLE
+        node = self.node
+        names = node._extra if node.graph is None else node.graph.node_data.names(node.index)
+        for key in names:
+            if key not in FIELDS:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class NodeList(collections.abc.Sequence):
+    """
+    Clase secuencia de los nodos de un grafo en órden de inserción; los objetos Node se crean cuando se piden
+    """
+
+    __slots__ = ('graph',)
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph.node_names)
+
+    def __getitem__(self, i):
+        g = self.graph
+        names = g.node_names
+        if isinstance(i, slice):
+            return [Node(names[k], k, g) for k in range(*i.indices(len(names)))]
+        i = int(i)
+        if i < 0:
+            i += len(names)
+        return Node(names[i], i, g)
+
+    def __iter__(self):
+        g = self.graph
+        for i, name in enumerate(g.node_names):
+            yield Node(name, i, g)
+
+
+class NodeMap(collections.abc.Mapping):
+    """
+    Clase diccionario nombre -> nodo de un grafo, sobre el diccionario nombre -> índice del grafo
+    """
+
+    __slots__ = ('graph',)
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        return Node(name, self.graph.node_index[name], self.graph)
+
+    def get(self, name, default=None):
+        i = self.graph.node_index.get(name)
+        return default if i is None else Node(name, i, self.graph)
+
+    def __contains__(self, name):
+        return name in self.graph.node_index
+
+    def __iter__(self):
+        return iter(self.graph.node_names)
+
+    def __len__(self):
+        return len(self.graph.node_names)
+
+
 class Node:
     """
     Clase nodo
+
+    igual que Edge, un nodo de un grafo es sólo una referencia (nombre, índice, grafo): la posición es el renglón
+    index del arreglo de coordenadas del grafo, el estilo es uno de los estilos compartidos del grafo y los demás
+    atributos son columnas de graph.node_data. Dos objetos Node con el mismo grafo e índice son el mismo nodo. Un nodo
+    sin grafo guarda su posición, su estilo y sus atributos en un diccionario propio
     """
 
-    def __init__(self, id):
+    __slots__ = ('id', 'index', 'graph', '_extra')
+
+    def __init__(self, id, index=-1, graph=None):
         """
         Constructor
         :param id: identificador único del nodo
+        :param index: renglón del nodo en los arreglos del grafo, lo asigna Graph
+        :param graph: grafo al que pertenece el nodo, si es None el nodo guarda sus propios datos
         """
         self.id = id
-        self.attr = {
-            ATTR_EDGES: [],
-            ATTR_NEIGHBORS: [],
-            ATTR_POS: numpy.array([random.random(), random.random()]),
-            ATTR_STYLE: {
-                STYLE_FORM: FORM_CIRCLE,
-                STYLE_SIZE: 10,
-                STYLE_BORDERCOLOR: (50, 50, 50),
-                STYLE_FILLCOLOR: (255, 255, 255),
-                STYLE_THICKNESS: 1,
-                STYLE_FILLED: True,
-                STYLE_BORDERED: True,
-                STYLE_SCALED: False,
-                STYLE_SHOW_ID: False,
-            },
-        }
+        self.index = index
+        self.graph = graph
+        self._extra = None
+        if graph is None:
+            self._extra = {ATTR_STYLE: DEFAULT_STYLE}
+            self.pos = numpy.array([random.random(), random.random()])
+
+    def __eq__(self, other):
+        if self.graph is None:
+            return self is other
+        return isinstance(other, Node) and self.graph is other.graph and self.index == other.index
+
+    def __hash__(self):
+        return id(self) if self.graph is None else hash((id(self.graph), self.index))
+
+    @property
+    def attr(self):
+        return NodeAttrs(self)
+
+    @attr.setter
+    def attr(self, values):
+        if self.graph is None:
+            self._extra = {ATTR_STYLE: DEFAULT_STYLE, ATTR_POS: self._extra[ATTR_POS]}
+        else:
+            data = self.graph.node_data
+            for key in list(data.names(self.index)):
+                data.unset(key, self.index)
+        attrs = NodeAttrs(self)
+        for key, value in values.items():
+            attrs[key] = value
+
+    @property
+    def pos(self):
+        """
+        Posición del nodo; es una copia, para moverlo hay que asignar la posición completa y así el grafo se entera
+        :return: arreglo (2,)
+        """
+        if self.graph is None:
+            return self._extra[ATTR_POS].copy()
+        return self.graph.pos.data[self.index].copy()
+
+    @pos.setter
+    def pos(self, value):
+        if self.graph is None:
+            self._extra[ATTR_POS] = numpy.array(value, dtype=float)
+        else:
+            pos = self.graph.pos.data[self.index]
+            old = pos.tolist()
+            pos[:] = value
+            self.graph.node_moved(self.index, old)
+
+    @property
+    def pos_vp(self):
+        """
+        Posición del nodo en el viewport, calculada por Graph.draw()
+        :return: arreglo (2,) o None si el nodo no se ha dibujado
+        """
+        if self.graph is None:
+            return self._extra.get(ATTR_POS_VP)
+        pos_vp = self.graph.pos_vp
+        if pos_vp is None or self.index >= len(pos_vp):
+            return None
+        return pos_vp[self.index]
+
+    @pos_vp.setter
+    def pos_vp(self, value):
+        if self.graph is None:
+            self._extra[ATTR_POS_VP] = value
+        else:
+            self.graph.pos_vp[self.index] = value
+
+    @property
+    def shared_style(self):
+        """
+        Estilo del nodo, compartido con los nodos que tienen el mismo y de sólo lectura; se cambia con style()
+        :return: diccionario de estilo
+        """
+        if self.graph is None:
+            return self._extra[ATTR_STYLE]
+        return self.graph.node_style(self.index)
+
+    @property
+    def edges(self):
+        """
+        Aristas que inciden en el nodo
+        :return: lista de aristas
+        """
+        if self.graph is None:
+            return []
+        return [Edge(self.graph, e) for e in self.graph.incident_edges(self.index).tolist()]
+
+    @property
+    def neighbors(self):
+        """
+        Vecinos del nodo
+        :return: lista de nodos, uno por arista
+        """
+        if self.graph is None:
+            return []
+        nodes = self.graph.node_list
+        return [nodes[j] for j in self.graph.neighbors(self.index).tolist()]
 
     def __str__(self):
         """
         Convertir el nodo a str
         :return: representación textual del nodo
         """
-        retVal = self.id + ': '
+        retVal = str(self.id) + ': '
         for a in self.attr.values():
             retVal += str(a) + ','
         return retVal
 
     def style(self, est, val):
         """
-        Establece un valor de estilo en el nodo
+        Establece un valor de estilo en el nodo; se cambia el estilo compartido por una copia con el valor nuevo
         :param est: llave del estilo
         :param val: valor del estilo
         :return:
         """
-        self.attr[ATTR_STYLE][est] = val
+        style = dict(self.shared_style)
+        style[est] = val
+        self.set_style(style)
+
+    def set_style(self, style):
+        """
+        Reemplaza el estilo del nodo; si el nodo está en un grafo el estilo se comparte con los nodos que tengan el
+        mismo (ver Graph.set_node_style)
+        :param style: diccionario de estilo
+        :return: None
+        """
+        if self.graph is None:
+            self._extra[ATTR_STYLE] = types.MappingProxyType(dict(style))
+        else:
+            self.graph.set_node_style(self.index, style)
 
     def draw(self, viewport, transform=None):
         """
@@ -59,74 +312,20 @@ class Node:
         :param viewport: descriptor de la zona de dibujo
         :return:
         """
-        pos = self.attr[ATTR_POS_VP]
-        if self.attr[ATTR_STYLE][STYLE_SCALED] and transform is not None:
-            tam2 = self.attr[ATTR_STYLE][STYLE_SIZE] * transform.escala
+        pos = self.pos_vp
+        style = self.shared_style
+        if style[STYLE_SCALED] and transform is not None:
+            tam2 = style[STYLE_SIZE] * transform.escala
+        else:
+            tam2 = style[STYLE_SIZE]
+
+        surf = viewport.frame.surf
+        sprite = SPRITES.get(style, tam2, surf)
+        if sprite is None:
+            draw_shape(surf, sprite_key(style, tam2), pos[0], pos[1])
         else:
-            tam2 = self.attr[ATTR_STYLE][STYLE_SIZE]
-
-        tam = tam2 / 2
-
-        if self.attr[ATTR_STYLE][STYLE_FORM] == FORM_CIRCLE:
-            if self.attr[ATTR_STYLE][STYLE_FILLED]:
-                pygame.draw.ellipse(viewport.frame.surf,
-                                    self.attr[ATTR_STYLE][STYLE_FILLCOLOR],
-                                    (pos[0] - tam, pos[1] - tam, tam2, tam2),
-                                    width=0)
-            if self.attr[ATTR_STYLE][STYLE_BORDERED]:
-                pygame.draw.ellipse(viewport.frame.surf, self.attr[ATTR_STYLE][STYLE_BORDERCOLOR],
-                                    (pos[0] - tam, pos[1] - tam, tam2, tam2),
-                                    width=self.attr[ATTR_STYLE][STYLE_THICKNESS])
-
-        elif self.attr[ATTR_STYLE][STYLE_FORM] == FORM_SQUARE:
-            if self.attr[ATTR_STYLE][STYLE_FILLED]:
-                pygame.draw.rect(viewport.frame.surf, self.attr[ATTR_STYLE][STYLE_FILLCOLOR],
-                                 (pos[0] - tam, pos[1] - tam, tam2, tam2),
-                                 width=0)
-            if self.attr[ATTR_STYLE][STYLE_BORDERED]:
-                pygame.draw.rect(viewport.frame.surf, self.attr[ATTR_STYLE][STYLE_BORDERCOLOR],
-                                 (pos[0] - tam, pos[1] - tam, tam2, tam2),
-                                 width=self.attr[ATTR_STYLE][STYLE_THICKNESS])
-
-        elif self.attr[ATTR_STYLE][STYLE_FORM] == FORM_TRIANGLE:
-            if self.attr[ATTR_STYLE][STYLE_FILLED]:
-                pygame.draw.polygon(viewport.frame.surf, self.attr[ATTR_STYLE][STYLE_FILLCOLOR],
-                                    ((pos[0] - tam, pos[1] + tam),
-                                     (pos[0], pos[1] - tam),
-                                     (pos[0] + tam, pos[1] + tam)),
-                                    width=0)
-            if self.attr[ATTR_STYLE][STYLE_BORDERED]:
-                pygame.draw.polygon(viewport.frame.surf, self.attr[ATTR_STYLE][STYLE_BORDERCOLOR],
-                                    ((pos[0] - tam, pos[1] + tam),
-                                     (pos[0], pos[1] - tam),
-                                     (pos[0] + tam, pos[1] + tam)),
-                                    width=self.attr[ATTR_STYLE][STYLE_THICKNESS])
-
-        elif self.attr[ATTR_STYLE][STYLE_FORM] == FORM_CROSSOUT:
-            pygame.draw.line(viewport.frame.surf, self.attr[ATTR_STYLE][STYLE_BORDERCOLOR],
-                             (pos[0] - tam, pos[1] - tam),
-                             (pos[0] + tam, pos[1] + tam),
-                             width=self.attr[ATTR_STYLE][STYLE_THICKNESS])
-            pygame.draw.line(viewport.frame.surf, self.attr[ATTR_STYLE][STYLE_BORDERCOLOR],
-                             (pos[0] - tam, pos[1] + tam),
-                             (pos[0] + tam, pos[1] - tam),
-                             width=self.attr[ATTR_STYLE][STYLE_THICKNESS])
-
-        elif self.attr[ATTR_STYLE][STYLE_FORM] == FORM_CROSS:
-            pygame.draw.line(viewport.frame.surf, self.attr[ATTR_STYLE][STYLE_BORDERCOLOR],
-                             (pos[0], pos[1] - tam),
-                             (pos[0], pos[1] + tam),
-                             width=self.attr[ATTR_STYLE][STYLE_THICKNESS])
-            pygame.draw.line(viewport.frame.surf, self.attr[ATTR_STYLE][STYLE_BORDERCOLOR],
-                             (pos[0] - tam, pos[1]),
-                             (pos[0] + tam, pos[1]),
-                             width=self.attr[ATTR_STYLE][STYLE_THICKNESS])
-
-        if self.attr[ATTR_STYLE][STYLE_SHOW_ID]:
-            lon = len(str(self.id)) * viewport.tam_fuente / 4
-            try:
-                viewport.text((pos[0] - lon, pos[1] - viewport.tam_fuente / 3),
-                              self.attr[ATTR_STYLE][STYLE_BORDERCOLOR],
-                              str(self.id))
-            except:
-                print('Except: g.fuente.render_to()')
+            surf.blit(sprite[0], (pos[0] - sprite[1], pos[1] - sprite[1]))
+
+        if style[STYLE_SHOW_ID]:
+            label = viewport.frame.label(style[STYLE_BORDERCOLOR], str(self.id))
+            viewport.frame.surf.blit(label, (pos[0] - label.get_width() / 2, pos[1] - label.get_height() / 2))
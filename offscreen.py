@@ -0,0 +1,141 @@
+"""
+Dibujo de grafos sin ventana
+
+Un OffscreenFrame dibuja en una Surface de pygame que comparte la memoria de un arreglo de NumPy (alto, ancho, 3),
+así que al terminar de dibujar los pixeles ya están en el arreglo. No se inicializa la pantalla ni el manejo de
+eventos de pygame, sólo freetype para las etiquetas, por lo que funciona en servidores sin pantalla y dentro de
+procesos de trabajo.
+"""
+import concurrent.futures
+import os
+
+import numpy
+import pygame
+import pygame.freetype
+
+from graph import Graph
+from ui import Frame, Viewport
+
+FONT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts', 'courier_b.ttf')
+THUMBNAIL = (256, 256)      # resolución predeterminada de las imágenes por lotes
+
+
+def write_ppm(archivo, pixels):
+    """
+    Escribe una imagen en formato PPM binario (P6)
+    :param archivo: nombre del archivo
+    :param pixels: arreglo (alto, ancho, 3) de uint8
+    :return: None
+    """
+    pixels = numpy.ascontiguousarray(pixels, dtype=numpy.uint8)
+    with open(archivo, 'wb') as f:
+        f.write(b'P6\n%d %d\n255\n' % (pixels.shape[1], pixels.shape[0]))
+        f.write(pixels.tobytes())
+
+
+class OffscreenFrame(Frame):
+    """
+    Clase para dibujar viewports en memoria, sin ventana
+
+    pixels es el arreglo (alto, ancho, 3) en el que se dibuja; puede darse uno ya existente para dibujar directamente
+    en él
+    """
+
+    def __init__(self, res, pixels=None):
+        """
+        Constructor
+        :param res: resolución (ancho, alto)
+        :param pixels: arreglo (alto, ancho, 3) de uint8 contiguo donde dibujar, opcional
+        """
+        super().__init__()
+        width, height = int(res[0]), int(res[1])
+        if pixels is None:
+            pixels = numpy.zeros((height, width, 3), dtype=numpy.uint8)
+        elif pixels.shape != (height, width, 3) or pixels.dtype != numpy.uint8 or not pixels.flags.c_contiguous:
+            raise ValueError('pixels debe ser un arreglo contiguo de uint8 de forma ' + str((height, width, 3)))
+        self.pixels = pixels
+        self.surf = pygame.image.frombuffer(pixels, (width, height), 'RGB')
+
+        pygame.freetype.init()
+        self.set_font(FONT)
+
+    def render(self):
+        """
+        Dibuja todos los viewports una vez
+        :return: arreglo con los pixeles
+        """
+        for v in self.views:
+            v.draw()
+        return self.pixels
+
+    def save(self, archivo):
+        """
+        Guarda la imagen; los archivos .ppm se escriben directamente y los demás formatos (.png, .bmp, .tga, .jpg)
+        con pygame.image.save
+        :param archivo: nombre del archivo
+        :return: None
+        """
+        if archivo.lower().endswith('.ppm'):
+            write_ppm(archivo, self.pixels)
+        else:
+            pygame.image.save(self.surf, archivo)
+
+
+def render_graph(g, res=THUMBNAIL, archivo=None, pixels=None, margen=0.05):
+    """
+    Dibuja un grafo con sus estilos en memoria
+    :param g: grafo
+    :param res: resolución (ancho, alto)
+    :param archivo: nombre del archivo donde guardar la imagen, opcional
+    :param pixels: arreglo (alto, ancho, 3) de uint8 donde dibujar, opcional
+    :param margen: porcentaje del area que se toma como margen
+    :return: arreglo (alto, ancho, 3) con los pixeles
+    """
+    frame = OffscreenFrame(res, pixels)
+    vp = Viewport(g)
+    frame.add_viewport(vp)
+    vp.set_rect([0, 0], res, margen)
+    frame.render()
+    if archivo is not None:
+        frame.save(archivo)
+    return frame.pixels
+
+
+def render_job(source, archivo, res=THUMBNAIL, layout=None, margen=0.05):
+    """
+    Trabajo de render_batch: obtiene el grafo, lo acomoda si se pidió y guarda su imagen
+    :param source: nombre de un archivo DOT o función sin parámetros que construye el grafo
+    :param archivo: nombre del archivo de la imagen
+    :param res: resolución (ancho, alto)
+    :param layout: clase de disposición (por ejemplo layout.Grid) que se ejecuta antes de dibujar, opcional
+    :param margen: porcentaje del area que se toma como margen
+    :return: nombre del archivo de la imagen
+    """
+    g = Graph.load(source) if isinstance(source, str) else source()
+    if layout is not None:
+        layout(g).run()
+    render_graph(g, res, archivo, margen=margen)
+    return archivo
+
+
+def render_batch(jobs, res=THUMBNAIL, workers=None, layout=None, margen=0.05):
+    """
+    Dibuja muchos grafos en procesos de trabajo y guarda sus imágenes.
+
+    Los grafos no viajan entre procesos: cada trabajo da el nombre de un archivo DOT o una función a nivel de módulo
+    (por ejemplo functools.partial(algoritmos.randomGeo, 500, 0.1)) que el proceso de trabajo llama para
+    construirlo
+    :param jobs: lista de parejas (archivo DOT o función, archivo de la imagen)
+    :param res: resolución (ancho, alto)
+    :param workers: número de procesos, None para uno por procesador, 1 para dibujar en este proceso
+    :param layout: clase de disposición que se ejecuta sobre cada grafo antes de dibujarlo, opcional
+    :param margen: porcentaje del area que se toma como margen
+    :return: lista con los nombres de las imágenes, en el órden de los trabajos
+    """
+    jobs = list(jobs)
+    if workers == 1 or len(jobs) <= 1:
+        return [render_job(source, archivo, res, layout, margen) for source, archivo in jobs]
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        tasks = [pool.submit(render_job, source, archivo, res, layout, margen) for source, archivo in jobs]
+        return [task.result() for task in tasks]
@@ -1,7 +1,10 @@
 import math
 
+import numpy
 import pygame
 
+from util import accumulate, expand
+
 
 class Point:
     def __init__(self, x, y, datos):
@@ -137,3 +140,337 @@ class QuadTree:
         #     P = transf.transformar([p.x, p.y])
         #     pygame.draw.line(sup, color, (P[0] - 5, P[1] - 5), (P[0] + 5, P[1] + 5))
         #     pygame.draw.line(sup, color, (P[0] - 5, P[1] + 5), (P[0] + 5, P[1] - 5))
+
+
+#####################################################################################################################
+MAX_DEPTH = 16      # bits por eje del código de Morton, es la profundidad máxima del árbol
+CHUNK_SIZE = 4096   # número de puntos que recorren el árbol a la vez al calcular fuerzas
+
+
+def part1by1(x):
+    """
+    Separa los bits de x intercalando un cero entre cada uno (0b1011 -> 0b1000101)
+    :param x: arreglo de enteros de hasta 32 bits
+    :return: arreglo uint64 con los bits separados
+    """
+    x = x.astype(numpy.uint64) & numpy.uint64(0x00000000FFFFFFFF)
+    x = (x | (x << numpy.uint64(16))) & numpy.uint64(0x0000FFFF0000FFFF)
+    x = (x | (x << numpy.uint64(8))) & numpy.uint64(0x00FF00FF00FF00FF)
+    x = (x | (x << numpy.uint64(4))) & numpy.uint64(0x0F0F0F0F0F0F0F0F)
+    x = (x | (x << numpy.uint64(2))) & numpy.uint64(0x3333333333333333)
+    x = (x | (x << numpy.uint64(1))) & numpy.uint64(0x5555555555555555)
+    return x
+
+
+def morton_codes(pos, origin, size, depth=MAX_DEPTH):
+    """
+    Código de Morton (orden Z) de cada punto dentro del cuadrado [origin, origin + size]
+    :param pos: posiciones (n, 2)
+    :param origin: esquina inferior del cuadrado
+    :param size: lado del cuadrado
+    :param depth: bits por eje
+    :return: arreglo uint64 con los códigos
+    """
+    cells = 1 << depth
+    q = numpy.floor((pos - origin) * (cells / size)).astype(numpy.int64)
+    numpy.clip(q, 0, cells - 1, out=q)
+    return part1by1(q[:, 0]) | (part1by1(q[:, 1]) << numpy.uint64(1))
+
+
+class LinearQuadTree:
+    """
+    Quadtree lineal
+
+    el árbol se construye de una sola vez a partir de los puntos ordenados por su código de Morton, de forma que cada
+    celda corresponde a un rango contiguo [start, end) de puntos ordenados. Los hijos, la masa, el centro de masa y el
+    tamaño de cada celda se guardan en arreglos paralelos indexados por el número de celda; la celda 0 es la raíz.
+    """
+
+    def __init__(self, pos, capacity=8, depth=MAX_DEPTH, bounds=None):
+        """
+        Constructor
+        :param pos: posiciones (n, 2) de los puntos
+        :param capacity: número máximo de puntos en una hoja
+        :param depth: profundidad máxima del árbol
+        :param bounds: esquinas (lo, hi) de un rectángulo que contiene a todos los puntos, si ya se conocen
+        """
+        pos = numpy.asarray(pos, dtype=float)
+        self.capacity = max(1, capacity)
+        self.depth = depth
+
+        if bounds is not None:
+            lo = numpy.asarray(bounds[0], dtype=float)
+            hi = numpy.asarray(bounds[1], dtype=float)
+        elif len(pos) > 0:
+            lo = pos.min(axis=0)
+            hi = pos.max(axis=0)
+        else:
+            lo = numpy.zeros(2)
+            hi = numpy.ones(2)
+        self.origin = lo
+        self.size = max(float((hi - lo).max()), 1e-9)
+
+        codes = morton_codes(pos, self.origin, self.size, depth)
+        self.order = numpy.argsort(codes, kind='stable')
+        self.codes = codes[self.order]
+        self.points = pos[self.order]
+
+        self.leaf_order = None
+        self.build()
+        self.compute_mass()
+
+    def build(self):
+        """
+        Construye las celdas nivel por nivel; en cada nivel todas las celdas que exceden la capacidad se dividen a la
+        vez buscando en los códigos ordenados dónde empieza cada uno de sus cuatro cuadrantes
+        :return: None
+        """
+        n = len(self.codes)
+        starts = [numpy.array([0])]
+        ends = [numpy.array([n])]
+        levels = [numpy.array([0])]
+        children = []
+
+        prefix = numpy.array([0], dtype=numpy.uint64)
+        start = starts[0]
+        end = ends[0]
+        count = 1       # número de celdas creadas hasta ahora
+        level = 0
+
+        while len(start) > 0:
+            ch = numpy.full((len(start), 4), -1, dtype=numpy.int64)
+            split = numpy.nonzero((end - start > self.capacity) & (level < self.depth))[0]
+
+            if len(split) == 0:
+                children.append(ch)
+                break
+
+            # límites de los cuatro cuadrantes de cada celda que se divide
+            shift = numpy.uint64(2 * (self.depth - level - 1))
+            base = prefix[split] * numpy.uint64(4)
+            keys = (base[:, None] + numpy.arange(5, dtype=numpy.uint64)[None, :]) << shift
+            bounds = numpy.searchsorted(self.codes, keys.ravel()).reshape(-1, 5)
+            bounds[:, 0] = start[split]
+            bounds[:, 4] = end[split]
+
+            c_start = bounds[:, :4].ravel()
+            c_end = bounds[:, 1:].ravel()
+            c_prefix = (base[:, None] + numpy.arange(4, dtype=numpy.uint64)[None, :]).ravel()
+            keep = c_end > c_start
+
+            ids = numpy.full(len(c_start), -1, dtype=numpy.int64)
+            ids[keep] = count + numpy.arange(numpy.count_nonzero(keep))
+            ch[split] = ids.reshape(-1, 4)
+            children.append(ch)
+
+            count += numpy.count_nonzero(keep)
+            level += 1
+            start = c_start[keep]
+            end = c_end[keep]
+            prefix = c_prefix[keep]
+            starts.append(start)
+            ends.append(end)
+            levels.append(numpy.full(len(start), level))
+
+        self.start = numpy.concatenate(starts)
+        self.end = numpy.concatenate(ends)
+        self.level = numpy.concatenate(levels)
+        self.children = numpy.concatenate(children)
+        self.is_leaf = (self.children < 0).all(axis=1)
+        self.width = self.size / (2.0 ** self.level)
+
+    def compute_mass(self):
+        """
+        Calcula la masa (número de puntos) y el centro de masa de todas las celdas con sumas prefijas sobre los puntos
+        ordenados, sin recorrer el árbol
+        :return: None
+        """
+        csum = numpy.zeros((len(self.points) + 1, 2))
+        numpy.cumsum(self.points, axis=0, out=csum[1:])
+
+        self.mass = (self.end - self.start).astype(float)
+        com = (csum[self.end] - csum[self.start]) / numpy.maximum(self.mass, 1)[:, None]
+
+        # se guardan por columnas, indexar arreglos 1D es bastante más rápido que indexar renglones de un (n, 2)
+        self.com_x = numpy.ascontiguousarray(com[:, 0])
+        self.com_y = numpy.ascontiguousarray(com[:, 1])
+        self.px = numpy.ascontiguousarray(self.points[:, 0])
+        self.py = numpy.ascontiguousarray(self.points[:, 1])
+
+    @property
+    def center_of_mass(self):
+        return numpy.column_stack((self.com_x, self.com_y))
+
+    def __len__(self):
+        return len(self.start)
+
+    # arreglos que necesita el recorrido del árbol para calcular fuerzas
+    WALK_ARRAYS = ('start', 'end', 'children', 'is_leaf', 'width', 'mass', 'com_x', 'com_y', 'px', 'py', 'leaf_order')
+
+    def arrays(self):
+        """
+        Arreglos del árbol necesarios para calcular fuerzas, por ejemplo para pasarlos a otro proceso
+        :return: diccionario nombre -> arreglo
+        """
+        self.leaves()
+        return {name: getattr(self, name) for name in LinearQuadTree.WALK_ARRAYS}
+
+    @staticmethod
+    def from_arrays(arrays):
+        """
+        Reconstruye un árbol a partir de sus arreglos, sin copiarlos
+        :param arrays: diccionario obtenido con arrays()
+        :return: LinearQuadTree que sólo sirve para calcular fuerzas
+        """
+        tree = LinearQuadTree.__new__(LinearQuadTree)
+        for name in LinearQuadTree.WALK_ARRAYS:
+            setattr(tree, name, arrays[name])
+        return tree
+
+    def repulsion_forces(self, pos, k, theta=1.0, chunk_size=CHUNK_SIZE):
+        """
+        Fuerza de repulsión aproximada de Barnes-Hut sobre puntos cualesquiera
+        :param pos: posiciones (n, 2) de los puntos sobre los que se calcula la fuerza
+        :param k: distancia ideal
+        :param theta: criterio de apertura, una celda se toma como un solo cuerpo si ancho / distancia < theta
+        :param chunk_size: número de puntos que recorren el árbol a la vez
+        :return: fuerza (n, 2) sobre cada punto
+        """
+        pos = numpy.asarray(pos, dtype=float)
+        force = numpy.empty((len(pos), 2))
+        for i in range(0, len(pos), chunk_size):
+            b = pos[i:i + chunk_size]
+            fx, fy = self.walk(b[:, 0].copy(), b[:, 1].copy(), numpy.zeros(len(b)),
+                               numpy.ones(len(b), dtype=numpy.int64), k, theta)
+            force[i:i + chunk_size, 0] = fx
+            force[i:i + chunk_size, 1] = fy
+        return force
+
+    def self_repulsion_forces(self, k, theta=1.0, chunk_size=CHUNK_SIZE, leaves=None, out=None):
+        """
+        Fuerza de repulsión aproximada de Barnes-Hut entre los mismos puntos del árbol. Los puntos de una hoja
+        comparten el recorrido del árbol y la fuerza de las celdas lejanas, que se evalúa una sola vez en el centro de
+        masa de la hoja
+        :param k: distancia ideal
+        :param theta: criterio de apertura, una celda se toma como un solo cuerpo si ancho / distancia < theta
+        :param chunk_size: número de hojas que recorren el árbol a la vez
+        :param leaves: rango (primera, última) de hojas a calcular, en el órden de sus puntos; None para todas
+        :param out: arreglo (n, 2) donde se escriben las fuerzas, sólo se tocan los puntos de las hojas calculadas
+        :return: fuerza (n, 2) sobre cada punto en el órden de los puntos ordenados (self.points)
+        """
+        force = numpy.zeros((len(self.px), 2)) if out is None else out
+        if len(self.px) == 0:
+            return force
+
+        ordered = self.leaves()
+        first, last = (0, len(ordered)) if leaves is None else leaves
+
+        for i in range(first, last, chunk_size):
+            block = ordered[i:min(i + chunk_size, last)]
+            start = self.start[block]
+            count = self.end[block] - start
+
+            # cada hoja se representa por su centro de masa y el radio del círculo que encierra sus puntos
+            cx = self.com_x[block]
+            cy = self.com_y[block]
+            owner = numpy.repeat(numpy.arange(len(block)), count)
+            d2 = (self.px[start[0]:self.end[block[-1]]] - cx[owner]) ** 2 + \
+                (self.py[start[0]:self.end[block[-1]]] - cy[owner]) ** 2
+            radius = numpy.sqrt(numpy.maximum.reduceat(d2, start - start[0]))
+
+            # los puntos del bloque son contiguos en el arreglo ordenado
+            p0 = start[0]
+            p1 = self.end[block[-1]]
+            fx, fy = self.walk(cx, cy, radius, count, k, theta, p0)
+            force[p0:p1, 0] = fx
+            force[p0:p1, 1] = fy
+
+        return force
+
+    def leaves(self):
+        """
+        Hojas del árbol en el órden de sus puntos, así cada bloque de hojas cubre un rango contiguo de puntos
+        :return: arreglo con los números de celda de las hojas
+        """
+        if self.leaf_order is None:
+            leaves = numpy.nonzero(self.is_leaf)[0]
+            self.leaf_order = leaves[numpy.argsort(self.start[leaves], kind='stable')]
+        return self.leaf_order
+
+    def walk(self, tx, ty, radius, count, k, theta, first=None):
+        """
+        Recorre el árbol para un bloque de grupos de puntos usando una pila explícita de pares (grupo, celda); en cada
+        vuelta se procesan todos los pares pendientes: las celdas lejanas aportan su masa completa en el centro del
+        grupo, las hojas cercanas aportan punto por punto y las celdas internas cercanas se reemplazan por sus hijos.
+
+        Una celda es lejana si su ancho es menor que theta veces la distancia de su centro de masa al círculo que
+        encierra al grupo. Las contribuciones de cada punto se suman siempre en el mismo órden, sin importar cómo se
+        partan los grupos en bloques.
+        :param tx: coordenada x del centro de cada grupo
+        :param ty: coordenada y del centro de cada grupo
+        :param radius: radio de cada grupo
+        :param count: número de puntos de cada grupo
+        :param k: distancia ideal
+        :param theta: criterio de apertura
+        :param first: si es None cada grupo es un solo punto en su centro; si no, los grupos son rangos consecutivos
+            de self.points que empiezan en first
+        :return: (fx, fy) fuerza sobre cada punto
+        """
+        if first is None:
+            qx, qy = tx, ty
+        else:
+            qx = self.px[first:first + count.sum()]
+            qy = self.py[first:first + count.sum()]
+        offset = numpy.cumsum(count) - count
+
+        fx = numpy.zeros(len(qx))
+        fy = numpy.zeros(len(qx))
+        if len(tx) == 0 or len(self.px) == 0:
+            return fx, fy
+
+        # fuerza de las celdas lejanas sobre el centro de cada grupo
+        gx = numpy.zeros(len(tx))
+        gy = numpy.zeros(len(tx))
+
+        k2 = k ** 2
+        ti = numpy.arange(len(tx))
+        cells = numpy.zeros(len(tx), dtype=numpy.int64)
+
+        while len(ti) > 0:
+            dx = tx[ti] - self.com_x[cells]
+            dy = ty[ti] - self.com_y[cells]
+            r = numpy.sqrt(dx * dx + dy * dy) - radius[ti]
+            leaf = self.is_leaf[cells]
+            far = ~leaf & (self.width[cells] < theta * r)
+
+            # celdas lejanas: (vec / r) * fr(k, r) * masa = vec * k^2 * masa / r^2
+            if far.any():
+                c = cells[far]
+                f = k2 * self.mass[c] / (dx[far] ** 2 + dy[far] ** 2)
+                accumulate(gx, gy, ti[far], dx[far], dy[far], f)
+
+            # hojas: interacción directa entre cada punto del grupo y cada punto de la hoja, excepto los que están en la
+            # misma posición
+            if leaf.any():
+                owner, pair = expand(offset[ti[leaf]], count[ti[leaf]])
+                s_start = self.start[cells[leaf]][pair]
+                s_count = self.end[cells[leaf]][pair] - s_start
+                source, pair = expand(s_start, s_count)
+                owner = owner[pair]
+
+                dx = qx[owner] - self.px[source]
+                dy = qy[owner] - self.py[source]
+                d2 = dx * dx + dy * dy
+                f = numpy.divide(k2, d2, out=numpy.zeros_like(d2), where=d2 > 0)
+                accumulate(fx, fy, owner, dx, dy, f)
+
+            # celdas internas cercanas: se apilan sus hijos
+            near = ~(leaf | far)
+            ch = self.children[cells[near]].ravel()
+            valid = ch >= 0
+            ti = numpy.repeat(ti[near], 4)[valid]
+            cells = ch[valid]
+
+        fx += numpy.repeat(gx, count)
+        fy += numpy.repeat(gy, count)
+        return fx, fy
@@ -0,0 +1,511 @@
+"""
+Dibujo por lotes de un Graph
+
+Los nodos y las aristas se agrupan por su índice en las tablas de estilos compartidos del grafo (node_styles y
+edge_styles); cada grupo resuelve su estilo una sola vez y dibuja a todos sus elementos con las coordenadas de
+viewport ya transformadas en un solo arreglo, sin crear objetos Node o Edge.
+"""
+import itertools
+import math
+
+import numpy
+import pygame
+
+from labels import one_per_cell, thin_labels
+from quadtree import LinearQuadTree
+from spatial import BoxIndex
+from sprites import SPRITES, draw_shape, sprite_key
+from util import draw_dashed_line
+from names import *
+
+INDEX_TAIL = 1024   # nodos o aristas nuevos que se revisan uno por uno antes de reconstruir los índices espaciales
+LOD_PIXELS = 16     # lado en pixeles a partir del cual una celda del quadtree se dibuja como un solo cuerpo
+LOD_CAPACITY = 4    # puntos por hoja del quadtree del nivel de detalle
+LOD_MAX_WIDTH = 6   # grosor máximo de una arista agrupada
+
+
+def style_groups(ix):
+    """
+    Agrupa los elementos por estilo
+    :param ix: arreglo con el índice de estilo de cada elemento
+    :return: lista de parejas (índice de estilo, arreglo con los elementos que lo usan), en órden de estilo
+    """
+    if len(ix) == 0:
+        return []
+    if not ix.any():
+        return [(0, numpy.arange(len(ix)))]
+
+    order = numpy.argsort(ix, kind='stable')
+    ix = ix[order]
+    bounds = numpy.flatnonzero(ix[1:] != ix[:-1]) + 1
+    starts = numpy.concatenate(([0], bounds))
+    ends = numpy.concatenate((bounds, [len(ix)]))
+    return [(int(ix[a]), order[a:b]) for a, b in zip(starts, ends)]
+
+
+def pair_by_source(s):
+    """
+    Forma parejas de aristas con el mismo origen
+    :param s: arreglo con el origen de cada arista
+    :return: (posiciones de la primera arista de cada pareja, posiciones de la segunda, posiciones de las aristas
+             que quedaron solas)
+    """
+    order = numpy.argsort(s, kind='stable')
+    ss = s[order]
+    starts = numpy.flatnonzero(numpy.concatenate(([True], ss[1:] != ss[:-1])))
+    rank = numpy.arange(len(ss)) - numpy.repeat(starts, numpy.diff(numpy.concatenate((starts, [len(ss)]))))
+    first = (rank % 2 == 0)
+    first[-1:] = False
+    first[:-1] &= ss[1:] == ss[:-1]
+    second = numpy.zeros(len(ss), dtype=bool)
+    second[1:] = first[:-1]
+    return order[first], order[second], order[~(first | second)]
+
+
+def segment_crosses(a, b, lo, hi):
+    """
+    Revisa qué segmentos tocan un rectángulo, sabiendo que sus cajas sí lo tocan: basta con que las cuatro esquinas
+    no queden del mismo lado de la recta del segmento
+    :param a: arreglo (k, 2) con un extremo de cada segmento
+    :param b: arreglo (k, 2) con el otro extremo
+    :param lo: esquina inferior del rectángulo
+    :param hi: esquina superior del rectángulo
+    :return: arreglo de bool
+    """
+    d = b - a
+    side = [d[:, 0] * (y - a[:, 1]) - d[:, 1] * (x - a[:, 0]) for x in (lo[0], hi[0]) for y in (lo[1], hi[1])]
+    side = numpy.array(side)
+    return ~((side > 0).all(axis=0) | (side < 0).all(axis=0))
+
+
+class DetailCut:
+    """
+    Clase corte del quadtree a un nivel: las celdas de ese nivel y las hojas que quedan arriba de él
+
+    las celdas del corte con más de un nodo en el nivel del corte son agregados; los nodos de las demás celdas se
+    dibujan uno por uno (abiertos). Las aristas entre nodos abiertos se dibujan normalmente y las demás se juntan en
+    una sola arista por pareja de extremos (nodo abierto o agregado)
+    """
+
+    def __init__(self, graph, tree, level, snapshot):
+        """
+        Constructor
+        :param graph: grafo
+        :param tree: LinearQuadTree de las posiciones de la copia
+        :param level: nivel del corte
+        :param snapshot: PositionSnapshot con las posiciones y el número de aristas
+        """
+        n = len(snapshot.pos)
+        m = snapshot.m
+        cells = numpy.flatnonzero((tree.level == level) | (tree.is_leaf & (tree.level < level)))
+        cells = cells[numpy.argsort(tree.start[cells])]
+        count = tree.end[cells] - tree.start[cells]
+        aggregate = (tree.level[cells] == level) & (count > 1)
+
+        # celda del corte de cada nodo; las celdas cubren a los puntos ordenados en rangos contiguos
+        node_cell = numpy.empty(n, dtype=numpy.int64)
+        node_cell[tree.order] = numpy.repeat(numpy.arange(len(cells)), count)
+        grouped = aggregate[node_cell]
+        self.open_nodes = numpy.flatnonzero(~grouped)
+
+        agg = cells[aggregate]
+        self.mass = tree.mass[agg]
+        self.com = tree.center_of_mass[agg]
+        self.width = tree.width[agg]
+        # cada agregado se dibuja con el estilo que tenga su primer nodo al momento de dibujar, así un cambio de
+        # estilo (por ejemplo la animación de un recorrido) se ve sin reconstruir el corte
+        self.rep = tree.order[tree.start[agg]]
+
+        # extremo que representa a cada nodo: el propio nodo o n + número de agregado
+        agg_number = numpy.cumsum(aggregate) - 1
+        rep = numpy.where(grouped, n + agg_number[node_cell], numpy.arange(n))
+        s = graph.src.data[:m]
+        d = graph.dst.data[:m]
+        plain = ~grouped[s] & ~grouped[d]
+        self.plain_edges = numpy.flatnonzero(plain)
+
+        rs = rep[s]
+        rd = rep[d]
+        bundled = ~plain & (rs != rd)
+        a = numpy.minimum(rs, rd)[bundled]
+        b = numpy.maximum(rs, rd)[bundled]
+        codes = numpy.sort(a * (n + len(agg)) + b)
+        first = numpy.ones(len(codes), dtype=bool)
+        first[1:] = codes[1:] != codes[:-1]
+        starts = numpy.flatnonzero(first)
+        self.bundle_count = numpy.diff(numpy.concatenate((starts, [len(codes)])))
+        codes = codes[starts]
+
+        ends = numpy.concatenate((snapshot.pos, self.com))
+        self.bundle_a = ends[codes // (n + len(agg))]
+        self.bundle_b = ends[codes % (n + len(agg))]
+
+
+class LevelOfDetail:
+    """
+    Clase que resume las zonas densas de un grafo con su quadtree lineal
+
+    el corte depende sólo del nivel del árbol en que las celdas miden menos de LOD_PIXELS pixeles, así que se guarda
+    por nivel y se reconstruye sólo si se mueven nodos o el grafo crece
+    """
+
+    def __init__(self, graph, capacity=LOD_CAPACITY):
+        """
+        Constructor
+        :param graph: grafo
+        :param capacity: puntos por hoja del quadtree
+        """
+        self.graph = graph
+        self.capacity = capacity
+        self.tree = None
+        self.pos_version = -1
+        self.n = 0
+        self.cuts = {}      # (nivel, número de aristas) -> DetailCut
+
+    def cut(self, escala, pixels, snapshot):
+        """
+        Corte del quadtree para una escala
+        :param escala: escala de la transformación
+        :param pixels: lado máximo en pixeles de una celda agregada
+        :param snapshot: PositionSnapshot con las posiciones y el número de aristas
+        :return: DetailCut o None si con esa escala no hay nada que agregar
+        """
+        g = self.graph
+        n = len(snapshot.pos)
+        m = snapshot.m
+        if self.tree is None or self.pos_version != snapshot.version or self.n != n:
+            self.pos_version = snapshot.version
+            self.n = n
+            self.tree = LinearQuadTree(snapshot.pos, self.capacity)
+            self.cuts = {}
+
+        level = max(0, math.ceil(math.log2(max(self.tree.size * escala / pixels, 1e-12))))
+        if level > self.tree.level.max():
+            return None
+        key = (level, m)
+        if key not in self.cuts:
+            if len(self.cuts) >= 8:
+                self.cuts.clear()
+            self.cuts[key] = DetailCut(g, self.tree, level, snapshot)
+        cut = self.cuts[key]
+        return cut if len(cut.mass) > 0 else None
+
+
+class GraphRenderer:
+    """
+    Clase que dibuja un grafo por lotes de nodos y aristas con el mismo estilo
+    """
+
+    def __init__(self, graph):
+        """
+        Constructor
+        :param graph: grafo a dibujar
+        """
+        self.graph = graph
+        self.node_index = None      # índice espacial de los primeros len(node_index) nodos
+        self.edge_index = None      # índice espacial de las cajas de las primeras len(edge_index) aristas
+        self.pos_version = -1       # versión de las posiciones con que se construyeron los índices
+        self.lod_pixels = None      # lado en pixeles de las celdas agregadas, None para dibujar todo
+        self.lod = LevelOfDetail(graph)
+        self.label_thinning = True  # dibujar sólo las etiquetas que no se enciman
+        self.sprites = SPRITES      # imágenes de las formas de los nodos
+
+    def update_index(self, snapshot):
+        """
+        Reconstruye los índices espaciales si se movieron nodos o si los nodos o aristas que llegaron después de
+        construirlos ya son muchos
+        :param snapshot: PositionSnapshot con las posiciones y el número de aristas
+        :return: None
+        """
+        g = self.graph
+        pos = snapshot.pos
+        n = len(pos)
+        m = snapshot.m
+        moved = snapshot.version != self.pos_version or self.node_index is None
+        if moved or n - len(self.node_index) > max(INDEX_TAIL, len(self.node_index) // 8):
+            self.node_index = BoxIndex(pos, pos)
+        if moved or m - len(self.edge_index) > max(INDEX_TAIL, len(self.edge_index) // 8):
+            a = pos[g.src.data[:m]]
+            b = pos[g.dst.data[:m]]
+            self.edge_index = BoxIndex(numpy.minimum(a, b), numpy.maximum(a, b))
+        self.pos_version = snapshot.version
+
+    def visible_nodes(self, lo, hi, pos):
+        """
+        Nodos dentro de un rectángulo del espacio del grafo
+        :param lo: esquina inferior del rectángulo
+        :param hi: esquina superior del rectángulo
+        :param pos: posiciones de los nodos
+        :return: arreglo ordenado con los índices de los nodos
+        """
+        ret = self.node_index.query(lo, hi)
+        first = len(self.node_index)
+        if first < len(pos):
+            p = pos[first:]
+            ret = numpy.concatenate((ret, first + numpy.flatnonzero(((p >= lo) & (p <= hi)).all(axis=1))))
+        return ret
+
+    def visible_edges(self, lo, hi, snapshot):
+        """
+        Aristas que cruzan un rectángulo del espacio del grafo: el índice da las que tienen su caja encimada con el
+        rectángulo y de ellas se quitan las que pasan por fuera de una esquina
+        :param lo: esquina inferior del rectángulo
+        :param hi: esquina superior del rectángulo
+        :param snapshot: PositionSnapshot con las posiciones y el número de aristas
+        :return: arreglo ordenado con los números de las aristas
+        """
+        g = self.graph
+        pos = snapshot.pos
+        m = snapshot.m
+        ret = self.edge_index.query(lo, hi)
+        first = len(self.edge_index)
+        if first < m:
+            a = pos[g.src.data[first:m]]
+            b = pos[g.dst.data[first:m]]
+            inside = ((numpy.minimum(a, b) <= hi) & (numpy.maximum(a, b) >= lo)).all(axis=1)
+            ret = numpy.concatenate((ret, first + numpy.flatnonzero(inside)))
+        return ret[segment_crosses(pos[g.src.data[ret]], pos[g.dst.data[ret]], lo, hi)]
+
+    def node_margin(self, escala):
+        """
+        Mitad del tamaño del nodo más grande, en unidades del espacio del grafo
+        :param escala: escala de la transformación
+        :return: margen
+        """
+        ret = 0.0
+        for style in self.graph.node_styles:
+            size = style[STYLE_SIZE] if style[STYLE_SCALED] else style[STYLE_SIZE] / escala
+            ret = max(ret, size / 2 + style[STYLE_THICKNESS] / escala)
+        return ret
+
+    def draw(self, viewport, transform, snapshot):
+        """
+        Dibuja los nodos y las aristas de una copia de las posiciones que caen en la zona del viewport. Los índices
+        espaciales dan los nodos y las aristas visibles, y sólo a ellos se les calcula la posición en el viewport
+        :param viewport: descriptor de la zona de dibujo
+        :param transform: transformación del espacio del grafo al viewport
+        :param snapshot: PositionSnapshot con las posiciones de los nodos y el número de aristas a dibujar
+        :return: None
+        """
+        corners = transform.inverse(numpy.asarray(viewport.out_rect, dtype=float))
+        lo = corners.min(axis=0)
+        hi = corners.max(axis=0)
+        margin = self.node_margin(transform.escala)
+
+        cut = None
+        if self.lod_pixels is not None:
+            cut = self.lod.cut(transform.escala, self.lod_pixels, snapshot)
+        if cut is not None:
+            self.draw_detail(viewport, transform, cut, snapshot.pos, lo, hi, margin)
+            return
+
+        self.update_index(snapshot)
+        nodes = self.visible_nodes(lo - margin, hi + margin, snapshot.pos)
+        edges = self.visible_edges(lo, hi, snapshot)
+        self.project(transform, snapshot.pos, nodes, edges)
+        self.draw_edges(viewport, edges)
+        self.draw_nodes(viewport, nodes, transform.escala)
+        self.draw_labels(viewport, nodes, edges)
+
+    def project(self, transform, pos, nodes, edges):
+        """
+        Actualiza las posiciones en el viewport de los nodos y de los extremos de las aristas que se van a dibujar
+        :param transform: transformación del espacio del grafo al viewport
+        :param pos: posiciones de los nodos
+        :param nodes: arreglo con los índices de los nodos
+        :param edges: arreglo con los números de las aristas
+        :return: None
+        """
+        g = self.graph
+        n = len(pos)
+        if g.pos_vp is None or len(g.pos_vp) < n:
+            pos_vp = numpy.zeros((max(n, 2 * len(g.pos_vp) if g.pos_vp is not None else 0), 2))
+            if g.pos_vp is not None:
+                pos_vp[:len(g.pos_vp)] = g.pos_vp
+            g.pos_vp = pos_vp
+        needed = numpy.concatenate((nodes, g.src.data[edges], g.dst.data[edges]))
+        g.pos_vp[needed] = transform.transform(pos[needed])
+
+    def draw_detail(self, viewport, transform, cut, pos, lo, hi, margin):
+        """
+        Dibuja un corte del nivel de detalle: las aristas agrupadas con un grosor que crece con el logaritmo de las
+        aristas que representan, cada agregado como un círculo de área proporcional a su masa y los nodos abiertos y
+        sus aristas normalmente. Sólo se dibuja lo que cae en el viewport
+        :param viewport: descriptor de la zona de dibujo
+        :param transform: transformación del espacio del grafo al viewport
+        :param cut: DetailCut
+        :param pos: posiciones de los nodos
+        :param lo: esquina inferior de la zona visible en el espacio del grafo
+        :param hi: esquina superior de la zona visible en el espacio del grafo
+        :param margin: margen de los nodos en el espacio del grafo
+        :return: None
+        """
+        g = self.graph
+        surf = viewport.frame.surf
+
+        a = cut.bundle_a
+        b = cut.bundle_b
+        visible = ((numpy.minimum(a, b) <= hi) & (numpy.maximum(a, b) >= lo)).all(axis=1)
+        visible[visible] = segment_crosses(a[visible], b[visible], lo, hi)
+        color = g.edge_styles[0][STYLE_COLOR]
+        width = numpy.minimum(1 + numpy.log2(cut.bundle_count[visible]).astype(int), LOD_MAX_WIDTH)
+        for w, p, q in zip(width.tolist(), transform.transform(a[visible]).tolist(),
+                           transform.transform(b[visible]).tolist()):
+            pygame.draw.line(surf, color, p, q, w)
+
+        p = pos[g.src.data[cut.plain_edges]]
+        q = pos[g.dst.data[cut.plain_edges]]
+        visible = ((numpy.minimum(p, q) <= hi) & (numpy.maximum(p, q) >= lo)).all(axis=1)
+        visible[visible] = segment_crosses(p[visible], q[visible], lo, hi)
+        edges = cut.plain_edges[visible]
+
+        p = pos[cut.open_nodes]
+        nodes = cut.open_nodes[((p >= lo - margin) & (p <= hi + margin)).all(axis=1)]
+        self.project(transform, pos, nodes, edges)
+        self.draw_edges(viewport, edges)
+
+        # un agregado de cuatro nodos tiene el tamaño de un nodo y el círculo no sale de su celda
+        visible = ((cut.com >= lo - cut.width[:, None]) & (cut.com <= hi + cut.width[:, None])).all(axis=1)
+        mass = numpy.sqrt(cut.mass[visible])
+        cell = cut.width[visible] * transform.escala
+        for k, members in style_groups(g.node_style_ix.data[cut.rep[visible]]):
+            style = g.node_styles[k]
+            fill = style[STYLE_FILLCOLOR]
+            border = style[STYLE_BORDERCOLOR]
+            radius = numpy.clip(mass[members] * style[STYLE_SIZE] / 4, 1.0, cell[members] / 2)
+            for c, r in zip(transform.transform(cut.com[visible][members]).tolist(), radius.tolist()):
+                pygame.draw.circle(surf, fill, c, r)
+                pygame.draw.circle(surf, border, c, r, 1)
+
+        self.draw_nodes(viewport, nodes, transform.escala)
+        self.draw_labels(viewport, nodes, edges)
+
+    def edge_style_ix(self, edges):
+        """
+        Índice de estilo de un conjunto de aristas; las que están más allá de la columna de estilos tienen el estilo
+        por omisión
+        :param edges: arreglo con los números de las aristas
+        :return: arreglo con el índice en graph.edge_styles de cada arista
+        """
+        ix = numpy.zeros(len(edges), dtype=numpy.int32)
+        col = self.graph.edge_data.columns.get(ATTR_STYLE)
+        if col is not None:
+            styled = edges < len(col)
+            ix[styled] = col.data[edges[styled]]
+        return ix
+
+    def draw_edges(self, viewport, edges):
+        """
+        Dibuja un conjunto de aristas agrupadas por estilo; sus extremos ya deben estar en graph.pos_vp. Dentro de cada
+        grupo las aristas que salen de un mismo nodo se dibujan de dos en dos como una línea quebrada
+        destino - origen - destino, con la mitad de llamadas a pygame
+        :param viewport: descriptor de la zona de dibujo
+        :param edges: arreglo con los números de las aristas
+        :return: None
+        """
+        g = self.graph
+        surf = viewport.frame.surf
+        ix = self.edge_style_ix(edges)
+        src = g.src.data[edges]
+        dst = g.dst.data[edges]
+        for k, members in style_groups(ix):
+            style = g.edge_styles[k]
+            color = style[STYLE_COLOR]
+            width = style[STYLE_THICKNESS]
+            s = src[members]
+            d = dst[members]
+
+            if style[STYLE_DOTTED]:
+                for a, b in zip(g.pos_vp[s].tolist(), g.pos_vp[d].tolist()):
+                    draw_dashed_line(surf, color, a, b, width, style[STYLE_SIZE])
+            else:
+                first, second, singles = pair_by_source(s)
+                paths = numpy.stack((g.pos_vp[d[first]], g.pos_vp[s[first]], g.pos_vp[d[second]]), axis=1)
+                p0 = g.pos_vp[s[singles]].tolist()
+                p1 = g.pos_vp[d[singles]].tolist()
+                if style[STYLE_ANTIALIAS]:
+                    for points in paths.tolist():
+                        pygame.draw.aalines(surf, color, False, points)
+                    for a, b in zip(p0, p1):
+                        pygame.draw.aaline(surf, color, a, b)
+                else:
+                    for points in paths.tolist():
+                        pygame.draw.lines(surf, color, False, points, width)
+                    for a, b in zip(p0, p1):
+                        pygame.draw.line(surf, color, a, b, width)
+
+    def draw_nodes(self, viewport, nodes, escala=1.0):
+        """
+        Dibuja un conjunto de nodos agrupados por estilo; sus posiciones ya deben estar en graph.pos_vp. Cada grupo
+        toma la imagen de su forma del atlas y todos los nodos se copian con una sola llamada a Surface.blits
+        :param viewport: descriptor de la zona de dibujo
+        :param nodes: arreglo con los índices de los nodos
+        :param escala: escala de la transformación, para los estilos con STYLE_SCALED
+        :return: None
+        """
+        g = self.graph
+        surf = viewport.frame.surf
+        ix = g.node_style_ix.data[nodes]
+        blits = []
+        for k, members in style_groups(ix):
+            style = g.node_styles[k]
+            tam2 = style[STYLE_SIZE] * escala if style[STYLE_SCALED] else style[STYLE_SIZE]
+            sprite = self.sprites.get(style, tam2, surf)
+            if sprite is None:
+                # nodos demasiado grandes para guardarlos como imagen
+                key = sprite_key(style, tam2)
+                for x, y in g.pos_vp[nodes[members]].tolist():
+                    draw_shape(surf, key, x, y)
+                continue
+            blits.extend(zip(itertools.repeat(sprite[0]), (g.pos_vp[nodes[members]] - sprite[1]).tolist()))
+        surf.blits(blits, doreturn=False)
+
+    def draw_labels(self, viewport, nodes, edges):
+        """
+        Dibuja los nombres de los nodos y de las aristas cuyo estilo tiene STYLE_SHOW_ID; sus posiciones ya deben
+        estar en graph.pos_vp. Los nodos de mayor grado tienen preferencia sobre los demás y los nodos sobre las
+        aristas; con label_thinning sólo se dibujan las etiquetas que no se enciman con otras de mayor preferencia
+        :param viewport: descriptor de la zona de dibujo
+        :param nodes: arreglo con los índices de los nodos dibujados
+        :param edges: arreglo con los números de las aristas dibujadas
+        :return: None
+        """
+        g = self.graph
+        frame = viewport.frame
+        node_shown = numpy.array([style[STYLE_SHOW_ID] for style in g.node_styles], dtype=bool)
+        edge_shown = numpy.array([style[STYLE_SHOW_ID] for style in g.edge_styles], dtype=bool)
+        node_ix = g.node_style_ix.data[nodes]
+        edge_ix = self.edge_style_ix(edges)
+        nodes = nodes[node_shown[node_ix]]
+        node_ix = node_ix[node_shown[node_ix]]
+        edges = edges[edge_shown[edge_ix]]
+        edge_ix = edge_ix[edge_shown[edge_ix]]
+        if len(nodes) == 0 and len(edges) == 0:
+            return
+
+        order = numpy.argsort(-g.deg.data[nodes], kind='stable')
+        nodes = nodes[order]
+        node_ix = node_ix[order]
+        centre = numpy.concatenate((g.pos_vp[nodes],
+                                    (g.pos_vp[g.src.data[edges]] + g.pos_vp[g.dst.data[edges]]) / 2))
+        kept = numpy.flatnonzero(((centre >= viewport.out_rect[0]) & (centre <= viewport.out_rect[1])).all(axis=1))
+        if self.label_thinning:
+            kept = kept[one_per_cell(centre[kept], frame.tam_fuente)]
+
+        surfs = []
+        for i in kept.tolist():
+            if i < len(nodes):
+                cad = str(g.node_names[nodes[i]])
+                col = g.node_styles[node_ix[i]][STYLE_BORDERCOLOR]
+            else:
+                cad = str(g.edge_name(edges[i - len(nodes)]))
+                col = g.edge_styles[edge_ix[i - len(nodes)]][STYLE_COLOR]
+            surfs.append(frame.label(col, cad))
+
+        size = numpy.array([s.get_size() for s in surfs], dtype=float).reshape(-1, 2)
+        lo = centre[kept] - size / 2
+        if self.label_thinning:
+            chosen = thin_labels(lo, lo + size, frame.tam_fuente / 2)
+        else:
+            chosen = range(len(surfs))
+        frame.surf.blits([(surfs[k], lo[k].tolist()) for k in chosen], doreturn=False)
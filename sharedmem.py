@@ -0,0 +1,143 @@
+import weakref
+from multiprocessing import shared_memory
+
+import numpy
+
+
+class SharedArrays:
+    """
+    Clase para publicar arreglos de NumPy en memoria compartida
+
+    el proceso que crea los arreglos es el dueño de la memoria y la libera con close(); sus procesos de trabajo
+    reciben la descripción (spec()) y se conectan a los mismos bloques con attach() sin copiar los datos
+    """
+
+    def __init__(self):
+        self.blocks = {}
+        self.arrays = {}
+
+    def put(self, name, arr):
+        """
+        Copia un arreglo a un bloque nuevo de memoria compartida
+        :param name: nombre del arreglo
+        :param arr: arreglo a copiar
+        :return: el arreglo en memoria compartida
+        """
+        arr = numpy.asarray(arr)
+        return self.empty(name, arr.shape, arr.dtype, arr)
+
+    def empty(self, name, shape, dtype, init=None):
+        """
+        Crea un arreglo en un bloque nuevo de memoria compartida
+        :param name: nombre del arreglo
+        :param shape: forma del arreglo
+        :param dtype: tipo de los elementos
+        :param init: valor inicial, si es None el arreglo se llena de ceros
+        :return: el arreglo en memoria compartida
+        """
+        dtype = numpy.dtype(dtype)
+        size = max(1, int(numpy.prod(shape)) * dtype.itemsize)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        arr = numpy.ndarray(shape, dtype=dtype, buffer=block.buf)
+        if init is None:
+            arr.fill(0)
+        else:
+            arr[...] = init
+
+        self.blocks[name] = block
+        self.arrays[name] = arr
+        return arr
+
+    def fit(self, name, shape, dtype):
+        """
+        Arreglo de la forma pedida sobre el bloque ya creado con ese nombre; sólo se crea un bloque nuevo, con el
+        doble de capacidad, cuando el arreglo ya no cabe en el anterior. El contenido no se conserva
+        :param name: nombre del arreglo
+        :param shape: forma del arreglo
+        :param dtype: tipo de los elementos
+        :return: el arreglo en memoria compartida, sin inicializar
+        """
+        dtype = numpy.dtype(dtype)
+        size = max(1, int(numpy.prod(shape)) * dtype.itemsize)
+        block = self.blocks.get(name)
+        if block is None or block.size < size:
+            self.arrays.pop(name, None)
+            if block is not None:
+                block.close()
+                block.unlink()
+            block = shared_memory.SharedMemory(create=True, size=2 * size)
+            self.blocks[name] = block
+        arr = numpy.ndarray(shape, dtype=dtype, buffer=block.buf)
+        self.arrays[name] = arr
+        return arr
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def keep(self, name):
+        """
+        Quita un arreglo de los que libera close(), para regresarlo sin copiarlo; su bloque se libera cuando el
+        arreglo y todas sus vistas dejan de usarse
+        :param name: nombre del arreglo
+        :return: el arreglo en memoria compartida
+        """
+        arr = self.arrays.pop(name)
+        weakref.finalize(arr, release, self.blocks.pop(name))
+        return arr
+
+    def spec(self):
+        """
+        Descripción de los arreglos para conectarse desde otro proceso
+        :return: diccionario nombre -> (bloque, forma, tipo)
+        """
+        return {name: (self.blocks[name].name, arr.shape, arr.dtype.str) for name, arr in self.arrays.items()}
+
+    def close(self):
+        """
+        Libera todos los bloques de memoria compartida
+        :return: None
+        """
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+
+def attach(spec):
+    """
+    Se conecta a los arreglos publicados por otro proceso
+    :param spec: descripción obtenida con SharedArrays.spec()
+    :return: (diccionario nombre -> arreglo, lista de bloques que hay que cerrar al terminar)
+    """
+    arrays = {}
+    blocks = []
+    for name, (block_name, shape, dtype) in spec.items():
+        # los procesos de trabajo comparten el resource_tracker del dueño, registrar el bloque otra vez no tiene
+        # efecto y el dueño es quien lo quita al liberarlo
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = numpy.ndarray(shape, dtype=numpy.dtype(dtype), buffer=block.buf)
+    return arrays, blocks
+
+
+def detach(arrays, blocks):
+    """
+    Cierra los bloques abiertos con attach()
+    :param arrays: diccionario de arreglos regresado por attach()
+    :param blocks: lista de bloques regresada por attach()
+    :return: None
+    """
+    arrays.clear()
+    for block in blocks:
+        block.close()
+
+
+def release(block):
+    """
+    Cierra y borra un bloque de memoria compartida
+    :param block: SharedMemory
+    :return: None
+    """
+    block.close()
+    block.unlink()
@@ -0,0 +1,90 @@
+"""
+Índice espacial de rectángulos sobre una jerarquía de rejillas
+
+Cada rectángulo se guarda en el nivel cuyas celdas son por lo menos tan grandes como su lado mayor, en la celda que
+contiene su esquina inferior; así, en cada nivel, una consulta sólo revisa las celdas que tocan el rectángulo de
+consulta extendido una celda hacia abajo. Los puntos son rectángulos sin área y quedan todos en el nivel 0.
+"""
+import math
+
+import numpy
+
+from util import expand
+
+PER_CELL = 4        # elementos promedio por celda del nivel 0
+
+
+class BoxIndex:
+    """
+    Clase índice espacial de rectángulos (o puntos) alineados a los ejes
+
+    las celdas de todos los niveles se numeran con una sola llave y los elementos se guardan ordenados por llave, de
+    modo que cada renglón de celdas de una consulta es un rango contiguo que se encuentra con searchsorted
+    """
+
+    def __init__(self, lo, hi, per_cell=PER_CELL):
+        """
+        Constructor
+        :param lo: arreglo (k, 2) con la esquina inferior de cada rectángulo
+        :param hi: arreglo (k, 2) con la esquina superior de cada rectángulo
+        :param per_cell: elementos promedio por celda del nivel 0
+        """
+        self.lo = numpy.array(lo, dtype=float).reshape(-1, 2)
+        self.hi = numpy.array(hi, dtype=float).reshape(-1, 2)
+        k = len(self.lo)
+
+        self.origin = self.lo.min(axis=0) if k > 0 else numpy.zeros(2)
+        span = float((self.hi.max(axis=0) - self.origin).max()) if k > 0 else 0.0
+        span = max(span, 1e-12)
+        self.cell = span / max(1, math.ceil(math.sqrt(k / per_cell)))
+
+        size = (self.hi - self.lo).max(axis=1)
+        level = numpy.ceil(numpy.log2(numpy.maximum(size / self.cell, 1.0))).astype(numpy.int64)
+        self.levels = int(level.max()) + 1 if k > 0 else 1
+
+        # celdas por eje de cada nivel y primera llave de cada nivel
+        self.sizes = self.cell * 2.0 ** numpy.arange(self.levels)
+        self.dims = (span // self.sizes).astype(numpy.int64) + 1
+        self.offsets = numpy.concatenate(([0], numpy.cumsum(self.dims ** 2)))
+
+        dims = self.dims[level]
+        c = numpy.floor((self.lo - self.origin) / self.sizes[level][:, None]).astype(numpy.int64)
+        c = numpy.clip(c, 0, (dims - 1)[:, None])
+        key = self.offsets[level] + c[:, 1] * dims + c[:, 0]
+
+        self.order = numpy.argsort(key, kind='stable')
+        self.keys = key[self.order]
+
+    def __len__(self):
+        return len(self.lo)
+
+    def query(self, qlo, qhi):
+        """
+        Elementos que tocan un rectángulo
+        :param qlo: esquina inferior (x, y) del rectángulo de consulta
+        :param qhi: esquina superior (x, y) del rectángulo de consulta
+        :return: arreglo ordenado con los índices de los elementos
+        """
+        qlo = numpy.asarray(qlo, dtype=float)
+        qhi = numpy.asarray(qhi, dtype=float)
+        starts = []
+        counts = []
+        for level in range(self.levels):
+            size = self.sizes[level]
+            last = self.dims[level] - 1
+            c0 = numpy.clip(numpy.floor((qlo - self.origin) / size).astype(numpy.int64) - 1, 0, last)
+            c1 = numpy.clip(numpy.floor((qhi - self.origin) / size).astype(numpy.int64), 0, last)
+            if (c1 < c0).any():
+                continue
+            rows = self.offsets[level] + numpy.arange(c0[1], c1[1] + 1) * self.dims[level]
+            a = numpy.searchsorted(self.keys, rows + c0[0])
+            b = numpy.searchsorted(self.keys, rows + c1[0] + 1)
+            starts.append(a)
+            counts.append(b - a)
+
+        if not starts:
+            return numpy.empty(0, dtype=numpy.int64)
+        idx, _ = expand(numpy.concatenate(starts), numpy.concatenate(counts))
+        found = self.order[idx]
+        inside = (self.lo[found] <= qhi).all(axis=1) & (self.hi[found] >= qlo).all(axis=1)
+        return numpy.sort(found[inside])
@@ -0,0 +1,132 @@
+"""
+Imágenes ya dibujadas de los nodos
+
+Un nodo se dibuja copiando con blit la imagen de su forma en lugar de llamar a las primitivas de pygame.draw. Cada
+imagen se dibuja una sola vez por combinación de (forma, tamaño en pixeles, relleno, borde, grosor); como la llave
+se forma con los valores del estilo, un nodo al que se le cambia el estilo toma otra imagen sin que haya que
+invalidar nada.
+"""
+from collections import OrderedDict
+
+import pygame
+
+from names import *
+
+SPRITE_LIMIT = 1024     # imágenes máximas guardadas, importa con STYLE_SCALED porque cada zoom da otro tamaño
+SPRITE_MEMORY = 16 << 20    # bytes máximos de las imágenes guardadas
+SPRITE_MAX_SIZE = 128   # tamaño en pixeles a partir del cual el nodo se dibuja con primitivas en lugar de una imagen
+# colores transparentes de las imágenes, se usa el primero que no sea el relleno ni el borde
+COLORKEYS = ((255, 0, 255), (0, 255, 1), (1, 0, 254))
+
+
+def sprite_key(style, tam2):
+    """
+    Llave de la imagen de un estilo de nodo
+    :param style: estilo del nodo
+    :param tam2: tamaño del nodo en pixeles
+    :return: tupla (forma, tamaño, relleno, borde, grosor)
+    """
+    fill = tuple(style[STYLE_FILLCOLOR]) if style[STYLE_FILLED] else None
+    form = style[STYLE_FORM]
+    # las cruces siempre se dibujan con el color del borde
+    border = tuple(style[STYLE_BORDERCOLOR]) if style[STYLE_BORDERED] or form in (FORM_CROSS, FORM_CROSSOUT) else None
+    return form, max(0, int(round(tam2))), fill, border, style[STYLE_THICKNESS]
+
+
+def draw_shape(surf, key, x, y):
+    """
+    Dibuja una forma de nodo con las primitivas de pygame
+    :param surf: surface de dibujo
+    :param key: llave de la imagen (ver sprite_key)
+    :param x: coordenada x del centro
+    :param y: coordenada y del centro
+    :return: None
+    """
+    form, tam2, fill, border, width = key
+    tam = tam2 / 2
+
+    if form in (FORM_CIRCLE, FORM_SQUARE):
+        shape = pygame.draw.ellipse if form == FORM_CIRCLE else pygame.draw.rect
+        rect = (x - tam, y - tam, tam2, tam2)
+        if fill is not None:
+            shape(surf, fill, rect, width=0)
+        if border is not None:
+            shape(surf, border, rect, width=width)
+
+    elif form == FORM_TRIANGLE:
+        triangle = ((x - tam, y + tam), (x, y - tam), (x + tam, y + tam))
+        if fill is not None:
+            pygame.draw.polygon(surf, fill, triangle, width=0)
+        if border is not None:
+            pygame.draw.polygon(surf, border, triangle, width=width)
+
+    elif form == FORM_CROSSOUT:
+        pygame.draw.line(surf, border, (x - tam, y - tam), (x + tam, y + tam), width=width)
+        pygame.draw.line(surf, border, (x - tam, y + tam), (x + tam, y - tam), width=width)
+
+    elif form == FORM_CROSS:
+        pygame.draw.line(surf, border, (x, y - tam), (x, y + tam), width=width)
+        pygame.draw.line(surf, border, (x - tam, y), (x + tam, y), width=width)
+
+
+class SpriteAtlas:
+    """
+    Clase con las imágenes de las formas de los nodos, con desalojo de la menos usada recientemente
+
+    las imágenes se guardan en el formato de pixel de la surface donde se van a copiar y con un color transparente
+    (colorkey con RLEACCEL) en lugar de transparencia por pixel, que es varias veces más lento de copiar; offset es
+    la distancia de la esquina de la imagen al centro del nodo. Los nodos de más de max_size pixeles no se guardan:
+    con STYLE_SCALED y mucho zoom cada imagen ocuparía megabytes y dibujarlos directamente cuesta lo mismo
+    """
+
+    def __init__(self, limit=SPRITE_LIMIT, memory=SPRITE_MEMORY, max_size=SPRITE_MAX_SIZE):
+        """
+        Constructor
+        :param limit: imágenes máximas guardadas
+        :param memory: bytes máximos de las imágenes guardadas
+        :param max_size: tamaño máximo en pixeles de un nodo que se guarda como imagen
+        """
+        self.limit = limit
+        self.memory = memory
+        self.max_size = max_size
+        self.used = 0
+        self.sprites = OrderedDict()    # (llave, formato de la surface destino) -> (Surface, offset)
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def get(self, style, tam2, target):
+        """
+        Imagen de un nodo
+        :param style: estilo del nodo
+        :param tam2: tamaño del nodo en pixeles
+        :param target: surface donde se va a copiar la imagen
+        :return: (Surface, offset), o None si el nodo es más grande que max_size y hay que dibujarlo con draw_shape
+        """
+        key = sprite_key(style, tam2)
+        if key[1] > self.max_size:
+            return None
+        fmt = (target.get_bitsize(), target.get_masks())
+        ret = self.sprites.get((key, fmt))
+        if ret is not None:
+            self.sprites.move_to_end((key, fmt))
+            return ret
+
+        pad = key[4] + 1
+        offset = key[1] // 2 + pad
+        side = key[1] + 2 * pad + 1
+        colorkey = next(c for c in COLORKEYS if c != key[2] and c != key[3])
+        surf = pygame.Surface((side, side), 0, target)
+        surf.fill(colorkey)
+        draw_shape(surf, key, offset, offset)
+        surf.set_colorkey(colorkey, pygame.RLEACCEL)
+        ret = (surf, offset)
+        self.sprites[(key, fmt)] = ret
+        self.used += side * side * surf.get_bytesize()
+        while len(self.sprites) > 1 and (len(self.sprites) > self.limit or self.used > self.memory):
+            old, _ = self.sprites.popitem(last=False)[1]
+            self.used -= old.get_width() * old.get_height() * old.get_bytesize()
+        return ret
+
+
+SPRITES = SpriteAtlas()     # imágenes compartidas por todos los grafos
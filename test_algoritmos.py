@@ -0,0 +1,92 @@
+import itertools
+
+import numpy
+
+import algoritmos
+
+
+def test_gilbert_with_p_one_lists_every_pair_in_order():
+    n = 7
+    directed = algoritmos.gilbert_edges(n, 1.0)
+    assert directed.tolist() == [[i, j] for i in range(n) for j in range(n) if i != j]
+    undirected = algoritmos.gilbert_edges(n, 1.0, directed=False)
+    assert undirected.tolist() == [[i, j] for j in range(n) for i in range(j)]
+
+
+def test_gilbert_edges_are_valid_and_distinct():
+    edges = algoritmos.gilbert_edges(3000, 0.001, directed=False, seed=3, batch_size=100)
+    assert numpy.all(edges[:, 0] < edges[:, 1])
+    assert edges.max() < 3000
+    assert len(numpy.unique(edges[:, 0] * 3000 + edges[:, 1])) == len(edges)
+
+
+def test_gilbert_edge_count_is_binomial():
+    n, p = 2000, 0.002
+    total = n * (n - 1)
+    counts = [len(algoritmos.gilbert_edges(n, p, seed=s)) for s in range(20)]
+    sigma = (total * p * (1 - p)) ** 0.5
+    assert abs(numpy.mean(counts) - total * p) < 3 * sigma / 20 ** 0.5
+    assert all(abs(c - total * p) < 5 * sigma for c in counts)
+
+
+def test_gilbert_pairs_are_equally_likely():
+    n, p, runs = 8, 0.25, 400
+    for directed in (True, False):
+        hits = numpy.zeros((n, n))
+        for s in range(runs):
+            edges = algoritmos.gilbert_edges(n, p, directed, seed=s)
+            hits[edges[:, 0], edges[:, 1]] += 1
+        pairs = [(i, j) for i, j in itertools.product(range(n), repeat=2) if (i != j if directed else i < j)]
+        freq = numpy.array([hits[i, j] for i, j in pairs]) / runs
+        # desviación estándar de cada frecuencia ~0.022
+        assert numpy.all(numpy.abs(freq - p) < 0.11)
+        assert abs(freq.mean() - p) < 0.01
+        assert hits.sum() == sum(hits[i, j] for i, j in pairs)
+
+
+def test_random_gilbert_graph():
+    g = algoritmos.randomGilbert(50, 0.1, directed=False, seed=4)
+    edges = algoritmos.randomGilbert(50, 0.1, directed=False, seed=4, arrays=True)
+    assert len(g.node_names) == 50
+    assert len(g.edge_list) == len(edges)
+
+
+def test_barabasi_edges_are_valid():
+    n, d = 3000, 3
+    edges = algoritmos.barabasi_edges(n, d, seed=5)
+    src, dst = edges[:, 0], edges[:, 1]
+    assert numpy.all(dst < src)
+    assert len(numpy.unique(src * n + dst)) == len(edges)
+    assert numpy.bincount(src).max() <= d
+    assert len(edges) > 0.9 * n * d
+    # se conserva el órden en que se generaron: por nodo nuevo
+    assert numpy.all(numpy.diff(src) >= 0)
+    assert numpy.array_equal(edges, algoritmos.barabasi_edges(n, d, seed=5))
+
+
+def test_barabasi_attachment_is_proportional_to_degree():
+    # con d = 1 el tercer nodo se une al 0 con probabilidad 8/15 y al 1 con 4/15 (el resto son lazos descartados)
+    runs = 3000
+    hits = {0: 0, 1: 0}
+    for s in range(runs):
+        for u, v in algoritmos.barabasi_edges(3, 1, seed=s).tolist():
+            if u == 2:
+                hits[v] += 1
+    assert abs(hits[0] / runs - 8 / 15) < 0.03
+    assert abs(hits[1] / runs - 4 / 15) < 0.03
+
+
+def test_barabasi_degrees_have_a_heavy_tail():
+    n, d = 4000, 2
+    edges = algoritmos.barabasi_edges(n, d, seed=6)
+    deg = numpy.bincount(edges.ravel(), minlength=n)
+    assert deg[:20].mean() > 4 * deg.mean()
+    assert deg.max() > 15 * d
+
+
+def test_random_barabasi_preferential_graph():
+    g = algoritmos.randomBarabasi(100, 2, mode=algoritmos.BA_PREFERENTIAL, seed=7)
+    edges = algoritmos.randomBarabasi(100, 2, mode=algoritmos.BA_PREFERENTIAL, seed=7, arrays=True)
+    assert len(g.node_names) == 100
+    assert len(g.edge_list) == len(edges)
+    assert g.deg.view().sum() == 2 * len(edges)
@@ -0,0 +1,55 @@
+import numpy
+
+from csr import CSRGraph, build_csr, index_dtype
+from graph import Graph
+
+
+def naive_csr(n, src, dst):
+    rows = [[] for _ in range(n)]
+    for e, (u, v) in enumerate(zip(src, dst)):
+        rows[u].append((v, e))
+        rows[v].append((u, e))
+    return rows
+
+
+def test_rows_keep_insertion_order():
+    rng = numpy.random.default_rng(0)
+    n = 50
+    src = rng.integers(0, n, 300)
+    dst = rng.integers(0, n, 300)
+    indptr, indices, edge_ids = build_csr(n, src, dst)
+
+    assert indptr[0] == 0 and indptr[-1] == 600
+    for i, row in enumerate(naive_csr(n, src.tolist(), dst.tolist())):
+        a, b = indptr[i], indptr[i + 1]
+        assert list(zip(indices[a:b].tolist(), edge_ids[a:b].tolist())) == row
+
+
+def test_self_loop_appears_twice():
+    indptr, indices, edge_ids = build_csr(3, numpy.array([1, 0]), numpy.array([1, 2]))
+    assert indptr.tolist() == [0, 1, 3, 4]
+    assert indices[1:3].tolist() == [1, 1]
+    assert edge_ids.tolist() == [1, 0, 0, 1]
+
+
+def test_index_dtype():
+    assert index_dtype(10) == numpy.int32
+    assert index_dtype(2 ** 31) == numpy.int64
+
+
+def test_from_graph_matches_graph_adjacency():
+    g = Graph()
+    g.add_edges_from([('a', 'b'), ('c', 'a'), ('b', 'c'), ('a', 'd')])
+    g.addNode('e')
+    c = CSRGraph.from_graph(g)
+    assert c.num_nodes == 5 and c.num_edges == 4
+    assert c.degree().tolist() == g.deg.view().tolist()
+    a = c.index_of('a')
+    assert [c.name_of(i) for i in c.neighbors(a)] == ['b', 'c', 'd']
+    assert c.incident_edges(a).tolist() == g.incident_edges(a).tolist()
+    assert [c.edge_name(e) for e in range(c.num_edges)] == ['a->b', 'c->a', 'b->c', 'a->d']
+    assert c.index_of('zz') is None
+
+    h = c.to_graph()
+    assert h.node_names == g.node_names
+    assert sorted(h.edges) == sorted(g.edges)
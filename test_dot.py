@@ -0,0 +1,76 @@
+import numpy
+import pytest
+
+import dot
+from graph import Graph
+from names import *
+
+
+def kinds(text):
+    return [(t.kind, t.text) for t in dot.tokenize(text.splitlines(True))]
+
+
+def read(tmp_path, text, chunk_size=dot.CHUNK_SIZE):
+    path = tmp_path / 'g.gv'
+    path.write_text(text, encoding='utf-8')
+    return Graph.load(str(path), chunk_size=chunk_size)
+
+
+def test_simple_edge_lines_take_the_fast_path():
+    assert kinds('a -> b;\n  1--2 ;\n') == [('edge_stmt', ('a', '->', 'b')), ('edge_stmt', ('1', '--', '2'))]
+    # palabras reservadas, atributos y comentarios abiertos pasan por el tokenizador completo
+    assert kinds('node -> b;\n')[0] == ('id', 'node')
+    assert kinds('a -> b [color=red];\n')[0] == ('id', 'a')
+    assert [k for k, t in kinds('/*\na -> b;\n*/ c -> d;\n')] == ['id', 'edgeop', 'id', ';']
+
+
+def test_strings_spanning_lines():
+    tokens = kinds('a [label="uno\ndos \\"tres\\""];\n"x\\\ny" -> b;\n')
+    assert ('id', 'uno\ndos "tres"') in tokens
+    assert ('id', 'xy') in tokens
+    with pytest.raises(dot.DotError):
+        kinds('a [label="sin cerrar];\n')
+
+
+def test_attributes_go_to_columns(tmp_path):
+    g = read(tmp_path, 'digraph {\n'
+                       'node [shape=box];\n'
+                       'a -> b [color=red];\n'
+                       'b -> c;\n'
+                       'c -> d [color=blue, weight=2];\n'
+                       'a -> b [label=x];\n'
+                       'd [pos="3,4!"]; e [pos="1,2", label="y z"];\n'
+                       '}\n', chunk_size=2)
+    assert g.directed
+    assert len(g.edge_list) == 3
+    assert g.edge_data.get('color', 0) == 'red'
+    assert g.edge_data.get('label', 0) == 'x'
+    assert not g.edge_data.has('color', 1)
+    assert g.edge_data.get('weight', 2) == '2'
+    assert g.edges['c->d'].atrib['color'] == 'blue'
+
+    d = g.node_index['d']
+    e = g.node_index['e']
+    assert g.node_data.get('shape', d) == 'box'
+    assert g.node_data.get('label', e) == 'y z'
+    assert 'pos' not in g.node_data
+    assert g.pos.data[d].tolist() == [3.0, 4.0]
+    assert g.pos.data[e].tolist() == [1.0, 2.0]
+    assert g.node_data.get(ATTR_PINNED, d) is True
+    assert g.node_data.get(ATTR_PINNED, e) is False
+
+
+def test_undirected_graph(tmp_path):
+    g = read(tmp_path, 'strict graph {\n a -- b;\n b -- a [color=red];\n { c d } -- e;\n}\n')
+    assert not g.directed
+    assert sorted(g.edges) == ['a--b', 'b--a', 'c--e', 'd--e']
+    assert g.edge_data.get('color', g.edge_index()['b--a']) == 'red'
+
+
+def test_fast_path_matches_parser(tmp_path):
+    lines = ['n%d -> n%d;\n' % (i % 7, (i * 3) % 11) for i in range(50)]
+    fast = read(tmp_path, 'digraph {\n' + ''.join(lines) + '}\n', chunk_size=8)
+    slow = read(tmp_path, 'digraph {' + ''.join(l.rstrip('\n') for l in lines) + '}', chunk_size=8)
+    assert fast.node_names == slow.node_names
+    assert numpy.array_equal(fast.src.view(), slow.src.view())
+    assert numpy.array_equal(fast.dst.view(), slow.dst.view())
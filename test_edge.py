@@ -0,0 +1,68 @@
+import pytest
+
+from graph import Graph
+from names import *
+
+
+def path_graph():
+    g = Graph()
+    for name in 'abcd':
+        g.addNode(name)
+    for a, b in ('ab', 'bc', 'cd'):
+        g.addEdge(a + '->' + b, a, b)
+    return g
+
+
+def test_unset_attribute_behaves_like_missing_key():
+    g = path_graph()
+    e0, e1, _ = g.edge_list
+    e0.atrib['color'] = 'red'
+    assert e0.atrib['color'] == 'red'
+    assert 'color' in e0.atrib
+    assert 'color' not in e1.atrib
+    assert e1.atrib.get('color', 'none') == 'none'
+    with pytest.raises(KeyError):
+        e1.atrib['color']
+    assert list(e1.atrib) == [ATTR_STYLE]
+    assert list(e0.atrib) == [ATTR_STYLE, 'color']
+    assert len(e0.atrib) == 2 and len(e1.atrib) == 1
+
+
+def test_attributes_of_edges_added_later_are_unset():
+    g = path_graph()
+    g.edge_list[0].atrib['weight'] = 2
+    e = g.addEdge('d->a', 'd', 'a')
+    assert 'weight' not in e.atrib
+    e.atrib['weight'] = 2.5
+    # la columna se promueve a flotante sin perder los valores ni las aristas asignadas
+    assert g.edge_list[0].atrib['weight'] == 2
+    assert e.atrib['weight'] == 2.5
+    assert 'weight' not in g.edge_list[1].atrib
+
+
+def test_delete_attribute():
+    g = path_graph()
+    e = g.edge_list[1]
+    e.atrib['label'] = 'x'
+    del e.atrib['label']
+    assert 'label' not in e.atrib
+    with pytest.raises(KeyError):
+        del e.atrib['label']
+    with pytest.raises(KeyError):
+        del e.atrib[ATTR_STYLE]
+
+
+def test_fill_marks_every_edge():
+    g = path_graph()
+    g.edge_data.fill('flag', [True, False, True])
+    assert [e.atrib['flag'] for e in g.edge_list] == [True, False, True]
+
+
+def test_style_is_shared_and_copy_on_write():
+    g = path_graph()
+    e0, e1, _ = g.edge_list
+    assert e0.atrib[ATTR_STYLE] is e1.atrib[ATTR_STYLE]
+    e0.style(STYLE_COLOR, (1, 2, 3))
+    assert e0.atrib[ATTR_STYLE][STYLE_COLOR] == (1, 2, 3)
+    assert e1.atrib[ATTR_STYLE][STYLE_COLOR] != (1, 2, 3)
+    assert 'color' not in e1.atrib
@@ -0,0 +1,64 @@
+import numpy
+import pytest
+
+import graph
+from graph import Graph, PairIndex, pair_codes
+
+
+def test_add_edges_from_drops_repeated_pairs():
+    g = Graph()
+    added = g.add_edges_from([('a', 'b'), ('b', 'c'), ('a', 'b'), ('c', 'a')])
+    assert added == 3
+    assert g.add_edges_from([('b', 'c'), ('c', 'd')]) == 1
+    assert [e.id for e in g.edge_list] == ['a->b', 'b->c', 'c->a', 'c->d']
+    assert list(g.deg.view()) == [2, 2, 3, 1]
+
+
+def test_add_edges_from_ids():
+    g = Graph()
+    g.addEdge('x', 'a', 'b')
+    ids = g.add_edges_from([('b', 'c'), ('a', 'b'), ('b', 'c'), ('c', 'd')], return_ids=True)
+    assert ids.tolist() == [1, 0, 1, 2]
+    ids = g.add_edges_from([('a', 'b'), ('d', 'a')], names=['x', 'y'], return_ids=True)
+    assert ids.tolist() == [0, 3]
+
+
+def test_pair_index_is_only_kept_during_bulk_insert():
+    g = Graph()
+    g.add_edges_from([(0, 1), (1, 2)])
+    assert g._pairs is None
+    with g.bulk_insert():
+        for k in range(64):
+            g.add_edges_from([(k, k + 1), (k + 1, k + 2), (k + 2, k)])
+        # las corridas decrecen geométricamente
+        sizes = [len(codes) for codes, _ in g._pairs.runs]
+        assert len(sizes) <= 2 * numpy.log2(len(g.edge_list)) + 1
+        assert all(a > 2 * b for a, b in zip(sizes, sizes[1:]))
+    assert g._pairs is None
+    codes = pair_codes(g.src.view(), g.dst.view())
+    assert len(numpy.unique(codes)) == len(codes)
+
+
+def test_pair_index_finds_oldest_edge():
+    index = PairIndex()
+    index.add(numpy.array([5, 3], dtype=numpy.uint64), numpy.array([0, 1]))
+    index.add(numpy.array([3], dtype=numpy.uint64), numpy.array([2]))
+    assert index.find(numpy.array([3, 5, 7], dtype=numpy.uint64)).tolist() == [1, 0, -1]
+
+
+def test_pair_codes_do_not_collide_near_the_bound():
+    big = graph.MAX_PAIR_NODES - 1
+    u = numpy.array([0, 1, 1 << 31, big, big], dtype=numpy.int64)
+    v = numpy.array([big, 0, 0, 0, big], dtype=numpy.int64)
+    codes = pair_codes(u, v)
+    assert len(numpy.unique(codes)) == len(codes)
+    assert (codes >> numpy.uint64(32)).astype(numpy.int64).tolist() == u.tolist()
+
+
+def test_generated_name_collision_warns():
+    g = Graph()
+    g.addEdge('a->b', 'c', 'd')
+    g.add_edges_from([('a', 'b')])
+    with pytest.warns(UserWarning, match="'a->b'"):
+        index = g.edge_index()
+    assert index['a->b'] == 0
@@ -0,0 +1,88 @@
+import numpy
+
+import dot
+import graphbin
+from graph import Graph
+from names import *
+
+
+def roundtrip(tmp_path, text):
+    gv = tmp_path / 'g.gv'
+    gv.write_text(text, encoding='utf-8')
+    graphbin.gv_to_bin(str(gv), str(tmp_path / 'g.bin'))
+    graphbin.bin_to_gv(str(tmp_path / 'g.bin'), str(tmp_path / 'h.gv'))
+    return Graph.load(str(gv)), Graph.load(str(tmp_path / 'h.gv'))
+
+
+def test_undirected_graph_with_attributes_round_trips(tmp_path):
+    g, h = roundtrip(tmp_path, 'graph { a -- b [color=red]; d [label="x y"]; c -- a; }\n')
+    out = (tmp_path / 'h.gv').read_text(encoding='utf-8')
+    assert out.startswith('graph X {')
+    assert ' -- ' in out and '->' not in out
+    assert not h.directed
+    assert h.node_names == g.node_names
+    assert sorted(h.edges) == sorted(g.edges) == ['a--b', 'c--a']
+    assert h.edge_data.get('color', 0) == 'red'
+    assert not h.edge_data.has('color', 1)
+    assert h.node_data.get('label', h.node_index['d']) == 'x y'
+    assert not h.node_data.has('label', h.node_index['a'])
+
+
+def test_binary_keeps_names_flags_and_columns(tmp_path):
+    g = Graph()
+    g.directed = False
+    g.add_edges_from([('a', 'b'), ('b', 'c')], names=['x', 'y'])
+    g.addNode('solo')
+    g.edge_data.set('weight', 1, 2.5, len(g.edge_list))
+    g.node_data.fill('rank', numpy.arange(len(g.node_names)))
+    g.node_data.set('label', 0, 'uno', len(g.node_names))
+    g.pos.view()[:] = numpy.arange(2 * len(g.node_names)).reshape(-1, 2)
+
+    graphbin.save(g, str(tmp_path / 'g.bin'))
+    c = graphbin.load(str(tmp_path / 'g.bin'))
+    assert not c.directed
+    assert [c.edge_name(e) for e in range(c.num_edges)] == ['x', 'y']
+    assert c.node_attrs['rank'].tolist() == [0, 1, 2, 3]
+    assert 'rank' not in c.node_present
+    assert isinstance(c.node_attrs['label'], graphbin.NameTable)
+    assert c.node_present['label'].tolist() == [True, False, False, False]
+
+    h = c.to_graph()
+    assert not h.directed
+    assert h.node_names == g.node_names
+    assert sorted(h.edges) == ['x', 'y']
+    assert numpy.array_equal(h.pos.view(), g.pos.view())
+    assert h.node_data.get('label', 0) == 'uno'
+    assert not h.node_data.has('label', 1)
+    assert h.edge_data.get('weight', 1) == 2.5
+    assert not h.edge_data.has('weight', 0)
+
+
+def test_pinned_positions_are_written_back(tmp_path):
+    g, h = roundtrip(tmp_path, 'digraph { a -> b; b [pos="1.5,2!"]; c [pos="3,4"]; }\n')
+    b = h.node_index['b']
+    assert h.pos.data[b].tolist() == [1.5, 2.0]
+    assert h.node_data.get(ATTR_PINNED, b) is True
+    assert h.node_data.get(ATTR_PINNED, h.node_index['c']) is False
+    assert not h.node_data.has(ATTR_PINNED, h.node_index['a'])
+    assert h.node_names == g.node_names
+
+
+def test_version_1_files_are_directed(tmp_path):
+    g = Graph()
+    g.directed = False
+    g.add_edges_from([('a', 'b')])
+    path = tmp_path / 'g.bin'
+    graphbin.save(g, str(path), edge_names=False)
+
+    # mismo archivo con el encabezado de la versión 1, sin banderas; las secciones no se mueven
+    data = path.read_bytes()
+    magic, version, n, m, count, flags = graphbin.HEADER.unpack_from(data)
+    table = data[graphbin.HEADER.size:graphbin.HEADER.size + count * graphbin.SECTION.size]
+    v1 = graphbin.HEADER_V1.pack(magic, 1, n, m, count) + table
+    path.write_bytes(v1 + data[len(v1):])
+
+    c = graphbin.load(str(path))
+    assert c.directed
+    assert list(c.names) == ['a', 'b']
+    assert c.src.tolist() == [0] and c.dst.tolist() == [1]
@@ -0,0 +1,95 @@
+import random
+
+import numpy
+
+import algoritmos
+import graph
+import layout
+
+
+def small_graph():
+    random.seed(1)
+    numpy.random.seed(1)
+    return algoritmos.randomErdos(60, 120)
+
+
+def test_worker_stops_when_layout_converges():
+    g = small_graph()
+    lay = layout.FruchtermanReingold(g)
+    worker = layout.LayoutWorker(lay)
+    worker.start()
+    worker.join(120)
+    assert not worker.is_alive()
+    assert worker.converged is True
+    assert g.snapshot is None
+    # un algoritmo que ya convergió sigue diciendo que convergió y un hilo nuevo termina de inmediato
+    assert lay.step() is True
+    again = layout.LayoutWorker(lay)
+    again.start()
+    again.join(10)
+    assert not again.is_alive()
+
+
+def test_worker_stop_clears_its_snapshot():
+    g = small_graph()
+    worker = layout.LayoutWorker(layout.BarnesHut(g))
+    worker.start()
+    worker.stop()
+    assert not worker.is_alive()
+    assert g.snapshot is None
+
+
+def test_worker_keeps_newer_snapshot():
+    g = small_graph()
+    old = layout.LayoutWorker(layout.FruchtermanReingold(g))
+    old.publish()
+    new = layout.LayoutWorker(layout.FruchtermanReingold(g))
+    new.publish()
+    old.running = False
+    old.start()
+    old.join()
+    assert g.snapshot is new.published
+
+
+def test_snapshot_is_read_only_copy():
+    g = small_graph()
+    worker = layout.LayoutWorker(layout.FruchtermanReingold(g))
+    worker.publish()
+    snap = g.snapshot
+    assert not snap.pos.flags.writeable
+    assert snap.m == len(g.edge_list)
+    assert numpy.array_equal(snap.pos, g.pos.view()[:len(g.node_list)])
+    assert isinstance(snap, graph.PositionSnapshot)
+
+
+def test_barneshut_keeps_moves_made_during_step():
+    g = small_graph()
+    lay = layout.BarnesHut(g)
+    forces = lay.repulsion_forces
+    moved = numpy.array([5000.0, -5000.0])
+
+    def repulsion_and_move(pos, bounds=None):
+        # otro hilo mueve un nodo mientras se calcula la repulsión sin WRITING_LOCK
+        g.node_list[0].pos = moved
+        return forces(pos, bounds)
+
+    lay.repulsion_forces = repulsion_and_move
+    before = g.pos.view()[:len(g.node_list)].copy()
+    lay.step()
+    after = g.pos.view()[:len(g.node_list)]
+    # el nodo movido conserva su nueva posición más a lo sumo un avance del algoritmo
+    assert numpy.linalg.norm(after[0] - moved) <= lay.advance / lay.t + 1e-9
+    assert not numpy.array_equal(after[1:], before[1:])
+
+
+def test_barneshut_workers_match_single_process():
+    g = small_graph()
+    h = g.clone()
+    with layout.BarnesHut(g, workers=2) as a:
+        b = layout.BarnesHut(h)
+        for _ in range(3):
+            a.step()
+            b.step()
+        assert a.pool is not None
+    assert a.pool is None and a.shared is None
+    assert numpy.allclose(g.pos.view()[:len(g.node_list)], h.pos.view()[:len(h.node_list)])
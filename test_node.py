@@ -0,0 +1,112 @@
+import gc
+import tracemalloc
+
+import numpy
+import pytest
+
+from graph import Graph
+from node import Node
+from names import *
+
+
+def line_graph(n=5):
+    g = Graph()
+    for i in range(n):
+        g.addNode('v' + str(i))
+    for i in range(n - 1):
+        g.addEdge('e' + str(i), 'v' + str(i), 'v' + str(i + 1))
+    return g
+
+
+def test_nodes_are_references_to_graph_rows():
+    g = line_graph()
+    v = g.getNode('v2')
+    assert v == g.node_list[2] == g.nodes['v2']
+    assert hash(v) == hash(g.node_list[2])
+    assert v != g.node_list[3]
+    assert [u.id for u in v.neighbors] == ['v1', 'v3']
+    assert [e.id for e in v.edges] == ['e1', 'e2']
+    assert g.getNode('nope') is None
+
+
+def test_position_is_a_copy_and_moves_go_through_the_setter():
+    g = line_graph()
+    g.compute_ext()
+    v = g.node_list[1]
+    p = v.pos
+    p[0] = 1e6
+    assert g.pos.data[1][0] != 1e6
+
+    version = g.pos_version
+    v.attr[ATTR_POS] += numpy.array([1e6, 0.0])
+    assert g.pos_version > version
+    assert g.bounds.bounds()[1][0] >= v.pos[0]
+
+    # la copia sigue siendo correcta después de que el arreglo del grafo crece
+    before = v.pos
+    for i in range(100):
+        g.addNode('w' + str(i))
+    assert numpy.array_equal(v.pos, before)
+
+
+def test_other_attributes_are_columns():
+    g = line_graph()
+    v, w = g.node_list[0], g.node_list[1]
+    v.attr['label'] = 'x'
+    assert v.attr['label'] == 'x'
+    assert 'label' not in w.attr
+    assert list(v.attr) == [ATTR_EDGES, ATTR_NEIGHBORS, ATTR_POS, ATTR_STYLE, 'label']
+    assert len(v.attr) == 5
+    del v.attr['label']
+    assert 'label' not in v.attr
+    with pytest.raises(KeyError):
+        w.attr['label']
+
+
+def test_shared_styles():
+    g = line_graph()
+    v, w = g.node_list[0], g.node_list[1]
+    assert v.attr[ATTR_STYLE] is w.attr[ATTR_STYLE]
+    v.style(STYLE_SIZE, 30)
+    assert v.attr[ATTR_STYLE][STYLE_SIZE] == 30
+    assert w.attr[ATTR_STYLE][STYLE_SIZE] != 30
+    w.style(STYLE_SIZE, 30)
+    assert g.node_style_ix.data[0] == g.node_style_ix.data[1]
+
+
+def test_node_without_graph():
+    v = Node('a')
+    v.pos = (1, 2)
+    v.attr['k'] = 1
+    assert numpy.array_equal(v.pos, [1, 2])
+    assert list(v.attr) == [ATTR_EDGES, ATTR_NEIGHBORS, ATTR_POS, ATTR_STYLE, 'k']
+    assert len(v.attr) == 5
+    v.style(STYLE_SIZE, 3)
+    assert v.attr[ATTR_STYLE][STYLE_SIZE] == 3
+    assert v.edges == [] and v.neighbors == []
+
+
+def test_clone_keeps_attributes():
+    g = line_graph()
+    g.node_list[2].attr['label'] = 'x'
+    g.node_list[2].style(STYLE_SIZE, 25)
+    h = g.clone()
+    assert h.node_list[2].attr['label'] == 'x'
+    assert h.node_list[2].attr[ATTR_STYLE][STYLE_SIZE] == 25
+    assert numpy.array_equal(h.pos.view(), g.pos.view())
+
+
+def test_memory_per_node():
+    # el grafo de dict de objetos original ocupaba unos 836 bytes por nodo aislado; la meta es 5 veces menos
+    names = ['n' + str(i) for i in range(50000)]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        g = Graph()
+        start = tracemalloc.get_traced_memory()[0]
+        g.add_nodes_from(names)
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    assert used / len(names) < 836 / 5
@@ -0,0 +1,192 @@
+import gc
+import math
+import os
+
+import numpy
+import pytest
+
+import algoritmos
+import traversal
+from csr import CSRGraph
+from graph import Graph
+
+
+def random_csr(n, m, seed):
+    rng = numpy.random.default_rng(seed)
+    return CSRGraph(['n%d' % i for i in range(n)], rng.integers(0, n, m), rng.integers(0, n, m))
+
+
+@pytest.fixture(scope='module')
+def g():
+    return random_csr(300, 450, 1)
+
+
+def reference_distances(g, sources):
+    return numpy.array([traversal.bfs(g, s).dist for s in sources])
+
+
+def test_distance_matrix_matches_bfs(g):
+    sources = [0, 5, 299, 5]
+    dist = traversal.distance_matrix(g, sources, block_size=3)
+    assert dist.dtype == numpy.int16
+    assert numpy.array_equal(dist, reference_distances(g, sources))
+
+
+def test_distance_matrix_spills_to_a_temporary_file(g):
+    dist = traversal.distance_matrix(g, range(20), memory_limit=1000, block_size=8)
+    assert isinstance(dist, numpy.memmap)
+    path = dist.filename
+    assert numpy.array_equal(dist, reference_distances(g, range(20)))
+    del dist
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_parallel_distance_matrix_returns_the_shared_block(g):
+    sources = numpy.arange(40)
+    dist = traversal.distance_matrix(g, sources, workers=2, block_size=16)
+    assert not isinstance(dist, numpy.memmap)
+    # el resultado no es una copia: es la vista del bloque compartido
+    assert not dist.flags.owndata
+    assert numpy.array_equal(dist, reference_distances(g, sources))
+
+
+def test_parallel_distance_matrix_counts_shared_copies(g, tmp_path):
+    sources = numpy.arange(40)
+    result = 40 * 300 * 2
+    dist = traversal.distance_matrix(g, sources, workers=2, block_size=16, memory_limit=result + 100)
+    assert isinstance(dist, numpy.memmap)
+    assert numpy.array_equal(dist, reference_distances(g, sources))
+
+
+def random_graph(n, m, seed):
+    rng = numpy.random.default_rng(seed)
+    g = Graph()
+    g.add_nodes_from(['n%d' % i for i in range(n)])
+    g.add_edges_from(rng.integers(0, n, (m, 2)), nodes=g.node_names)
+    return g
+
+
+def incident(g):
+    # listas de aristas de cada nodo en el órden en que se agregaron, como ATTR_EDGES en los nodos originales
+    src = g.src.view().tolist()
+    dst = g.dst.view().tolist()
+    ret = [[] for _ in g.node_names]
+    for e, (u, v) in enumerate(zip(src, dst)):
+        ret[u].append((e, v))
+        if v != u:
+            ret[v].append((e, u))
+    return ret
+
+
+def queue_bfs(g, s):
+    """
+    BFS por capas con diccionarios, como el algoritmos.BFS original
+    :return: (capas, padre de cada nodo alcanzado, arista por la que se llegó)
+    """
+    adj = incident(g)
+    layers = [[s]]
+    added = {s}
+    parent = {}
+    while layers[-1]:
+        nxt = []
+        for u in layers[-1]:
+            for e, v in adj[u]:
+                if v not in added:
+                    added.add(v)
+                    parent[v] = (u, e)
+                    nxt.append(v)
+        layers.append(nxt)
+    return layers[:-1], parent
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_top_down_bfs_matches_the_queue_version(seed, monkeypatch):
+    monkeypatch.setattr(traversal, 'BOTTOM_UP', math.inf)
+    g = random_graph(120, 200, seed)
+    layers, parent = queue_bfs(g, 3)
+    result = traversal.bfs(g, 3)
+    assert [layer.tolist() for layer in result.layers] == layers
+    for v, (u, e) in parent.items():
+        assert (result.parent[v], result.parent_edge[v]) == (u, e)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_bfs_with_bottom_up_layers_has_the_same_distances(seed):
+    g = random_graph(200, 900, seed)
+    layers, parent = queue_bfs(g, 0)
+    result = traversal.bfs(g, 0)
+    assert [sorted(layer.tolist()) for layer in result.layers] == [sorted(layer) for layer in layers]
+    src = g.src.view()
+    dst = g.dst.view()
+    for v in parent:
+        u, e = result.parent[v], result.parent_edge[v]
+        assert result.dist[u] == result.dist[v] - 1
+        assert {src[e], dst[e]} == {u, v}
+
+
+def test_animated_bfs_builds_the_same_tree(monkeypatch):
+    monkeypatch.setattr(traversal, 'BOTTOM_UP', math.inf)
+    g = random_graph(60, 80, 4)
+    layers, parent = queue_bfs(g, 0)
+    tree = Graph()
+    algoritmos.BFS(tree, g, s='n0')
+    names = g.node_names
+    expected = ['%s->%s' % (names[parent[v][0]], names[v]) for layer in layers[1:] for v in layer]
+    assert sorted(tree.edges) == sorted(expected)
+    assert [g.edge_data.get('bfs', e) for e in range(len(g.edge_list))] == \
+        [e in {parent[v][1] for v in parent} for e in range(len(g.edge_list))]
+
+
+def recursive_dfs(g, sources):
+    """
+    DFS recursivo como el algoritmos.DFS_R original
+    :return: (órden de descubrimiento, órden de terminación, padre y arista de cada nodo alcanzado)
+    """
+    adj = incident(g)
+    discovered = []
+    finished = []
+    parent = {}
+
+    def visit(u):
+        discovered.append(u)
+        for e, v in adj[u]:
+            if v not in parent and v not in discovered:
+                parent[v] = (u, e)
+                visit(v)
+        finished.append(u)
+
+    for s in sources:
+        if s not in discovered:
+            visit(s)
+    return discovered, finished, parent
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_dfs_matches_the_recursive_version(seed):
+    g = random_graph(120, 180, seed)
+    discovered, finished, parent = recursive_dfs(g, [7])
+    result = traversal.dfs(g, 7)
+    reached = numpy.flatnonzero(result.discovery >= 0)
+    assert reached[numpy.argsort(result.discovery[reached])].tolist() == discovered
+    assert reached[numpy.argsort(result.finish[reached])].tolist() == finished
+    for v, (u, e) in parent.items():
+        assert (result.parent[v], result.parent_edge[v]) == (u, e)
+    assert numpy.count_nonzero(result.parent >= 0) == len(parent)
+
+
+def test_dfs_forest_visits_every_node_in_index_order():
+    g = random_graph(80, 40, 5)
+    discovered, finished, parent = recursive_dfs(g, range(80))
+    result = traversal.dfs(g)
+    assert numpy.argsort(result.discovery).tolist() == discovered
+    assert numpy.argsort(result.finish).tolist() == finished
+
+
+def test_animated_dfs_builds_the_same_tree():
+    g = random_graph(60, 80, 6)
+    discovered, finished, parent = recursive_dfs(g, [0])
+    tree = Graph()
+    algoritmos.DFS(tree, g, s='n0')
+    names = g.node_names
+    assert list(tree.edges) == ['%s->%s' % (names[parent[v][0]], names[v]) for v in discovered[1:]]
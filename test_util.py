@@ -0,0 +1,55 @@
+import random
+
+import numpy
+
+import algoritmos
+from util import FenwickTree
+
+
+def tree_of(weights):
+    t = FenwickTree()
+    for w in weights:
+        t.append(w)
+    return t
+
+
+def test_find_matches_cumulative_sums():
+    rng = numpy.random.default_rng(0)
+    weights = rng.random(37)
+    weights[[3, 4, 20]] = 0.0
+    t = tree_of(weights.tolist())
+    assert len(t) == 37
+    assert abs(t.total - weights.sum()) < 1e-9
+
+    bounds = numpy.cumsum(weights)
+    for x in rng.random(500) * weights.sum():
+        assert t.find(x) == numpy.searchsorted(bounds, x, side='right')
+
+
+def test_set_updates_sums():
+    t = tree_of([1.0, 2.0, 3.0, 4.0, 5.0])
+    t.set(2, 0.0)
+    t.set(4, 0.5)
+    assert t.total == 7.5
+    assert [t.find(x) for x in (0.5, 1.5, 2.9, 3.0, 6.9, 7.1)] == [0, 1, 1, 3, 3, 4]
+
+
+def test_sample_is_proportional_to_weight():
+    random.seed(1)
+    weights = [0.0, 1.0, 3.0, 0.0, 4.0]
+    t = tree_of(weights)
+    counts = numpy.bincount([t.sample() for _ in range(8000)], minlength=5)
+    assert counts[0] == counts[3] == 0
+    assert numpy.allclose(counts / 8000, numpy.array(weights) / 8, atol=0.02)
+
+
+def test_dorogovtsev_mendes_weights():
+    random.seed(2)
+    g = algoritmos.DorogovtsevMendesGraphV2(200, divisor=2)
+    assert len(g.node_names) == 200
+    assert len(g.edge_list) == 2 * 200 - 3
+    dm = g.edge_data.column('__DM', len(g.edge_list))
+    # cada vez que se elige una arista su peso se divide entre el divisor
+    halvings = -numpy.log2(dm)
+    assert numpy.all(halvings == numpy.round(halvings))
+    assert halvings.sum() == 200 - 3
@@ -0,0 +1,422 @@
+"""
+Recorridos de grafos sobre arreglos CSR, sin efectos sobre el grafo
+
+Los recorridos trabajan con índices de nodos y números de aristas; reciben un Graph (se usa su adyacencia CSR) o un
+CSRGraph. Las versiones animadas de algoritmos.py sólo consumen sus resultados.
+"""
+import concurrent.futures
+import os
+import tempfile
+import weakref
+
+import numpy
+
+import sharedmem
+from sharedmem import SharedArrays
+from util import expand
+
+BOTTOM_UP = 0.1    # proporción entre las aristas de la frontera y las que faltan a partir de la cual se busca al revés
+DIST_MEMORY = 1 << 30      # bytes máximos de una matriz de distancias en memoria, arriba de esto se usa un archivo
+
+
+def csr_arrays(g):
+    """
+    Arreglos CSR de un grafo
+    :param g: Graph o CSRGraph
+    :return: (indptr, indices, edge_ids)
+    """
+    if hasattr(g, 'adjacency'):
+        return g.adjacency()
+    return g.indptr, g.indices, g.edge_ids
+
+
+class BFSResult:
+    """
+    Clase resultado de un recorrido a lo ancho
+
+    dist[v] es el número de aristas desde la fuente más cercana (-1 si no se alcanzó), parent[v] el nodo desde el que
+    se descubrió v y parent_edge[v] la arista por la que se llegó (-1 para las fuentes y los no alcanzados). layers[i]
+    son los nodos a distancia i en el órden en que se descubrieron
+    """
+
+    def __init__(self, dist, parent, parent_edge, layers):
+        self.dist = dist
+        self.parent = parent
+        self.parent_edge = parent_edge
+        self.layers = layers
+
+    @property
+    def order(self):
+        """
+        Nodos alcanzados en el órden en que se descubrieron
+        :return: arreglo de índices
+        """
+        return numpy.concatenate(self.layers) if self.layers else numpy.empty(0, dtype=numpy.int64)
+
+    def tree_edges(self):
+        """
+        Aristas del árbol de recorrido
+        :return: arreglo con los números de arista, en el órden en que se descubrieron sus nodos
+        """
+        e = self.parent_edge[self.order]
+        return e[e >= 0]
+
+    def path(self, v):
+        """
+        Camino desde la fuente hasta un nodo siguiendo los padres
+        :param v: índice del nodo
+        :return: lista de índices desde la fuente hasta v, vacía si v no se alcanzó
+        """
+        if self.dist[v] < 0:
+            return []
+        ret = [int(v)]
+        while self.parent[ret[-1]] >= 0:
+            ret.append(int(self.parent[ret[-1]]))
+        ret.reverse()
+        return ret
+
+
+def bfs(g, sources, targets=None, max_depth=None):
+    """
+    Recorrido a lo ancho que expande la frontera completa en cada paso con NumPy.
+
+    Mientras la frontera es chica se recorren las aristas de la frontera (de arriba hacia abajo) y cada nodo nuevo
+    toma como padre al primer nodo de la frontera que lo alcanza, el mismo que elegiría la versión con cola. Cuando
+    las aristas de la frontera son más que BOTTOM_UP veces las de los nodos que faltan conviene al revés: cada nodo
+    que falta busca en su adyacencia algún nodo de la frontera (de abajo hacia arriba) y esa capa queda en órden de
+    índice
+    :param g: Graph o CSRGraph
+    :param sources: índice del nodo fuente o secuencia de índices (varias fuentes)
+    :param targets: índices de nodos; el recorrido termina en la capa en que se alcanzan todos, opcional
+    :param max_depth: distancia máxima a explorar, opcional
+    :return: BFSResult
+    """
+    indptr, indices, edge_ids = csr_arrays(g)
+    n = len(indptr) - 1
+    deg = numpy.diff(indptr)
+
+    dist = numpy.full(n, -1, dtype=numpy.int64)
+    parent = numpy.full(n, -1, dtype=numpy.int64)
+    parent_edge = numpy.full(n, -1, dtype=numpy.int64)
+    visited = numpy.zeros(n, dtype=bool)
+    in_frontier = numpy.zeros(n, dtype=bool)
+    claim = numpy.empty(n, dtype=numpy.int64)
+
+    frontier = numpy.atleast_1d(numpy.asarray(sources, dtype=numpy.int64))
+    _, first = numpy.unique(frontier, return_index=True)
+    frontier = frontier[numpy.sort(first)]
+    dist[frontier] = 0
+    visited[frontier] = True
+    layers = [frontier]
+    remaining = int(deg.sum() - deg[frontier].sum())     # aristas (por extremo) de los nodos que faltan
+
+    pending = None
+    if targets is not None:
+        pending = numpy.atleast_1d(numpy.asarray(targets, dtype=numpy.int64))
+
+    depth = 0
+    while len(frontier) > 0:
+        if pending is not None:
+            pending = pending[~visited[pending]]
+            if len(pending) == 0:
+                break
+        if max_depth is not None and depth >= max_depth:
+            break
+
+        if deg[frontier].sum() > BOTTOM_UP * remaining:
+            # cada nodo que falta toma como padre al primer vecino que esté en la frontera
+            missing = numpy.flatnonzero(~visited)
+            start = indptr[missing]
+            idx, owner = expand(start, indptr[missing + 1] - start)
+            in_frontier[frontier] = True
+            hit = numpy.flatnonzero(in_frontier[indices[idx]])
+            in_frontier[frontier] = False
+
+            owner = owner[hit]
+            first = numpy.ones(len(hit), dtype=bool)
+            first[1:] = owner[1:] != owner[:-1]
+            idx = idx[hit[first]]
+            frontier = missing[owner[first]]
+            parents = indices[idx]
+        else:
+            start = indptr[frontier]
+            idx, owner = expand(start, indptr[frontier + 1] - start)
+            nbr = indices[idx]
+            new = ~visited[nbr]
+            idx = idx[new]
+            owner = owner[new]
+            nbr = nbr[new]
+
+            # cada vecino nuevo se queda con una de sus apariciones; al asignar al revés gana la primera
+            pos = numpy.arange(len(nbr))
+            claim[nbr[::-1]] = pos[::-1]
+            found = numpy.flatnonzero(claim[nbr] == pos)
+            idx = idx[found]
+            frontier = nbr[found]
+            parents = layers[-1][owner[found]]
+
+        depth += 1
+        visited[frontier] = True
+        dist[frontier] = depth
+        parent[frontier] = parents
+        parent_edge[frontier] = edge_ids[idx]
+        remaining -= int(deg[frontier].sum())
+        if len(frontier) > 0:
+            layers.append(frontier)
+
+    return BFSResult(dist, parent, parent_edge, layers)
+
+
+class DFSResult:
+    """
+    Clase resultado de un recorrido en profundidad
+
+    discovery[v] y finish[v] son los tiempos en que se descubrió y se terminó v con un mismo reloj (-1 si no se
+    alcanzó), parent[v] el nodo desde el que se descubrió v y parent_edge[v] la arista del árbol por la que se llegó
+    (-1 para las raíces y los no alcanzados)
+    """
+
+    def __init__(self, discovery, finish, parent, parent_edge):
+        self.discovery = discovery
+        self.finish = finish
+        self.parent = parent
+        self.parent_edge = parent_edge
+
+    @property
+    def order(self):
+        """
+        Nodos alcanzados en el órden en que se descubrieron (preorden)
+        :return: arreglo de índices
+        """
+        reached = numpy.flatnonzero(self.discovery >= 0)
+        return reached[numpy.argsort(self.discovery[reached])]
+
+    def tree_edges(self):
+        """
+        Aristas del árbol (o bosque) de recorrido
+        :return: arreglo con los números de arista, en el órden en que se descubrieron sus nodos
+        """
+        e = self.parent_edge[self.order]
+        return e[e >= 0]
+
+
+def dfs(g, sources=None):
+    """
+    Recorrido en profundidad con una pila explícita, por lo que no depende del límite de recursión.
+
+    Cada nodo guarda hasta dónde ha revisado su adyacencia, así que cada arista se revisa una sola vez por extremo.
+    Los arreglos se recorren a través de memoryview, que entrega enteros de Python sin copiar los arreglos a listas
+    :param g: Graph o CSRGraph
+    :param sources: índice del nodo inicial o secuencia de índices; si es None se recorren todos los nodos en órden
+                    de índice y el resultado es un bosque
+    :return: DFSResult
+    """
+    indptr, indices, edge_ids = csr_arrays(g)
+    n = len(indptr) - 1
+    if sources is None:
+        sources = range(n)
+    else:
+        sources = numpy.atleast_1d(numpy.asarray(sources, dtype=numpy.int64)).tolist()
+
+    discovery = numpy.full(n, -1, dtype=numpy.int64)
+    finish = numpy.full(n, -1, dtype=numpy.int64)
+    parent = numpy.full(n, -1, dtype=numpy.int64)
+    parent_edge = numpy.full(n, -1, dtype=numpy.int64)
+    following = numpy.array(indptr[:-1], dtype=numpy.int64)     # siguiente posición por revisar de cada nodo
+
+    ptr = memoryview(numpy.ascontiguousarray(indptr, dtype=numpy.int64))
+    adj = memoryview(numpy.ascontiguousarray(indices))
+    eid = memoryview(numpy.ascontiguousarray(edge_ids))
+    disc = memoryview(discovery)
+    fin = memoryview(finish)
+    par = memoryview(parent)
+    pe = memoryview(parent_edge)
+    nxt = memoryview(following)
+
+    clock = 0
+    for s in sources:
+        if disc[s] >= 0:
+            continue
+        disc[s] = clock
+        clock += 1
+        stack = [s]
+        while stack:
+            u = stack[-1]
+            k = nxt[u]
+            end = ptr[u + 1]
+            while k < end and disc[adj[k]] >= 0:
+                k += 1
+            if k < end:
+                w = adj[k]
+                nxt[u] = k + 1
+                disc[w] = clock
+                clock += 1
+                par[w] = u
+                pe[w] = eid[k]
+                stack.append(w)
+            else:
+                nxt[u] = end
+                fin[u] = clock
+                clock += 1
+                stack.pop()
+
+    return DFSResult(discovery, finish, parent, parent_edge)
+
+
+def distance_dtype(n):
+    """
+    Elige el tipo entero más pequeño que puede guardar distancias en un grafo de n nodos (y -1)
+    :param n: número de nodos
+    :return: numpy.int16 o numpy.int32
+    """
+    if n < 2 ** 15:
+        return numpy.int16
+    return numpy.int32
+
+
+def distance_rows(indptr, indices, sources, out):
+    """
+    Distancias desde cada fuente, una fila por fuente. Es el recorrido de bfs sin padres: sin ellos la frontera sólo
+    tiene que quitar repetidos y las capas anchas se buscan al revés igual que en bfs
+    :param indptr: arreglo indptr de la adyacencia CSR
+    :param indices: arreglo indices de la adyacencia CSR
+    :param sources: secuencia con los índices de las fuentes
+    :param out: arreglo (len(sources), n) donde se escriben las distancias, -1 para los no alcanzados
+    :return: None
+    """
+    n = len(indptr) - 1
+    deg = numpy.diff(indptr)
+    total = int(deg.sum())
+    dist = numpy.empty(n, dtype=numpy.int64)
+    claim = numpy.empty(n, dtype=numpy.int64)
+
+    for row, s in enumerate(sources):
+        dist.fill(-1)
+        dist[s] = 0
+        frontier = numpy.array([s], dtype=numpy.int64)
+        remaining = total - int(deg[s])
+        depth = 0
+        while len(frontier) > 0:
+            depth += 1
+            if deg[frontier].sum() > BOTTOM_UP * remaining:
+                missing = numpy.flatnonzero(dist < 0)
+                start = indptr[missing]
+                idx, owner = expand(start, indptr[missing + 1] - start)
+                hit = owner[dist[indices[idx]] == depth - 1]
+                first = numpy.ones(len(hit), dtype=bool)
+                first[1:] = hit[1:] != hit[:-1]
+                frontier = missing[hit[first]]
+            else:
+                start = indptr[frontier]
+                idx, _ = expand(start, indptr[frontier + 1] - start)
+                nbr = indices[idx]
+                nbr = nbr[dist[nbr] < 0]
+                pos = numpy.arange(len(nbr))
+                claim[nbr] = pos
+                frontier = nbr[claim[nbr] == pos]
+            dist[frontier] = depth
+            remaining -= int(deg[frontier].sum())
+
+        out[row] = dist
+
+
+def distance_worker(spec, first, last, path=None):
+    """
+    Calcula en un proceso de trabajo las filas [first, last) de una matriz de distancias
+    :param spec: descripción de los arreglos compartidos (SharedArrays.spec()): indptr, indices, sources y, si el
+                 resultado está en memoria, dist
+    :param first: primera fila
+    :param last: última fila (sin incluir)
+    :param path: (archivo, tipo, forma) del memmap de resultado, o None si el resultado es el arreglo compartido dist
+    :return: None
+    """
+    arrays, blocks = sharedmem.attach(spec)
+    try:
+        if path is None:
+            out = arrays['dist']
+        else:
+            archivo, dtype, shape = path
+            out = numpy.memmap(archivo, dtype=dtype, mode='r+', shape=shape)
+        distance_rows(arrays['indptr'], arrays['indices'], arrays['sources'][first:last], out[first:last])
+        if path is not None:
+            out.flush()
+            del out
+    finally:
+        sharedmem.detach(arrays, blocks)
+
+
+def distance_matrix(g, sources=None, workers=1, path=None, memory_limit=DIST_MEMORY, block_size=256):
+    """
+    Matriz de distancias (en número de aristas) desde un conjunto de fuentes a todos los nodos.
+
+    Con varios procesos la adyacencia se publica en memoria compartida y cada proceso calcula bloques de filas; el
+    resultado en memoria es el bloque compartido en el que escriben, que se libera junto con el arreglo. Si el
+    resultado (más las copias compartidas de la adyacencia, con varios procesos) ocupa más de memory_limit bytes, o
+    si se da path, se escribe en un archivo con numpy.memmap: cada bloque se escribe y se baja a disco al terminarse,
+    así que la matriz no tiene que caber en memoria. El archivo temporal que se crea cuando no se da path se borra al
+    liberar el resultado
+    :param g: Graph o CSRGraph
+    :param sources: índices de las fuentes; si es None se usan todos los nodos (matriz de n x n)
+    :param workers: número de procesos, 1 para calcular en este proceso
+    :param path: archivo donde guardar el resultado, opcional
+    :param memory_limit: bytes máximos en memoria del resultado y de las copias compartidas
+    :param block_size: filas por bloque
+    :return: arreglo (len(sources), n) o numpy.memmap con las distancias, -1 para los no alcanzados
+    """
+    indptr, indices, _ = csr_arrays(g)
+    n = len(indptr) - 1
+    if sources is None:
+        sources = numpy.arange(n, dtype=numpy.int64)
+    else:
+        sources = numpy.atleast_1d(numpy.asarray(sources, dtype=numpy.int64))
+    dtype = numpy.dtype(distance_dtype(n))
+    shape = (len(sources), n)
+    bounds = list(range(0, len(sources), block_size)) + [len(sources)]
+    parallel = workers > 1 and len(sources) > block_size
+
+    # con varios procesos la adyacencia y las fuentes también se copian a memoria compartida
+    size = len(sources) * n * dtype.itemsize
+    if parallel:
+        size += indptr.nbytes + indices.nbytes + sources.nbytes
+
+    out = None
+    if path is None and size > memory_limit:
+        fd, path = tempfile.mkstemp(suffix='.dist')
+        os.close(fd)
+        out = numpy.memmap(path, dtype=dtype, mode='w+', shape=shape)
+        # el archivo temporal se borra cuando se libera el resultado
+        weakref.finalize(out, os.remove, path)
+    elif path is not None:
+        out = numpy.memmap(path, dtype=dtype, mode='w+', shape=shape)
+    elif not parallel:
+        out = numpy.empty(shape, dtype=dtype)
+
+    if not parallel:
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            distance_rows(indptr, indices, sources[first:last], out[first:last])
+            if path is not None:
+                out.flush()
+        return out
+
+    shared = SharedArrays()
+    try:
+        shared.put('indptr', indptr)
+        shared.put('indices', indices)
+        shared.put('sources', sources)
+        target = (path, dtype.str, shape)
+        if path is None:
+            # el resultado en memoria es el mismo bloque compartido en el que escriben los procesos, sin copia
+            shared.empty('dist', shape, dtype)
+            target = None
+
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            tasks = [pool.submit(distance_worker, shared.spec(), first, last, target)
+                     for first, last in zip(bounds[:-1], bounds[1:])]
+            for task in tasks:
+                task.result()
+
+        if path is None:
+            out = shared.keep('dist')
+        return out
+    finally:
+        shared.close()
@@ -4,6 +4,8 @@ import random
 import numpy
 import pygame
 
+from labels import LabelCache
+from layout import LayoutWorker
 from names import *
 
 # from layout import stop_layinout
@@ -20,6 +22,7 @@ class Frame:
         self.key_listeners = []     # lista de controladores de teclas
         self.tam_fuente = 10        # tamaño de la fuente
         self.fuente = None          # fuente para mostrar texto
+        self.labels = LabelCache()  # textos ya rasterizados
 
     def set_font(self, ttf='fonts/courier_b.ttf', tam=10):
         """
@@ -39,7 +42,16 @@ class Frame:
         :param cad: texto a mostrar
         :return: None
         """
-        self.fuente.render_to(self.surf, pos, cad, col)
+        self.surf.blit(self.label(col, cad), pos)
+
+    def label(self, col, cad):
+        """
+        Superficie con un texto en la fuente actual, rasterizado una sola vez mientras siga en la caché
+        :param col: color del texto
+        :param cad: texto
+        :return: Surface con el texto
+        """
+        return self.labels.get(self.fuente, cad, col, self.tam_fuente)
 
     def add_viewport(self, vp):
         """
@@ -122,6 +134,10 @@ class Viewport:
     frame = None
     layout = None
     margin = 0
+    background = True           # ejecutar la disposición en un LayoutWorker en lugar de dentro de draw()
+    steps_per_publish = 1       # pasos de la disposición entre cada copia de posiciones que se dibuja
+    budget = 1.0                # fracción del tiempo que puede ocupar el hilo de la disposición
+    worker = None
 
     def __init__(self, g, layout=None):
         """
@@ -188,8 +204,17 @@ class Viewport:
         :return: None
         """
         if self.layinout:
-            self.layinout = not self.layout.step()
+            if self.background:
+                if self.worker is None or self.worker.layout is not self.layout:
+                    self.stop_layout()
+                    self.worker = LayoutWorker(self.layout, self.steps_per_publish, self.budget)
+                    self.worker.start()
+                self.layinout = self.worker.is_alive()
+            else:
+                self.layinout = not self.layout.step()
             # self.layout.step()
+        if not self.layinout and self.worker is not None:
+            self.stop_layout()
 
         tam_out_rect = self.out_rect[1] - self.out_rect[0]
         tam_mid_rect = self.mid_rect[1] - self.mid_rect[0]
@@ -207,11 +232,22 @@ class Viewport:
             self.graph.draw(self)
 
             cad = str(len(self.graph.nodes.values())) + ' nodos y ' + \
-                str(len(self.graph.edges.values())) + ' aristas'
+                str(len(self.graph.edge_list)) + ' aristas'
             self.frame.text(self.mid_rect[0] + 10,
                             self.graph.attr[ATTR_STYLE][STYLE_LINECOLOR],
                             cad)
 
+    def stop_layout(self, wait=True):
+        """
+        Detiene el hilo de la disposición, si hay uno; hay que esperarlo antes de iniciar otra disposición o de mover
+        los nodos desde este hilo
+        :param wait: esperar a que termine el paso en curso
+        :return: None
+        """
+        if self.worker is not None:
+            self.worker.stop(wait)
+            self.worker = None
+
     def key_manage(self, pressed):
         """
         Manejo predeterminado de eventos del teclado
@@ -1,3 +1,8 @@
+import contextlib
+import gc
+import math
+import random
+
 import numpy
 import pygame
 import pygame.freetype
@@ -23,6 +28,21 @@ def draw_dashed_rect(surf, color, start_pos, end_pos, width=1, dash_length=10):
     draw_dashed_line(surf, color, end_pos, [end_pos[0], start_pos[1]], width, dash_length)
 
 
+@contextlib.contextmanager
+def gc_paused():
+    """
+    Suspende el recolector cíclico mientras se crean muchos objetos de golpe; cada objeto nuevo cuenta para disparar
+    una recolección y al agregar millones de nodos o aristas esas recolecciones recorren todo el grafo una y otra vez
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
 class Transform:
     """
     Clase para transformar dado un espacio real, denotado por una extensión, y un viewport
@@ -59,6 +79,14 @@ class Transform:
         # punto = numpy.array(punto)
         return self.escala * (punto - self.extent[0]) + self.viewport[0] + self.offset
 
+    def inverse(self, punto):
+        """
+        Transformación inversa, del viewport al espacio real
+        :param punto: punto o arreglo (k, 2) de puntos en el viewport
+        :return: puntos en el espacio real
+        """
+        return (punto - self.viewport[0] - self.offset) / self.escala + self.extent[0]
+
 
 class Extent:
     def __init__(self, rect):
@@ -66,3 +94,313 @@ class Extent:
 
     def size(self):
         return self.rect[1] - self.rect[0]
+
+
+class GrowableArray:
+    """
+    Clase arreglo de NumPy al que se le agregan elementos al final
+
+    la capacidad se duplica cada vez que se llena, por lo que agregar un elemento cuesta O(1) amortizado; view()
+    regresa una vista de los elementos que ya están, que sigue siendo válida aunque después el arreglo crezca
+    """
+
+    def __init__(self, dtype, shape=(), capacity=16):
+        """
+        Constructor
+        :param dtype: tipo de los elementos
+        :param shape: forma de cada elemento, () para escalares
+        :param capacity: capacidad inicial
+        """
+        self.data = numpy.empty((max(1, capacity),) + tuple(shape), dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def view(self):
+        return self.data[:self.size]
+
+    def reserve(self, size):
+        """
+        Asegura que caben size elementos sin volver a pedir memoria
+        :param size: número de elementos
+        :return: None
+        """
+        if size > len(self.data):
+            data = numpy.empty((max(size, 2 * len(self.data)),) + self.data.shape[1:], dtype=self.data.dtype)
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+
+    def append(self, value):
+        if self.size == len(self.data):
+            self.reserve(self.size + 1)
+        self.data[self.size] = value
+        self.size += 1
+
+    def extend(self, values):
+        values = numpy.asarray(values, dtype=self.data.dtype)
+        end = self.size + len(values)
+        self.reserve(end)
+        self.data[self.size:end] = values
+        self.size = end
+
+
+def expand(start, count):
+    """
+    Expande rangos [start, start + count) a la lista de sus elementos
+    :param start: inicio de cada rango
+    :param count: longitud de cada rango
+    :return: (elementos, número de rango al que pertenece cada elemento)
+    """
+    pair = numpy.repeat(numpy.arange(len(count)), count)
+    return (start - (numpy.cumsum(count) - count))[pair] + numpy.arange(len(pair)), pair
+
+
+def accumulate(fx, fy, owner, dx, dy, f):
+    """
+    Suma (dx, dy) * f a la fuerza de cada dueño, en el órden en que aparecen los pares
+    :param fx: componente x de la fuerza, se actualiza
+    :param fy: componente y de la fuerza, se actualiza
+    :param owner: índice del punto al que pertenece cada par
+    :param dx: componente x del vector de cada par
+    :param dy: componente y del vector de cada par
+    :param f: factor de cada par
+    :return: None
+    """
+    fx += numpy.bincount(owner, weights=dx * f, minlength=len(fx))
+    fy += numpy.bincount(owner, weights=dy * f, minlength=len(fy))
+
+
+# valor de los renglones a los que todavía no se les asigna un atributo, según el tipo de la columna
+DEFAULTS = {'b': False, 'i': 0, 'f': math.nan}
+
+
+def column_dtype(value):
+    """
+    Tipo de columna para guardar un valor
+    :param value: valor
+    :return: bool, int64, float64 u object
+    """
+    if isinstance(value, (bool, numpy.bool_)):
+        return numpy.dtype(bool)
+    if isinstance(value, (int, numpy.integer)):
+        return numpy.dtype(numpy.int64)
+    if isinstance(value, (float, numpy.floating)):
+        return numpy.dtype(numpy.float64)
+    return numpy.dtype(object)
+
+
+class AttrTable:
+    """
+    Clase tabla de atributos de las aristas o de los nodos de un grafo
+
+    cada atributo es una columna tipada (bool, int64, float64 u object) indexada por el número de renglón (arista o
+    nodo), en lugar de una llave en un diccionario por objeto. Las columnas se crean con el primer valor que se asigna
+    y se alargan hasta el número de renglones cuando se consultan; junto a cada columna hay otra de bool con los
+    renglones que sí tienen el atributo, para que los demás se comporten como un diccionario sin esa llave
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.present = {}       # nombre -> GrowableArray de bool, True en los renglones a los que se les asignó
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def column(self, name, size, dtype=None, default=None):
+        """
+        Columna de un atributo; escribir en ella no marca los renglones como asignados, para eso están set y fill
+        :param name: nombre del atributo
+        :param size: número de renglones
+        :param dtype: tipo de la columna si hay que crearla, si es None y no existe se regresa None
+        :param default: valor de los renglones sin asignar, si es None se usa DEFAULTS según el tipo
+        :return: vista de la columna con size renglones
+        """
+        col = self.columns.get(name)
+        if col is None:
+            if dtype is None:
+                return None
+            dtype = numpy.dtype(dtype)
+            col = self.columns[name] = GrowableArray(dtype, capacity=size)
+            col.default = DEFAULTS.get(dtype.kind) if default is None else default
+            self.present[name] = GrowableArray(bool, capacity=size)
+        if len(col) < size:
+            col.extend(numpy.full(size - len(col), col.default, dtype=col.data.dtype))
+        mask = self.present[name]
+        if len(mask) < size:
+            mask.extend(numpy.zeros(size - len(mask), dtype=bool))
+        return col.view()[:size]
+
+    def has(self, name, e):
+        """
+        Revisa si un renglón tiene un atributo
+        :param name: nombre del atributo
+        :param e: número de renglón
+        :return: True si se le asignó
+        """
+        mask = self.present.get(name)
+        return mask is not None and e < len(mask) and bool(mask.data[e])
+
+    def names(self, e):
+        """
+        Atributos asignados a un renglón
+        :param e: número de renglón
+        :return: generador de nombres
+        """
+        return (name for name in self.columns if self.has(name, e))
+
+    def get(self, name, e):
+        if not self.has(name, e):
+            raise KeyError(name)
+        value = self.columns[name].data[e]
+        return value.item() if isinstance(value, numpy.generic) else value
+
+    def set(self, name, e, value, size):
+        """
+        Asigna el atributo de un renglón, promoviendo la columna si el valor no cabe en su tipo
+        :param name: nombre del atributo
+        :param e: número de renglón
+        :param value: valor
+        :param size: número de renglones
+        :return: None
+        """
+        dtype = column_dtype(value)
+        self._promote(name, dtype)
+        self.column(name, size, dtype)[e] = value
+        self.present[name].data[e] = True
+
+    def assign(self, name, rows, values, size):
+        """
+        Asigna el atributo a varios renglones de una vez
+        :param name: nombre del atributo
+        :param rows: arreglo con los números de renglón
+        :param values: valor de cada renglón; las cadenas se guardan en una columna object
+        :param size: número de renglones
+        :return: None
+        """
+        values = numpy.asarray(values)
+        if values.dtype.kind in 'US':
+            values = values.astype(object)
+        self._promote(name, values.dtype)
+        self.column(name, size, values.dtype)[rows] = values
+        self.present[name].data[rows] = True
+
+    def _promote(self, name, dtype):
+        """
+        Cambia el tipo de una columna que ya existe si los valores de tipo dtype no caben en ella
+        """
+        col = self.columns.get(name)
+        if col is not None and not numpy.can_cast(dtype, col.data.dtype):
+            promoted = numpy.promote_types(dtype, col.data.dtype) if dtype != object else numpy.dtype(object)
+            new = GrowableArray(promoted, capacity=len(col.data))
+            new.extend(col.view())
+            new.default = col.default
+            self.columns[name] = new
+
+    def fill(self, name, values):
+        """
+        Asigna el atributo a todos los renglones
+        :param name: nombre del atributo
+        :param values: arreglo con un valor por renglón; su tipo es el de la columna si hay que crearla
+        :return: None
+        """
+        values = numpy.asarray(values)
+        self.column(name, len(values), values.dtype)[:] = values
+        self.present[name].view()[:len(values)] = True
+
+    def unset(self, name, e):
+        """
+        Quita el atributo de un renglón
+        :param name: nombre del atributo
+        :param e: número de renglón
+        :return: None
+        """
+        if not self.has(name, e):
+            raise KeyError(name)
+        self.present[name].data[e] = False
+        self.columns[name].data[e] = self.columns[name].default
+
+    def copy(self):
+        """
+        Copia de la tabla con columnas independientes
+        :return: AttrTable
+        """
+        ret = AttrTable()
+        for name, col in self.columns.items():
+            new = GrowableArray(col.data.dtype, capacity=len(col))
+            new.extend(col.view())
+            new.default = col.default
+            ret.columns[name] = new
+            mask = GrowableArray(bool, capacity=len(col))
+            mask.extend(self.present[name].view())
+            ret.present[name] = mask
+        return ret
+
+
+class FenwickTree:
+    """
+    Clase árbol de Fenwick sobre una lista de pesos
+
+    permite agregar pesos, cambiarlos y elegir un índice al azar en proporción a su peso, todo en O(log m)
+    """
+
+    def __init__(self):
+        self.tree = [0.0]       # índices desde 1, tree[i] es la suma de los pesos (i - lowbit(i), i]
+        self.weights = []
+        self.total = 0.0
+
+    def __len__(self):
+        return len(self.weights)
+
+    def append(self, w):
+        i = len(self.tree)
+        s = w
+        j = i - 1
+        low = i - (i & -i)
+        while j > low:
+            s += self.tree[j]
+            j -= j & -j
+        self.tree.append(s)
+        self.weights.append(w)
+        self.total += w
+
+    def set(self, i, w):
+        """
+        Cambia el peso de un elemento
+        :param i: índice del elemento
+        :param w: peso nuevo
+        :return: None
+        """
+        delta = w - self.weights[i]
+        self.weights[i] = w
+        self.total += delta
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, x):
+        """
+        Busca el elemento en el que cae x al acomodar los pesos uno tras otro
+        :param x: valor en [0, total)
+        :return: índice del elemento
+        """
+        i = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step > 0:
+            j = i + step
+            if j < len(self.tree) and self.tree[j] <= x:
+                i = j
+                x -= self.tree[j]
+            step >>= 1
+        return min(i, len(self.weights) - 1)
+
+    def sample(self):
+        """
+        Elige un elemento al azar en proporción a su peso
+        :return: índice del elemento
+        """
+        return self.find(random.random() * self.total)